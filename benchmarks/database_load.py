@@ -0,0 +1,317 @@
+"""
+This benchmark load tests the CRUD helpers of helpers.database.
+
+The helpers run against an in-memory mongomock client by default, or against
+a local or ephemeral mongod with --mongo-uri. For every number of guilds in
+--guilds it provisions the guild databases and collections, then runs
+--operations of every kind spread over the guilds:
+    - insert: insertOneDocument
+    - fetch: fetchOneDocument without the document cache
+    - fetch_cached: fetchOneDocument of the same documents with the cache
+    - update: updateDocument
+    - delete: deleteOneDocument
+
+It reports the operations per second and the round trips per operation.
+Against mongod every command sent by pymongo is counted with a command
+listener. mongomock has no wire protocol, so the calls of the client,
+database and collection methods that send a command are counted instead.
+The round trips do not depend on the machine, so they show the effect of
+the pooling, caching and batching work exactly. mongomock scans a whole
+collection on every query, so its fetch, update and delete rates drop with
+the documents per guild, compare the rates of mongod runs instead.
+
+With --output the results are written as JSON, and with --baseline they are
+compared to the results of an earlier run. With --max-regression the
+benchmark exits with an error when an operation got slower than that many
+percent or needs more round trips than in the baseline.
+
+Usage:
+    python -m benchmarks.database_load [--guilds 1,100,10000] [--operations N]
+        [--storage-mode per_guild|shared] [--mongo-uri URI]
+        [--output FILE] [--baseline FILE] [--max-regression PERCENT]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable
+from pymongo import MongoClient, monitoring
+from helpers.database import tenancy
+from helpers.database.cache import document_cache
+from helpers.database.create import createCollection, createDatabase, insertOneDocument
+from helpers.database.delete import deleteOneDocument
+from helpers.database.namespace_index import namespace_index
+from helpers.database.read import fetchOneDocument
+from helpers.database.update import updateDocument
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None # pylint: disable=invalid-name
+
+# The guild ids of the benchmark, far from the ids of real guilds
+GUILD_BASE = 900000000000000000
+
+COLLECTION_NAME = "benchmark"
+
+# The methods of the mongomock client, databases and collections that send a command
+COMMAND_METHODS = {
+    "aggregate", "bulk_write", "command", "count_documents", "create_collection",
+    "create_index", "delete_many", "delete_one", "distinct", "drop_collection",
+    "drop_database", "find", "find_one", "insert_many", "insert_one",
+    "list_collection_names", "list_database_names", "update_many", "update_one",
+}
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """
+    This class counts the commands sent to the database.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # the sessions are ended when the client is closed, not by the helpers
+        if event.command_name != "endSessions":
+            self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+class CountingProxy: # pylint: disable=too-few-public-methods
+    """
+    This class wraps a mongomock client, database or collection and counts
+    the calls of the methods that would send a command to mongod.
+    """
+
+    def __init__(self, target: Any, counter: RoundTripCounter):
+        self._target = target
+        self._counter = counter
+
+    def __getitem__(self, name: str) -> "CountingProxy":
+        return CountingProxy(self._target[name], self._counter)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._target, name)
+
+        if isinstance(attribute, (mongomock.Database, mongomock.Collection)):
+            return CountingProxy(attribute, self._counter)
+
+        if name not in COMMAND_METHODS:
+            return attribute
+
+        def countedCall(*args: Any, **kwargs: Any) -> Any:
+            self._counter.count += 1
+            return attribute(*args, **kwargs)
+
+        return countedCall
+
+
+def createClient(mongo_uri: str | None) -> tuple[Any, RoundTripCounter]:
+    """
+    Create the client the helpers run against and its round trip counter.
+    """
+    counter = RoundTripCounter()
+
+    if mongo_uri is not None:
+        return MongoClient(mongo_uri, event_listeners=[counter]), counter
+
+    if mongomock is None:
+        print("mongomock is not installed (pip install -r requirements-dev.txt), "
+              "or pass --mongo-uri of a local mongod")
+        sys.exit(1)
+
+    return CountingProxy(mongomock.MongoClient(), counter), counter
+
+
+def resetState() -> None:
+    """
+    Forget the process wide state of the helpers, so every run starts cold.
+    """
+    document_cache.clear()
+    namespace_index.invalidate()
+    tenancy.registered_guilds.invalidate()
+    tenancy._indexed_collections.clear() # pylint: disable=protected-access
+
+
+def dropDatabases(client: Any, database_names: list[str]) -> None:
+    """
+    Drop the databases created by a run.
+    """
+    existing = set(client.list_database_names())
+
+    for name in {*database_names, tenancy.getSharedDatabaseName()} & existing:
+        client.drop_database(name)
+
+
+def measure(
+        counter: RoundTripCounter,
+        count: int,
+        operation: Callable[[int], bool]) -> dict[str, float]:
+    """
+    Run an operation count times and measure it.
+
+    Returns:
+        dict[str, float]: The operations per second and round trips per operation.
+    """
+    round_trips = counter.count
+    failed = 0
+
+    start = time.perf_counter()
+    for index in range(count):
+        if not operation(index):
+            failed += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "ops_per_second": count / elapsed,
+        "round_trips_per_op": (counter.count - round_trips) / count,
+        "failed": failed,
+    }
+
+
+def runLoad(client: Any, counter: RoundTripCounter, guilds: int, operations: int) -> dict:
+    """
+    Provision the guilds and run every operation against them.
+
+    Returns:
+        dict: The measurements of every operation.
+    """
+    names = [tenancy.guildDatabaseName(GUILD_BASE + guild) for guild in range(guilds)]
+
+    def provision(index: int) -> bool:
+        return (createDatabase(client, names[index])
+                and createCollection(client, names[index], COLLECTION_NAME))
+
+    def insert(index: int) -> bool:
+        return insertOneDocument(client, names[index % guilds], COLLECTION_NAME,
+                                 {"key": index, "value": f"value {index}", "count": 0})
+
+    def fetch(index: int) -> bool:
+        return bool(fetchOneDocument(client, names[index % guilds], COLLECTION_NAME,
+                                     {"key": index}, use_cache=False))
+
+    def fetchCached(index: int) -> bool:
+        return bool(fetchOneDocument(client, names[index % guilds], COLLECTION_NAME,
+                                     {"key": index}))
+
+    def update(index: int) -> bool:
+        return updateDocument(client, names[index % guilds], COLLECTION_NAME,
+                              {"key": index}, {"$inc": {"count": 1}})
+
+    def delete(index: int) -> bool:
+        return deleteOneDocument(client, names[index % guilds], COLLECTION_NAME,
+                                 {"key": index})
+
+    results = {"provision": measure(counter, guilds, provision)}
+    results["insert"] = measure(counter, operations, insert)
+    results["fetch"] = measure(counter, operations, fetch)
+
+    # the first pass fills the cache, the second one is answered from it
+    measure(counter, operations, fetchCached)
+    results["fetch_cached"] = measure(counter, operations, fetchCached)
+
+    results["update"] = measure(counter, operations, update)
+    results["delete"] = measure(counter, operations, delete)
+
+    dropDatabases(client, names)
+
+    return results
+
+
+def compareResults(
+        results: dict[str, dict],
+        baseline: dict[str, dict] | None,
+        max_regression: float | None) -> list[str]:
+    """
+    Print the results, compared to the baseline if there is one.
+
+    Returns:
+        list[str]: The regressions larger than max_regression.
+    """
+    regressions = []
+
+    for guilds, operations in results.items():
+        print(f"\n{guilds} guilds")
+        print(f"{'Operation':<14} {'Ops/s':>10} {'Round trips/op':>15}")
+
+        for name, result in operations.items():
+            line = f"{name:<14} {result['ops_per_second']:>10,.0f} " \
+                   f"{result['round_trips_per_op']:>15.2f}"
+            if result["failed"]:
+                line += f"  ({result['failed']} failed)"
+
+            old = (baseline or {}).get(guilds, {}).get(name)
+            if old is not None:
+                speed = (result["ops_per_second"] - old["ops_per_second"]) \
+                    / old["ops_per_second"] * 100
+                line += f"  ({speed:+.1f}%, {old['round_trips_per_op']:.2f} round trips)"
+
+                if max_regression is not None and (
+                        -speed > max_regression
+                        or result["round_trips_per_op"] > old["round_trips_per_op"]):
+                    regressions.append(f"{name} with {guilds} guilds")
+
+            print(line)
+
+    return regressions
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Load test the database helpers.")
+    parser.add_argument("--guilds", default="1,100,10000",
+                        help="numbers of guilds to run with (default: %(default)s)")
+    parser.add_argument("--operations", type=int, default=1000,
+                        help="operations of every kind per run, at least one per guild "
+                             "(default: 1000)")
+    parser.add_argument("--storage-mode", choices=("per_guild", "shared"), default=None,
+                        help="storage mode of the guild data (default: from the environment)")
+    parser.add_argument("--mongo-uri", default=None,
+                        help="URI of a local mongod to use instead of mongomock")
+    parser.add_argument("--output", default=None, help="file to write the results to")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit with an error if an operation is that many percent slower")
+    args = parser.parse_args()
+
+    if args.storage_mode is not None:
+        os.environ["DISCORD_MONGO_DB_STORAGE_MODE"] = args.storage_mode
+
+    print(f"Storage mode {tenancy.getStorageMode()}, "
+          f"{'mongod at ' + args.mongo_uri if args.mongo_uri else 'mongomock'}")
+
+    results = {}
+    for guilds in (int(guilds) for guilds in args.guilds.split(",")):
+        resetState()
+        client, counter = createClient(args.mongo_uri)
+        results[str(guilds)] = runLoad(client, counter, guilds, max(args.operations, guilds))
+        client.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    regressions = compareResults(results, baseline, args.max_regression)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if regressions:
+        print(f"\nRegressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""
+This file contains a local stand-in for the Discord gateway and HTTP API.
+
+It speaks enough of the gateway protocol for discord.py to connect, identify
+and receive events: HELLO, READY, the GUILD_CREATE of every guild of the
+shard, heartbeat ACKs and member chunks. The HTTP API answers the login and
+gateway lookups, and records the messages the bot sends to measure the
+latency of the commands. Every other route answers with an empty success.
+
+The server runs on its own thread and event loop, so it does not count
+against the event loop of the bot it drives. The bot is pointed at it with
+usePatchedUrls.
+"""
+
+import asyncio
+import collections
+import json
+import threading
+import time
+from typing import Any
+import yarl
+from aiohttp import web, WSMsgType
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+
+# The id of the bot user
+BOT_ID = 900000000000000000
+
+# The first snowflake of the generated objects
+GUILD_BASE = 300000000000000000
+CHANNEL_BASE = 400000000000000000
+MESSAGE_BASE = 500000000000000000
+USER_BASE = 100000000000000000
+
+TIMESTAMP = "2024-02-01T12:00:00.000000+00:00"
+
+
+def createUser(user_id: int, bot: bool = False) -> dict:
+    """
+    Create a user object.
+    """
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id % 100000}",
+        "global_name": None,
+        "discriminator": "0",
+        "avatar": None,
+        "bot": bot,
+        "public_flags": 0,
+    }
+
+
+def createMember(user_id: int, bot: bool = False) -> dict:
+    """
+    Create a guild member object.
+    """
+    return {
+        "user": createUser(user_id, bot),
+        "roles": [],
+        "joined_at": TIMESTAMP,
+        "nick": None,
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def guildChannels(guild_id: int, channels: int) -> list[int]:
+    """
+    Get the ids of the text channels of a generated guild.
+    """
+    index = guild_id - GUILD_BASE
+    return [CHANNEL_BASE + index * 1000 + channel for channel in range(channels)]
+
+
+def createGuild(guild_id: int, channels: int = 10, members: int = 50) -> dict:
+    """
+    Create the GUILD_CREATE payload of a guild with text channels and members.
+    """
+    channel_ids = guildChannels(guild_id, channels)
+
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {guild_id - GUILD_BASE}",
+        "icon": None,
+        "owner_id": str(USER_BASE),
+        "large": members > 250,
+        "member_count": members + 1,
+        "joined_at": TIMESTAMP,
+        "features": [],
+        "emojis": [],
+        "stickers": [],
+        "voice_states": [],
+        "presences": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+        "premium_tier": 0,
+        "preferred_locale": "en-US",
+        "system_channel_id": str(channel_ids[0]),
+        "roles": [{
+            "id": str(guild_id),
+            "name": "@everyone",
+            "permissions": "1071698660929",
+            "position": 0,
+            "color": 0,
+            "hoist": False,
+            "managed": False,
+            "mentionable": False,
+        }],
+        "channels": [{
+            "id": str(channel_id),
+            "type": 0,
+            "guild_id": str(guild_id),
+            "name": f"channel-{position}",
+            "position": position,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+        } for position, channel_id in enumerate(channel_ids)],
+        "members": [createMember(BOT_ID, bot=True)]
+        + [createMember(USER_BASE + member) for member in range(members)],
+    }
+
+
+def createMessage( # pylint: disable=too-many-arguments
+        message_id: int,
+        guild_id: int,
+        channel_id: int,
+        author_id: int,
+        content: str,
+        bot: bool = False) -> dict:
+    """
+    Create the MESSAGE_CREATE payload of a message.
+    """
+    member = createMember(author_id, bot)
+    author = member.pop("user")
+
+    return {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "guild_id": str(guild_id),
+        "author": author,
+        "member": member,
+        "content": content,
+        "timestamp": TIMESTAMP,
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+        "flags": 0,
+    }
+
+
+def jsonResponse(data: Any) -> web.Response:
+    """
+    Create a JSON response, discord.py only decodes the exact content type.
+    """
+    return web.Response(body=json.dumps(data).encode("utf-8"),
+                        headers={"Content-Type": "application/json"})
+
+
+def shardOfGuild(guild_id: int, shard_count: int) -> int:
+    """
+    Get the shard a guild is received on.
+    """
+    return (guild_id >> 22) % shard_count
+
+
+class FakeDiscord: # pylint: disable=too-many-instance-attributes
+    """
+    This class is the fake gateway and HTTP API.
+
+    Arguments:
+        guilds: The GUILD_CREATE payloads of the guilds the bot is in.
+        shard_count: The number of shards answered by /gateway/bot.
+    """
+
+    def __init__(self, guilds: list[dict], shard_count: int = 1):
+        self.guilds = {int(guild["id"]): guild for guild in guilds}
+        self.shard_count = shard_count
+        self.port = 0
+        self.sockets: dict[int, web.WebSocketResponse] = {}
+        self.sequence = 0
+        self.latencies: list[float] = []
+        self.pending: dict[int, collections.deque] = collections.defaultdict(collections.deque)
+        self.message_id = MESSAGE_BASE + 10 ** 12
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._runner: web.AppRunner | None = None
+
+    def start(self) -> int:
+        """
+        Start the server on a free local port in its own thread.
+
+        Returns:
+            int: The port of the server.
+        """
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, name="fake-discord", daemon=True).start()
+        started.wait()
+        return self.port
+
+    def stop(self) -> None:
+        """
+        Stop the server.
+        """
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def call(self, coro: Any) -> Any:
+        """
+        Run a coroutine on the loop of the server and wait for its result
+        without blocking the calling loop.
+        """
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, self._loop)) # type: ignore[arg-type]
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/", self.gateway)
+        app.router.add_get("/api/v10/users/@me", self.current_user)
+        app.router.add_get("/api/v10/oauth2/applications/@me", self.application)
+        app.router.add_get("/api/v10/gateway", self.gateway_url)
+        app.router.add_get("/api/v10/gateway/bot", self.gateway_url)
+        app.router.add_post("/api/v10/channels/{channel_id}/messages", self.create_message)
+        app.router.add_route("*", "/api/v10/{tail:.*}", self.empty)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def _stop(self) -> None:
+        for socket in list(self.sockets.values()):
+            await socket.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def current_user(self, _request: web.Request) -> web.Response:
+        """
+        Answer the login of the bot.
+        """
+        return jsonResponse(createUser(BOT_ID, bot=True))
+
+    async def application(self, _request: web.Request) -> web.Response:
+        """
+        Answer the application lookup at login.
+        """
+        return jsonResponse({
+            "id": str(BOT_ID),
+            "name": "benchmark",
+            "description": "",
+            "icon": None,
+            "bot_public": False,
+            "bot_require_code_grant": False,
+            "owner": createUser(USER_BASE),
+            "verify_key": "",
+            "flags": 0,
+        })
+
+    async def gateway_url(self, _request: web.Request) -> web.Response:
+        """
+        Answer the gateway lookups with the fake gateway.
+        """
+        return jsonResponse({
+            "url": f"ws://127.0.0.1:{self.port}/",
+            "shards": self.shard_count,
+            "session_start_limit": {"total": 1000, "remaining": 1000,
+                                    "reset_after": 0, "max_concurrency": 16},
+        })
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        """
+        Record a message sent by the bot and answer with the created message.
+        """
+        channel_id = int(request.match_info["channel_id"])
+
+        # the commands of a channel are answered in order
+        if self.pending[channel_id]:
+            self.latencies.append(time.perf_counter() - self.pending[channel_id].popleft())
+
+        payload = await request.json() if request.can_read_body else {}
+        self.message_id += 1
+        guild_id = GUILD_BASE + (channel_id - CHANNEL_BASE) // 1000
+
+        return jsonResponse(createMessage(
+            self.message_id, guild_id, channel_id, BOT_ID, payload.get("content") or "", True))
+
+    async def empty(self, request: web.Request) -> web.Response:
+        """
+        Answer every other route with an empty success.
+        """
+        if request.method in ("PUT", "DELETE"):
+            return web.Response(status=204)
+        return jsonResponse({})
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        Speak the gateway protocol with a shard of the bot.
+        """
+        socket = web.WebSocketResponse(max_msg_size=0)
+        await socket.prepare(request)
+        await socket.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": 41250}}))
+
+        async for message in socket:
+            if message.type != WSMsgType.TEXT:
+                continue
+
+            payload = json.loads(message.data)
+            if payload["op"] == 1:
+                asyncio.get_running_loop().create_task(self.acknowledge(socket))
+            elif payload["op"] == 2:
+                await self.identify(socket, payload["d"])
+            elif payload["op"] == 8:
+                await self.member_chunk(socket, payload["d"])
+
+        return socket
+
+    async def acknowledge(self, socket: web.WebSocketResponse) -> None:
+        """
+        Answer a heartbeat after a round trip, discord.py records the time
+        of the heartbeat only after sending it.
+        """
+        await asyncio.sleep(0.05)
+        await socket.send_str(json.dumps({"op": 11}))
+
+    async def identify(self, socket: web.WebSocketResponse, data: dict) -> None:
+        """
+        Answer an IDENTIFY with READY and the guilds of the shard.
+        """
+        shard_id, shard_count = data.get("shard") or (0, 1)
+        self.sockets[shard_id] = socket
+        self.shard_count = shard_count
+        guilds = [guild for guild_id, guild in self.guilds.items()
+                  if shardOfGuild(guild_id, shard_count) == shard_id]
+
+        await self.send(shard_id, "READY", {
+            "v": 10,
+            "user": createUser(BOT_ID, bot=True),
+            "guilds": [{"id": guild["id"], "unavailable": True} for guild in guilds],
+            "session_id": f"session-{shard_id}",
+            "resume_gateway_url": f"ws://127.0.0.1:{self.port}/",
+            "shard": [shard_id, shard_count],
+            "application": {"id": str(BOT_ID), "flags": 0},
+        })
+
+        for guild in guilds:
+            await self.send(shard_id, "GUILD_CREATE", guild)
+
+    async def member_chunk(self, socket: web.WebSocketResponse, data: dict) -> None:
+        """
+        Answer a member request with every member of the guild.
+        """
+        guild = self.guilds.get(int(data["guild_id"]))
+        self.sequence += 1
+        chunk = {
+            "guild_id": data["guild_id"],
+            "members": guild["members"] if guild else [],
+            "chunk_index": 0,
+            "chunk_count": 1,
+            "nonce": data.get("nonce"),
+        }
+        await socket.send_str(
+            json.dumps({"op": 0, "s": self.sequence, "t": "GUILD_MEMBERS_CHUNK", "d": chunk}))
+
+    async def send(self, shard_id: int, event: str, data: dict) -> None:
+        """
+        Send an event to a shard.
+        """
+        self.sequence += 1
+        await self.sockets[shard_id].send_str(
+            json.dumps({"op": 0, "s": self.sequence, "t": event, "d": data}))
+
+    async def replay(self, events: list[dict], rate: float) -> float:
+        """
+        Send events to the shards of their guilds at a steady rate.
+
+        Arguments:
+            events: The events as {"t": name, "d": data}, a "command" key marks
+                messages that are answered by the bot.
+            rate: The events sent per second, 0 to send them as fast as possible.
+
+        Returns:
+            float: The seconds it took to send the events.
+        """
+        start = time.perf_counter()
+
+        for index, event in enumerate(events):
+            if rate > 0:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif index % 100 == 0:
+                await asyncio.sleep(0)
+
+            data = event["d"]
+            guild_id = int(data.get("guild_id") or data.get("id") or GUILD_BASE)
+
+            if event["t"] == "GUILD_CREATE":
+                self.guilds[guild_id] = data
+
+            if event.get("command"):
+                self.pending[int(data["channel_id"])].append(time.perf_counter())
+
+            await self.send(shardOfGuild(guild_id, self.shard_count), event["t"], data)
+
+        return time.perf_counter() - start
+
+
+def usePatchedUrls(port: int) -> None:
+    """
+    Point discord.py at the fake gateway and HTTP API.
+    """
+    DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{port}/")
+    Route.BASE = f"http://127.0.0.1:{port}/api/v10"
@@ -0,0 +1,185 @@
+"""
+This benchmark compares the JSON codecs and event loops of the fast mode on
+gateway payloads.
+
+It measures the decode time of every payload with json and orjson, and the
+number of events per second the bot decodes and dispatches to a listener
+with the asyncio and uvloop event loops. The codecs and loops that are not
+installed are skipped.
+
+Payloads recorded from a running bot, one raw gateway message per line, can
+be passed with --payloads. They are received by the on_socket_raw_receive
+event when the bot is created with enable_debug_events=True. Without them,
+payloads shaped like the most frequent gateway events are generated.
+
+Usage:
+    DISCORD_BOT_LOG_LEVEL=20 python -m benchmarks.gateway_json [--events N] [--payloads FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable
+import discord
+from discord.ext import commands
+from benchmarks.fake_gateway import (
+    GUILD_BASE, MESSAGE_BASE, USER_BASE, createGuild, createMessage, guildChannels)
+from helpers.json_codec import orjson, uvloop
+
+
+def createPayload(index: int) -> dict:
+    """
+    Create a gateway dispatch payload, most of them messages and presences
+    like on a busy bot, with a large GUILD_CREATE now and then.
+    """
+    guild_id = GUILD_BASE + index % 50
+    user_id = USER_BASE + index
+
+    if index % 500 == 0:
+        event = "GUILD_CREATE"
+        data = createGuild(guild_id, channels=50, members=100)
+    elif index % 3 == 0:
+        event = "PRESENCE_UPDATE"
+        data = {
+            "user": {"id": str(user_id)},
+            "guild_id": str(guild_id),
+            "status": "online",
+            "activities": [{"name": "a game", "type": 0, "created_at": 1700000000000}],
+            "client_status": {"desktop": "online"},
+        }
+    else:
+        event = "MESSAGE_CREATE"
+        data = createMessage(
+            MESSAGE_BASE + index,
+            guild_id,
+            guildChannels(guild_id, 50)[index % 50],
+            user_id,
+            f"message number {index} with some text in it")
+
+    return {"op": 0, "s": index, "t": event, "d": data}
+
+
+def loadPayloads(path: str | None, count: int) -> list[str]:
+    """
+    Load the recorded payloads, or generate them.
+    """
+    if path is None:
+        return [json.dumps(createPayload(index)) for index in range(count)]
+
+    with open(path, "r", encoding="utf-8") as file:
+        recorded = [line.strip() for line in file if line.strip()]
+
+    return [recorded[index % len(recorded)] for index in range(count)]
+
+
+def benchmarkDecode(decode: Callable[[str], Any], payloads: list[str]) -> float:
+    """
+    Decode every payload.
+
+    Returns:
+        float: The decode time per payload in microseconds.
+    """
+    start = time.perf_counter()
+    for payload in payloads:
+        decode(payload)
+    return (time.perf_counter() - start) / len(payloads) * 1e6
+
+
+async def dispatchPayloads(decode: Callable[[str], Any], payloads: list[str]) -> float:
+    """
+    Decode every payload and dispatch it to a listener of a bot, the way the
+    gateway does.
+
+    Returns:
+        float: The number of events dispatched per second.
+    """
+    received = 0
+    done = asyncio.Event()
+
+    async with commands.Bot(command_prefix=".", intents=discord.Intents.none()) as bot:
+        async def onBenchmarkEvent(_payload: dict):
+            nonlocal received
+            received += 1
+            if received == len(payloads):
+                done.set()
+
+        bot.add_listener(onBenchmarkEvent, "on_benchmark_event")
+
+        start = time.perf_counter()
+        for index, payload in enumerate(payloads):
+            bot.dispatch("benchmark_event", decode(payload))
+
+            # yield to the handlers like the gateway does between messages
+            if index % 100 == 0:
+                await asyncio.sleep(0)
+
+        await done.wait()
+        return len(payloads) / (time.perf_counter() - start)
+
+
+def compareCodecs(codecs: dict[str, Callable[[str], Any]], payloads: list[str]) -> None:
+    """
+    Print the decode time of every codec.
+    """
+    # warm up the codecs before measuring
+    for decode in codecs.values():
+        benchmarkDecode(decode, payloads[:1000])
+
+    decode_times = {name: benchmarkDecode(decode, payloads) for name, decode in codecs.items()}
+
+    print(f"{'Codec':<8} {'Decode':>10} {'Speedup':>8}")
+    for name, decode_time in decode_times.items():
+        print(f"{name:<8} {decode_time:>8.2f}us {decode_times['json'] / decode_time:>7.2f}x")
+
+
+def compareLoops(codecs: dict[str, Callable[[str], Any]], payloads: list[str]) -> None:
+    """
+    Print the events dispatched per second with every event loop and codec.
+    """
+    loops: dict[str, Callable[[], asyncio.AbstractEventLoop]] = {
+        "asyncio": asyncio.new_event_loop,
+    }
+    if uvloop is not None:
+        loops["uvloop"] = uvloop.new_event_loop
+
+    print(f"\n{'Loop':<8} {'Codec':<8} {'Events/s':>10} {'Speedup':>8}")
+    baseline = None
+    for loop_name, loop_factory in loops.items():
+        for codec_name, decode in codecs.items():
+            with asyncio.Runner(loop_factory=loop_factory) as runner:
+                rate = runner.run(dispatchPayloads(decode, payloads))
+
+            baseline = baseline or rate
+            print(f"{loop_name:<8} {codec_name:<8} {rate:>10,.0f} {rate / baseline:>7.2f}x")
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Compare the JSON codecs and event loops.")
+    parser.add_argument("--events", type=int, default=100000,
+                        help="payloads decoded and dispatched per run (default: 100000)")
+    parser.add_argument("--payloads", default=None,
+                        help="file of recorded gateway payloads, one per line")
+    args = parser.parse_args()
+
+    payloads = loadPayloads(args.payloads, args.events)
+    size = sum(len(payload) for payload in payloads) / len(payloads)
+    print(f"{len(payloads)} payloads, {size:.0f} bytes on average\n")
+
+    codecs: dict[str, Callable[[str], Any]] = {"json": json.loads}
+    if orjson is not None:
+        codecs["orjson"] = orjson.loads # pylint: disable=no-member
+
+    compareCodecs(codecs, payloads)
+    compareLoops(codecs, payloads)
+
+    missing = [name for name, module in (("orjson", orjson), ("uvloop", uvloop)) if module is None]
+    if missing:
+        print(f"\nNot installed: {', '.join(missing)} (pip install -r requirements-fast.txt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+This benchmark replays gateway events into the bot of bot.py through the
+fake gateway of benchmarks.fake_gateway.
+
+The bot is created by bot.createDiscordBot, so it loads the core cogs and
+the cogs/ packages and runs the same events as in production. It reports:
+    - the startup time, from the login until the bot is ready
+    - the events processed per second
+    - the latency percentiles of the commands, from the event being sent
+      until the reply of the bot arrives
+    - the growth of the resident memory during the replay
+    - the lag of the event loop during the replay
+
+The events are message creates, commands, member joins and guild joins
+mixed with --mix. Recorded events can be replayed instead with --record,
+one {"t": name, "d": data} object per line, and a "command": true key on
+the messages the bot answers. Every event of a recorded stream is sent, the
+MESSAGE_CREATE, GUILD_MEMBER_ADD and GUILD_CREATE events are counted.
+
+With --output the results are written as JSON, and with --baseline they are
+compared to the results of an earlier run, so a regression in the cog
+loading, the database helpers or the cogs shows up as a number.
+
+Usage:
+    python -m benchmarks.gateway_replay [--events N] [--rate R] [--guilds G]
+        [--shards S] [--mix message=80,command=10,member=8,guild=2]
+        [--record FILE] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+from typing import Any
+from benchmarks.fake_gateway import (
+    GUILD_BASE, MESSAGE_BASE, USER_BASE,
+    FakeDiscord, createGuild, createMember, createMessage, guildChannels, usePatchedUrls)
+from helpers.loop_monitor import getLoopMonitor
+
+# The environment of the bot, unless set already
+BENCHMARK_ENVIRONMENT = {
+    "DISCORD_BOT_TOKEN": "benchmark",
+    "DISCORD_BOT_OWNER_ID": str(USER_BASE),
+    "DISCORD_BOT_COMMAND_PREFIX": ".",
+    "DISCORD_BOT_DESCRIPTION": "Gateway replay benchmark",
+    "DISCORD_BOT_LOG_LEVEL": "30",
+    "DISCORD_USE_DATABASE": "False",
+    "DISCORD_BOT_COG_WATCH": "False",
+    "DISCORD_BOT_METRICS_PORT": "",
+    "DISCORD_BOT_LOOP_MONITOR_INTERVAL": "0.01",
+}
+
+# The gateway events counted as processed, and the events they dispatch
+COUNTED_EVENTS = {
+    "MESSAGE_CREATE": "on_message",
+    "GUILD_MEMBER_ADD": "on_member_join",
+    "GUILD_CREATE": "on_guild_join",
+}
+
+
+def parseMix(mix: str) -> dict[str, int]:
+    """
+    Parse the weights of the event kinds, like "message=80,command=10".
+    """
+    weights = {}
+
+    for part in mix.split(","):
+        kind, weight = part.split("=")
+        if kind.strip() not in ("message", "command", "member", "guild"):
+            raise ValueError(f"Unknown event kind {kind}")
+        weights[kind.strip()] = int(weight)
+
+    return weights
+
+
+def createEvents( # pylint: disable=too-many-arguments
+        count: int,
+        weights: dict[str, int],
+        guilds: int,
+        channels: int,
+        prefix: str,
+        seed: int = 0) -> list[dict]:
+    """
+    Create a stream of events spread over the guilds and channels.
+    """
+    generator = random.Random(seed)
+    kinds = generator.choices(list(weights), list(weights.values()), k=count)
+    events = []
+
+    for index, kind in enumerate(kinds):
+        guild_id = GUILD_BASE + generator.randrange(guilds)
+        channel_id = generator.choice(guildChannels(guild_id, channels))
+        author_id = USER_BASE + generator.randrange(50)
+
+        if kind == "message":
+            events.append({"t": "MESSAGE_CREATE", "d": createMessage(
+                MESSAGE_BASE + index, guild_id, channel_id, author_id,
+                f"message {index} with a few words in it")})
+        elif kind == "command":
+            events.append({"command": True, "t": "MESSAGE_CREATE", "d": createMessage(
+                MESSAGE_BASE + index, guild_id, channel_id, author_id, f"{prefix}ping")})
+        elif kind == "member":
+            events.append({"t": "GUILD_MEMBER_ADD", "d": {
+                **createMember(USER_BASE + 10 ** 6 + index), "guild_id": str(guild_id)}})
+        else:
+            events.append({"t": "GUILD_CREATE",
+                           "d": createGuild(GUILD_BASE + guilds + index, channels)})
+
+    return events
+
+
+def loadEvents(path: str) -> list[dict]:
+    """
+    Load a recorded stream of events.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def residentMemory() -> int:
+    """
+    Get the resident memory of the process in bytes.
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # the peak instead of the current memory outside of Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """
+    Get the p50, p95, p99 and max of samples, zero without samples.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def percentile(fraction: float) -> float:
+        return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+    return {"p50": percentile(0.5), "p95": percentile(0.95),
+            "p99": percentile(0.99), "max": samples[-1]}
+
+
+class EventCounter: # pylint: disable=too-few-public-methods
+    """
+    This class counts the replayed events the bot processed.
+    """
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.processed = 0
+        self.ready = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def attach(self, bot: Any) -> None:
+        """
+        Add the listeners counting the events to the bot.
+        """
+        async def onBenchmarkReady():
+            self.ready.set()
+
+        async def onBenchmarkEvent(*_args: Any):
+            if not self.ready.is_set():
+                return
+            self.processed += 1
+            if self.processed >= self.expected:
+                self.done.set()
+
+        bot.add_listener(onBenchmarkReady, "on_ready")
+        for event_name in set(COUNTED_EVENTS.values()):
+            bot.add_listener(onBenchmarkEvent, event_name)
+
+
+async def waitForReplies(server: FakeDiscord, events: list[dict]) -> int:
+    """
+    Give the replies to the last commands five seconds to arrive.
+
+    Returns:
+        int: The number of commands replayed.
+    """
+    commands = sum(bool(event.get("command")) for event in events)
+
+    for _ in range(50):
+        if len(server.latencies) >= commands:
+            break
+        await asyncio.sleep(0.1)
+
+    return commands
+
+
+async def replay(args: argparse.Namespace, events: list[dict]) -> dict[str, Any]:
+    """
+    Start the bot against the fake gateway, replay the events and measure.
+
+    Returns:
+        dict[str, Any]: The results of the run.
+    """
+    # bot.py reads its environment when it is imported
+    from bot import createDiscordBot # pylint: disable=import-outside-toplevel
+
+    server = FakeDiscord(
+        [createGuild(GUILD_BASE + guild, args.channels, args.members)
+         for guild in range(args.guilds)],
+        args.shards)
+    usePatchedUrls(server.start())
+
+    bot = createDiscordBot()
+    counter = EventCounter(sum(event["t"] in COUNTED_EVENTS for event in events))
+    counter.attach(bot)
+
+    start = time.perf_counter()
+    await bot.login(os.environ["DISCORD_BOT_TOKEN"])
+    connection = asyncio.create_task(bot.connect(reconnect=False))
+    await asyncio.wait_for(counter.ready.wait(), args.timeout)
+    startup = time.perf_counter() - start
+
+    monitor = getLoopMonitor(bot)
+    if monitor is not None:
+        monitor.samples.clear()
+
+    memory_before = residentMemory()
+    start = time.perf_counter()
+    send_time = await server.call(server.replay(events, args.rate))
+
+    try:
+        await asyncio.wait_for(counter.done.wait(), args.timeout)
+    except TimeoutError:
+        print(f"Timed out with {counter.processed} of {counter.expected} events processed")
+    elapsed = time.perf_counter() - start
+
+    commands = await waitForReplies(server, events)
+
+    results = {
+        "events": len(events),
+        "startup_seconds": startup,
+        "send_seconds": send_time,
+        "events_per_second": counter.processed / elapsed,
+        "command_latency": percentiles(server.latencies),
+        "commands_answered": f"{len(server.latencies)}/{commands}",
+        "loop_lag": monitor.percentiles() if monitor is not None else None,
+        "memory_growth_bytes": residentMemory() - memory_before,
+        "memory_bytes": residentMemory(),
+    }
+
+    await bot.close()
+    await connection
+    server.stop()
+
+    return results
+
+
+def printResults(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    """
+    Print the results, compared to the baseline if there is one.
+    """
+    def change(value: float, key: str, sub_key: str | None = None) -> str:
+        if baseline is None or baseline.get(key) is None:
+            return ""
+        old = baseline[key][sub_key] if sub_key else baseline[key]
+        return f"  ({(value - old) / old * 100:+.1f}%)" if old else ""
+
+    print(f"Startup:         {results['startup_seconds']:.2f}s"
+          f"{change(results['startup_seconds'], 'startup_seconds')}")
+    print(f"Throughput:      {results['events_per_second']:,.0f} events/s"
+          f"{change(results['events_per_second'], 'events_per_second')}"
+          f" ({results['events']} events sent in {results['send_seconds']:.2f}s)")
+
+    for title, key in (("Command latency", "command_latency"), ("Loop lag", "loop_lag")):
+        if results[key] is None:
+            continue
+        print(f"{title + ':':<16} " + ", ".join(
+            f"{name} {value * 1000:.1f}ms{change(value, key, name)}"
+            for name, value in results[key].items()))
+
+    print(f"Commands:        {results['commands_answered']} answered")
+    print(f"Memory:          {results['memory_bytes'] / 2 ** 20:.1f}MiB, "
+          f"{results['memory_growth_bytes'] / 2 ** 20:+.1f}MiB during the replay")
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Replay gateway events into the bot.")
+    parser.add_argument("--events", type=int, default=20000,
+                        help="synthetic events replayed (default: 20000)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="events sent per second, 0 for as fast as possible (default: 0)")
+    parser.add_argument("--guilds", type=int, default=100,
+                        help="guilds the bot is in at startup (default: 100)")
+    parser.add_argument("--channels", type=int, default=10,
+                        help="text channels of every guild (default: 10)")
+    parser.add_argument("--members", type=int, default=50,
+                        help="members of every guild (default: 50)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="shards of the bot, more than 1 runs it sharded (default: 1)")
+    parser.add_argument("--mix", default="message=80,command=10,member=8,guild=2",
+                        help="weights of the event kinds (default: %(default)s)")
+    parser.add_argument("--record", default=None, help="file of recorded events to replay")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="seconds to wait for the bot (default: 120)")
+    parser.add_argument("--output", default=None, help="file to write the results to")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run")
+    args = parser.parse_args()
+
+    for name, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    if args.shards > 1:
+        os.environ["DISCORD_BOT_SHARD_MODE"] = "auto"
+
+    # Set up the logging of the bot before it is imported
+    from helpers.logs import Logger # pylint: disable=import-outside-toplevel
+    Logger.setup_logging(int(os.environ["DISCORD_BOT_LOG_LEVEL"]))
+
+    if args.record:
+        events = loadEvents(args.record)
+    else:
+        events = createEvents(args.events, parseMix(args.mix), args.guilds, args.channels,
+                              os.environ["DISCORD_BOT_COMMAND_PREFIX"])
+
+    results = asyncio.run(replay(args, events))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    printResults(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
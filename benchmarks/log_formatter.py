@@ -0,0 +1,94 @@
+"""
+This benchmark compares the throughput of the log formatters.
+
+The "legacy" formatter builds a new logging.Formatter for every record, the
+way helpers.logs.CustomFormatter used to.
+
+Usage:
+    DISCORD_BOT_LOG_LEVEL=20 python -m benchmarks.log_formatter [--records N]
+"""
+
+import argparse
+import logging
+import time
+from helpers.logs import CustomFormatter, JsonFormatter
+from helpers.terminal_colors import TerminalColors
+
+
+class LegacyFormatter(CustomFormatter):
+    """
+    The formatter that builds a new formatter for every record.
+    """
+
+    def format(self, record: logging.LogRecord):
+        color_code = self.FORMATS.get(record.levelno, TerminalColors.RESET_COLOR)
+        log_fmt = (
+            self.pre_format
+            + color_code
+            + self.level_format
+            + TerminalColors.RESET_COLOR
+            + self.post_format
+        )
+        return logging.Formatter(log_fmt, self.date_format, style="%").format(record)
+
+
+def createRecords(count: int) -> list[logging.LogRecord]:
+    """
+    Create log records like the ones of the gateway at debug level.
+    """
+    levels = [logging.DEBUG, logging.DEBUG, logging.DEBUG, logging.INFO, logging.WARNING]
+
+    return [
+        logging.LogRecord(
+            "discord.gateway",
+            levels[index % len(levels)],
+            __file__,
+            index,
+            "Dispatching event %s for shard ID %s.",
+            ("MESSAGE_CREATE", index % 4),
+            None)
+        for index in range(count)
+    ]
+
+
+def benchmark(formatter: logging.Formatter, records: list[logging.LogRecord]) -> float:
+    """
+    Format every record.
+
+    Returns:
+        float: The number of records formatted per second.
+    """
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """
+    Run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Compare the log formatter throughput.")
+    parser.add_argument("--records", type=int, default=200000,
+                        help="records formatted per formatter (default: 200000)")
+    args = parser.parse_args()
+
+    records = createRecords(args.records)
+
+    # warm up the caches of the logging module before measuring
+    benchmark(LegacyFormatter(), records[:1000])
+
+    rates = {
+        name: benchmark(formatter, records)
+        for name, formatter in (("legacy", LegacyFormatter()),
+                                ("text", CustomFormatter()),
+                                ("json", JsonFormatter()))
+    }
+
+    print(f"{'Formatter':<10} {'Records/s':>12} {'Speedup':>8}")
+    for name, rate in rates.items():
+        print(f"{name:<10} {rate:>12,.0f} {rate / rates['legacy']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
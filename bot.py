@@ -3,47 +3,100 @@
 """
 
 import logging
+import os
 from os.path import expanduser
-import discord
 from discord.ext import commands
-from helpers.database.connection import getDbConnection
+from helpers.database.connection import getDbConnection, pingDatabase
+from helpers.database.namespace_index import namespace_index, startNamespaceWatcher
 from helpers.get_file import getFile
 from helpers.logs import Logger
 from helpers.env import getEnvVar
 from helpers.terminal_colors import TerminalColors
-from helpers.guild.add_guilds import addGuild
+from helpers.guild.add_guilds import asyncAddGuild
+from helpers.guild.prefixes import asyncLoadPrefixes, prefix_index
+from helpers.guild.reconcile import reconcileGuilds
 from helpers.help_command import getHelpCommand
 from helpers.core_cogs import loadCoreCogs
-
-def main():
+from helpers.cog_manager import setupCogManager
+from helpers.metrics import setupMetricsServer
+from helpers.loop_monitor import startLoopMonitor
+from helpers.json_codec import installFastMode
+from helpers.instrumented_bot import createBot
+from helpers.cluster import attachCluster, getClusterLogHandler, handleTermination
+from helpers.send_queue import attachSendQueue
+from helpers.intents import checkCogIntents, getIntentOptions, reportIntentSavings
+
+def createDiscordBot() -> commands.Bot:
     """
-    Main entry point for the bot.
-    """
-    # Set up overall logging
-    Logger.setup_logging(int(getEnvVar("DISCORD_BOT_LOG_LEVEL")))
+    Create the bot with its events, and connect to the database if it is used.
 
-    # Set up the logger
+    Used by main and by the benchmarks, which connect the bot themselves.
+    """
     startup_logging = logging.getLogger("discord.bot.startup")
 
     # check if the bot should use a database
     use_database = getEnvVar("DISCORD_USE_DATABASE")
 
-    # Create a new bot instance
-    bot = commands.Bot(
-        command_prefix=getEnvVar("DISCORD_BOT_COMMAND_PREFIX"),
-        intents=discord.Intents.all(),
+    # Guilds without their own prefix use the default prefix
+    prefix_index.default_prefix = getEnvVar("DISCORD_BOT_COMMAND_PREFIX")
+
+    # Create a new bot instance, sharded if DISCORD_BOT_SHARD_MODE is set
+    bot = createBot(
+        command_prefix=prefix_index.get_prefix,
+        **getIntentOptions(),
         description=getEnvVar("DISCORD_BOT_DESCRIPTION"),
         owner_id=int(getEnvVar("DISCORD_BOT_OWNER_ID")),
         case_insensitive=True,
         help_command=getHelpCommand(),
     )
 
+    # Connect to the launcher when running in a cluster
+    attachCluster(bot)
+
+    # Queue the messages of the cogs per channel within the rate limits
+    attachSendQueue(bot)
+
+    database_ready = False
+
     if use_database == "True":
-        # Test the database connection
-        db_conn = getDbConnection()
-        if db_conn is not None:
+        # Create the shared database client and test the connection
+        database_ready = pingDatabase(getDbConnection())
+        if database_ready:
             startup_logging.info("Connected to the database.")
-            db_conn.close()
+
+            # Warm the namespace index so validation skips the listing round trips
+            namespace_index.warm(getDbConnection())
+            if os.getenv("DISCORD_MONGO_DB_NAMESPACE_WATCH", "False") == "True":
+                startNamespaceWatcher(getDbConnection())
+
+    async def setupHook():
+        """
+        Load the core cogs before the bot connects to the gateway, so the
+        commands are available as soon as it is ready.
+        """
+        # Trace the calls blocking the event loop, from the cog imports onwards
+        startLoopMonitor(bot)
+
+        # Flush the buffered writes when the container is stopped
+        handleTermination(bot)
+
+        if database_ready:
+            # Load the guild prefixes before the first message arrives
+            await asyncLoadPrefixes(getDbConnection())
+        elif use_database == "True":
+            startup_logging.error("The database is unreachable, using the default prefix")
+
+        startup_logging.info("Loading core cogs...")
+        await loadCoreCogs(bot, "core")
+
+        # Load the cog packages from cogs/ that can be reloaded at runtime
+        await setupCogManager(bot, "cogs")
+        checkCogIntents(bot)
+
+        # Serve the profiler and shard metrics to Prometheus if enabled
+        await setupMetricsServer(bot)
+
+    bot.setup_hook = setupHook
 
     @bot.event
     async def on_guild_join(guild): # pylint: disable=invalid-name
@@ -53,12 +106,11 @@ def main():
         This event is called when the bot joins a new guild and 
         adds the guild to the database.
         """
+        startup_logging.info("Joined guild %s on shard %s", guild.id, guild.shard_id)
+
         if use_database == "True":
-            # Add the guild to the database
-            db_conn = getDbConnection()
-            if db_conn is not None:
-                addGuild(db_conn, guild)
-                db_conn.close()
+            # Add the guild to the database without blocking the event loop
+            await asyncAddGuild(getDbConnection(), guild)
 
     @bot.event
     async def on_ready():  # pylint: disable=invalid-name
@@ -94,8 +146,29 @@ client_id=%s&permissions=8&scope=bot%s",
                 TerminalColors.RESET_COLOR
             )
 
-        startup_logging.info("Loading core cogs...")
-        await loadCoreCogs(bot, "core")
+        reportIntentSavings(bot)
+
+        if use_database == "True":
+            # Provision the guilds joined and remove the guilds left while offline
+            await reconcileGuilds(bot, getDbConnection())
+
+    return bot
+
+
+def main():
+    """
+    Main entry point for the bot.
+    """
+    # Set up overall logging, sent to the launcher when running in a cluster
+    Logger.setup_logging(int(getEnvVar("DISCORD_BOT_LOG_LEVEL")), getClusterLogHandler())
+
+    # Set up the logger
+    startup_logging = logging.getLogger("discord.bot.startup")
+
+    # Use uvloop and orjson if DISCORD_BOT_FAST_MODE is set
+    installFastMode()
+
+    bot = createDiscordBot()
 
     # check if using root or user ssh key if not set default to root
     use_user = getEnvVar("DISCORD_USE_USER_SSH") or "False"
@@ -1,8 +1,11 @@
 """
 This is a simple example of a cog that listens for events and has a command.
 """
+# the example cogs are the same cog in two packages
+# pylint: disable=duplicate-code
 import discord
 from discord.ext import commands
+from helpers.send_queue import getSendQueue
 
 
 class Greetings(commands.Cog, name="Hello"):
@@ -22,10 +25,18 @@ class Greetings(commands.Cog, name="Hello"):
         """
         Event: on_member_join
 
-        This event is called when a member joins the server.
+        This event is called when a member joins the server, the welcome
+        is sent through the send queue of the bot.
         """
         channel = member.guild.system_channel
-        if channel is not None:
+        if channel is None:
+            return
+
+        # a mass join is welcomed in a few merged messages
+        send_queue = getSendQueue(self.bot)
+        if send_queue is not None:
+            send_queue.send_coalesced(channel, "Welcome {}.", member.mention)
+        else:
             await channel.send(f"Welcome {member.mention}.")
 
     @commands.command()
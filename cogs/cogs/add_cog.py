@@ -0,0 +1,40 @@
+"""
+This is the cog for loading a cog package from cogs/.
+"""
+
+import logging
+from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cog_manager import CogManagerError, getCogManager
+
+logger = logging.getLogger("discord.command.cogs")
+
+class AddCog(commands.Cog, name="Add Cog"):
+    """
+    This is the cog for loading a cog package.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.command(hidden=True, aliases=["loadcog"])
+    async def addcog(self, ctx: commands.Context, package: str):
+        """
+        Command: addcog
+
+        This command is used to load a cog package from cogs/ without
+        restarting the bot.
+        """
+        if not await isOwner(ctx, "load a cog"):
+            return
+
+        try:
+            duration = await getCogManager(ctx.bot).load(package)
+        except CogManagerError as error:
+            logger.warning("User %s could not load %s: %s", ctx.author, package, error)
+            await ctx.send(f"```{error}```")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await ctx.send(f"Loaded `{package}` in {duration * 1000:.0f}ms.")
+        await ctx.message.add_reaction("✅")
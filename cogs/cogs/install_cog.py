@@ -0,0 +1,82 @@
+"""
+This is the cog for installing cog packages from git repositories.
+"""
+
+import asyncio
+import logging
+from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cog_installer import CogInstallError, installCog, rollbackCog
+from helpers.cog_manager import CogManagerError, getCogManager
+
+logger = logging.getLogger("discord.command.cogs")
+
+class InstallCog(commands.Cog, name="Install Cog"):
+    """
+    This is the cog for installing cog packages.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def activate(self, ctx: commands.Context, record: dict) -> None:
+        """
+        Load the installed cog package, or reload it if it was loaded.
+        """
+        manager = getCogManager(ctx.bot)
+
+        try:
+            if record["name"] in manager.loaded:
+                duration = await manager.reload(record["name"])
+            else:
+                duration = await manager.load(record["name"])
+        except CogManagerError as error:
+            await ctx.send(f"```{error}```")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await ctx.send(f"`{record['name']}` is at `{record['commit'][:12]}`, "
+                       f"loaded in {duration * 1000:.0f}ms.")
+        await ctx.message.add_reaction("✅")
+
+    @commands.command(hidden=True)
+    async def installcog(self, ctx: commands.Context, url: str, ref: str = "HEAD"):
+        """
+        Command: installcog
+
+        This command is used to install or update a cog package from a git
+        repository and load it without restarting the bot.
+        """
+        if not await isOwner(ctx, "install a cog"):
+            return
+
+        try:
+            record = await asyncio.to_thread(installCog, url, ref)
+        except CogInstallError as error:
+            logger.warning("User %s could not install %s: %s", ctx.author, url, error)
+            await ctx.send(f"```{error}```")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await self.activate(ctx, record)
+
+    @commands.command(hidden=True)
+    async def rollbackcog(self, ctx: commands.Context, name: str, commit: str | None = None):
+        """
+        Command: rollbackcog
+
+        This command is used to go back to a revision of a cog package that
+        was installed before, from the local cache.
+        """
+        if not await isOwner(ctx, "roll back a cog"):
+            return
+
+        try:
+            record = await asyncio.to_thread(rollbackCog, name, commit)
+        except CogInstallError as error:
+            logger.warning("User %s could not roll back %s: %s", ctx.author, name, error)
+            await ctx.send(f"```{error}```")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await self.activate(ctx, record)
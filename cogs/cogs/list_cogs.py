@@ -0,0 +1,38 @@
+"""
+This is the cog for listing the cog packages in cogs/.
+"""
+
+from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cog_manager import getCogManager
+
+class ListCogs(commands.Cog, name="List Cogs"):
+    """
+    This is the cog for listing the cog packages.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.command(hidden=True)
+    async def listcogs(self, ctx: commands.Context):
+        """
+        Command: listcogs
+
+        This command is used to list the cog packages and the cogs they
+        have loaded.
+        """
+        if not await isOwner(ctx, "list the cogs"):
+            return
+
+        manager = getCogManager(ctx.bot)
+        lines = []
+
+        for package in manager.available():
+            cogs = manager.loaded.get(package)
+            if cogs is None:
+                lines.append(f"{package}: not loaded")
+            else:
+                lines.append(f"{package}: {', '.join(cog.qualified_name for cog in cogs)}")
+
+        await ctx.send("```" + ("\n".join(lines) or "No cog packages found") + "```")
@@ -0,0 +1,47 @@
+"""
+This is the cog for reloading the cog packages from cogs/.
+"""
+
+import logging
+from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cog_manager import CogManagerError, getCogManager
+
+logger = logging.getLogger("discord.command.cogs")
+
+class ReloadCog(commands.Cog, name="Reload Cog"):
+    """
+    This is the cog for reloading the cog packages.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.command(hidden=True)
+    async def reloadcog(self, ctx: commands.Context, package: str = "all"):
+        """
+        Command: reloadcog
+
+        This command is used to reload a cog package, or every loaded cog
+        package with "all", without restarting the bot. A package that
+        fails to reload keeps running the previous version.
+        """
+        if not await isOwner(ctx, "reload a cog"):
+            return
+
+        manager = getCogManager(ctx.bot)
+        packages = list(manager.loaded) if package == "all" else [package]
+        lines = []
+        failed = False
+
+        for name in packages:
+            try:
+                duration = await manager.reload(name)
+                lines.append(f"{name}: reloaded in {duration * 1000:.0f}ms")
+            except CogManagerError as error:
+                logger.warning("User %s could not reload %s: %s", ctx.author, name, error)
+                lines.append(f"{name}: {error}, kept the previous version")
+                failed = True
+
+        await ctx.send("```" + ("\n".join(lines) or "No cog packages loaded") + "```")
+        await ctx.message.add_reaction("❌" if failed else "✅")
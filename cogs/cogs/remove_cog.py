@@ -0,0 +1,40 @@
+"""
+This is the cog for unloading a cog package from cogs/.
+"""
+
+import logging
+from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cog_manager import CogManagerError, getCogManager
+
+logger = logging.getLogger("discord.command.cogs")
+
+class RemoveCog(commands.Cog, name="Remove Cog"):
+    """
+    This is the cog for unloading a cog package.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.command(hidden=True, aliases=["unloadcog"])
+    async def removecog(self, ctx: commands.Context, package: str):
+        """
+        Command: removecog
+
+        This command is used to unload a cog package without restarting
+        the bot.
+        """
+        if not await isOwner(ctx, "unload a cog"):
+            return
+
+        try:
+            duration = await getCogManager(ctx.bot).unload(package)
+        except CogManagerError as error:
+            logger.warning("User %s could not unload %s: %s", ctx.author, package, error)
+            await ctx.send(f"```{error}```")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await ctx.send(f"Unloaded `{package}` in {duration * 1000:.0f}ms.")
+        await ctx.message.add_reaction("✅")
@@ -2,10 +2,24 @@
 This is the admin cog for the bot.
 """
 
-from asyncio import sleep
+from asyncio import all_tasks, sleep
 import logging
-from discord import Client
+import os
+import time
 from discord.ext import commands
+from helpers.checks import isOwner
+from helpers.cluster import shutdownBot
+from helpers.database.connection import getDbConnection
+from helpers.guild.prefixes import (
+    MAX_PREFIX_LENGTH,
+    asyncRemoveGuildPrefix,
+    asyncSetGuildPrefix,
+    prefix_index,
+    validatePrefix,
+)
+from helpers.loop_monitor import getLoopMonitor
+from helpers.profiler import getProfiler
+from helpers.shards import getShardLatencies
 
 logger = logging.getLogger("discord.command.admin")
 
@@ -25,7 +39,193 @@ class Admin(commands.Cog, name="Admin"):
         This command is used to test if the bot is running or frozen.
         """
         logger.debug("User %s is pinged the bot.", ctx.author)
-        await ctx.send("Pong!")
+
+        latencies = "\n".join(
+            f"Shard {shard_id}: {latency * 1000:.0f}ms"
+            for shard_id, latency in getShardLatencies(ctx.bot)
+        )
+        await ctx.send(f"Pong!\n```{latencies}```")
+
+    @commands.command(hidden=True)
+    async def shards(self, ctx: commands.Context):
+        """
+        Command: shards
+
+        This command is used to show the latency, event rate and
+        reconnects of every shard.
+        """
+        if not await isOwner(ctx, "view the shard metrics"):
+            return
+
+        lines = [f"{'Shard':>5} {'Latency':>9} {'Events':>10} {'Events/s':>9} {'Reconnects':>10}"]
+        for shard_id, shard in ctx.bot.shard_metrics.snapshot(ctx.bot).items():
+            lines.append(
+                f"{shard_id:>5} {shard['latency'] * 1000:>7.0f}ms {shard['events']:>10} "
+                f"{shard['events_per_second']:>9.1f} {shard['reconnects']:>10}"
+            )
+
+        await ctx.send("```" + "\n".join(lines) + "```")
+
+    @commands.command(hidden=True)
+    async def clusters(self, ctx: commands.Context):
+        """
+        Command: clusters
+
+        This command is used to show the shards, guilds, event rate and
+        restarts of every cluster.
+        """
+        if not await isOwner(ctx, "view the cluster metrics"):
+            return
+
+        cluster = getattr(ctx.bot, "cluster", None)
+        if cluster is None:
+            await ctx.send("The bot is not running in a cluster.")
+            return
+
+        try:
+            stats = await cluster.request_stats()
+        except TimeoutError:
+            await ctx.send("The launcher did not answer.")
+            return
+
+        lines = [f"{'Cluster':>7} {'Pid':>7} {'Shards':>9} {'Guilds':>8} {'Events/s':>9} "
+                 f"{'Restarts':>8}"]
+        for cluster_id, info in sorted(stats.items()):
+            shard_range = f"{info['shard_ids'][0]}-{info['shard_ids'][-1]}"
+            events = sum(shard["events_per_second"] for shard in info["shards"].values())
+            lines.append(
+                f"{cluster_id:>7} {info['pid'] if info['alive'] else 'down':>7} "
+                f"{shard_range:>9} {info['guilds']:>8} {events:>9.1f} {info['restarts']:>8}"
+            )
+
+        await ctx.send("```" + "\n".join(lines) + "```")
+
+    @commands.command(hidden=True)
+    async def profile(self, ctx: commands.Context, cog: str | None = None):
+        """
+        Command: profile [cog|reset]
+
+        This command is used to show the calls, errors, latency and event loop
+        time of every cog, or of every handler and command of a cog.
+        """
+        if not await isOwner(ctx, "view the profiler"):
+            return
+
+        profiler = getProfiler(ctx.bot)
+        if profiler is None:
+            await ctx.send(
+                "The profiler is disabled, set DISCORD_BOT_PROFILER to True to enable it.")
+            return
+
+        if cog == "reset":
+            profiler.reset()
+            await ctx.send("The profiler counters were reset.")
+            return
+
+        if cog is None:
+            title = "Cog"
+            rows = list(profiler.cogs().items())
+        else:
+            title = "Handler"
+            rows = [
+                (f"{kind[0]}:{handler}", stats)
+                for (kind, handler_cog, handler), stats in profiler.stats.items()
+                if handler_cog.lower() == cog.lower()
+            ]
+
+        if not rows:
+            await ctx.send("Nothing was profiled yet.")
+            return
+
+        # the handlers holding the event loop the longest first
+        rows.sort(key=lambda row: row[1].blocking_time, reverse=True)
+
+        lines = [f"{title:<32} {'Calls':>7} {'Errors':>6} {'Avg':>8} {'p95':>8} "
+                 f"{'Loop':>9} {'Slow':>5}"]
+        for name, stats in rows[:15]:
+            lines.append(
+                f"{name[:32]:<32} {stats.calls:>7} {stats.errors:>6} "
+                f"{stats.total_time / stats.calls * 1000:>6.1f}ms "
+                f"{stats.quantile(0.95) * 1000:>6.0f}ms "
+                f"{stats.blocking_time * 1000:>7.0f}ms {stats.slow_callbacks:>5}"
+            )
+
+        await ctx.send("```" + "\n".join(lines) + "```")
+
+    @commands.command(hidden=True)
+    async def loop(self, ctx: commands.Context):
+        """
+        Command: loop
+
+        This command is used to show the lag of the event loop, the gateway
+        latency, the pending tasks and the last time the loop was blocked.
+        """
+        if not await isOwner(ctx, "view the event loop health"):
+            return
+
+        monitor = getLoopMonitor(ctx.bot)
+        if monitor is None:
+            await ctx.send("The event loop monitor is disabled.")
+            return
+
+        lag = monitor.percentiles()
+        lines = [
+            f"Lag:     p50 {lag['p50'] * 1000:.1f}ms, p95 {lag['p95'] * 1000:.1f}ms, "
+            f"p99 {lag['p99'] * 1000:.1f}ms, max {lag['max'] * 1000:.1f}ms",
+            f"Latency: {ctx.bot.latency * 1000:.0f}ms",
+            f"Tasks:   {len(all_tasks())} pending",
+            f"Blocked: {monitor.stalls} times",
+        ]
+
+        if monitor.last_stall is not None:
+            stall = monitor.last_stall
+            lines.append(f"Last:    {time.time() - stall['time']:.0f}s ago for at least "
+                         f"{stall['blocked'] * 1000:.0f}ms, in:")
+            # the innermost frames fit in a message
+            lines.append(stall["stack"][-1200:])
+
+        await ctx.send("```" + "\n".join(lines) + "```")
+
+    @commands.command()
+    @commands.guild_only()
+    async def prefix(self, ctx: commands.Context, new_prefix: str | None = None):
+        """
+        Command: prefix [new prefix|reset]
+
+        This command is used to show the command prefix of the server, or
+        to change it for members with the manage server permission.
+        """
+        if new_prefix is None:
+            await ctx.send(f"The prefix of this server is `{prefix_index.get(ctx.guild.id)}`")
+            return
+
+        if not ctx.author.guild_permissions.manage_guild and ctx.author.id != ctx.bot.owner_id:
+            logger.warning("User %s tried to change the prefix of guild %s.",
+                           ctx.author,
+                           ctx.guild.id)
+            await ctx.send("You need the manage server permission to change the prefix!")
+            await ctx.message.add_reaction("❌")
+            return
+
+        # without the database the prefix is kept until the bot restarts
+        db_connection = None
+        if os.getenv("DISCORD_USE_DATABASE", "False") == "True":
+            db_connection = getDbConnection()
+
+        if new_prefix != "reset" and not validatePrefix(new_prefix):
+            await ctx.send(f"A prefix is at most {MAX_PREFIX_LENGTH} characters without spaces.")
+            await ctx.message.add_reaction("❌")
+            return
+
+        if new_prefix == "reset":
+            await asyncRemoveGuildPrefix(db_connection, ctx.guild.id)
+        elif not await asyncSetGuildPrefix(db_connection, ctx.guild.id, new_prefix):
+            await ctx.send("The prefix could not be saved, try again later.")
+            await ctx.message.add_reaction("❌")
+            return
+
+        await ctx.send(f"The prefix of this server is now `{prefix_index.get(ctx.guild.id)}`")
+        await ctx.message.add_reaction("✅")
 
     @commands.command(hidden=True, aliases=["stop", "exit"])
     async def shutdown(self, ctx: commands.Context):
@@ -35,16 +235,19 @@ class Admin(commands.Cog, name="Admin"):
         This command is used to shutdown the bot.
         """
 
-        if ctx.author.id != ctx.bot.owner_id:
-            logger.warning("User %s tried to shutdown the bot.", ctx.author)
-            await ctx.send("You are not allowed to use this command!")
-            await ctx.message.add_reaction("❌")
+        if not await isOwner(ctx, "shutdown the bot"):
             return
         logger.info("User %s is shutting down the bot.", ctx.author)
         await ctx.send("Shutting down...")
         await ctx.message.add_reaction("✅")
+
+        # Tell the launcher to shutdown the other clusters as well
+        cluster = getattr(ctx.bot, "cluster", None)
+        if cluster is not None:
+            cluster.broadcast_shutdown()
+
         try:
-            await Client.close(ctx.bot)
+            await shutdownBot(ctx.bot)
         finally:
             await sleep(1)
             logger.info("Bot is shutdown.")
@@ -0,0 +1,27 @@
+"""
+This file contains the checks shared by the bot's commands.
+"""
+
+import logging
+from discord.ext import commands
+
+logger = logging.getLogger("discord.command.checks")
+
+async def isOwner(ctx: commands.Context, action: str) -> bool:
+    """
+    Check the author of a command is the bot owner, and tell them off if not.
+
+    Arguments:
+        ctx: The context of the command.
+        action: What the command does, used in the log message.
+
+    Returns:
+        bool: True if the author is the bot owner, False otherwise.
+    """
+    if ctx.author.id != ctx.bot.owner_id:
+        logger.warning("User %s tried to %s.", ctx.author, action)
+        await ctx.send("You are not allowed to use this command!")
+        await ctx.message.add_reaction("❌")
+        return False
+
+    return True
@@ -0,0 +1,538 @@
+"""
+This module contains the multi-process clusters of the bot.
+
+The launcher starts one worker process per cluster, each running the bot for
+a contiguous range of shards. The workers send their log records to the
+launcher over a shared queue, and talk to it over a pipe to push their shard
+metrics and to broadcast owner commands like shutdown to every cluster.
+Workers that crash are restarted with an exponential backoff.
+
+The clusters are configured with the environment variables:
+    - DISCORD_BOT_CLUSTERS (default: the number of CPU cores)
+    - DISCORD_BOT_SHARD_COUNT (default: the shard count recommended by Discord)
+    - DISCORD_BOT_CLUSTER_METRICS_INTERVAL (default: 60)
+"""
+
+import asyncio
+import logging
+import logging.handlers
+import os
+import signal
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable
+from discord.ext import commands
+from discord.http import HTTPClient
+from helpers.database.connection import closeDbConnection
+from helpers.database.executor import DatabaseExecutor
+from helpers.database.write_behind import write_behind_queue
+from helpers.logs import CustomFormatter, PlainFormatter, createOutputHandlers
+
+logger = logging.getLogger("discord.cluster")
+
+# Seconds a worker has to run before its restart backoff is reset
+RESTART_RESET = 300
+
+# The longest wait before restarting a crashed worker in seconds
+RESTART_MAX_DELAY = 60
+
+# Seconds the workers get to shutdown before they are terminated
+SHUTDOWN_TIMEOUT = 30
+
+
+class ClusterFormatter(CustomFormatter):
+    """
+    This class is used to format the combined logs of every cluster.
+    """
+    pre_format = CustomFormatter.pre_format + "[%(cluster_id)-8s] "
+
+
+class ClusterPlainFormatter(PlainFormatter):
+    """
+    This class is used to format the combined logs of every cluster for log files.
+    """
+    pre_format = ClusterFormatter.pre_format
+
+
+class ClusterFilter(logging.Filter): # pylint: disable=too-few-public-methods
+    """
+    This class tags the log records with the cluster they came from.
+    """
+
+    def __init__(self, cluster_id: Any):
+        super().__init__()
+        self.cluster_id = cluster_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "cluster_id"):
+            record.cluster_id = self.cluster_id
+        return True
+
+
+def splitShards(shard_count: int, clusters: int) -> list[list[int]]:
+    """
+    Split the shards into contiguous ranges of about the same size.
+
+    Returns:
+        list[list[int]]: The shard ids of each cluster.
+    """
+    clusters = max(min(clusters, shard_count), 1)
+    size, extra = divmod(shard_count, clusters)
+    ranges = []
+    first = 0
+
+    for cluster_id in range(clusters):
+        last = first + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(first, last)))
+        first = last
+
+    return ranges
+
+
+async def fetchRecommendedShards(token: str) -> int:
+    """
+    Get the shard count recommended by Discord for the bot.
+    """
+    http = HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+
+    return shard_count
+
+
+async def shutdownBot(bot: commands.Bot) -> None:
+    """
+    Stop the loop monitor and the metrics endpoint, close the bot, which
+    sends the queued messages and flushes the buffered writes, then close
+    the pooled database connections and stop the executor.
+
+    The bot stops running once it is closed and the tasks left on the event
+    loop are cancelled, so everything that awaits is done before the close.
+    """
+    try:
+        loop_monitor = getattr(bot, "loop_monitor", None)
+        if loop_monitor is not None:
+            loop_monitor.stop()
+
+        metrics_server = getattr(bot, "metrics_server", None)
+        if metrics_server is not None:
+            await metrics_server.stop()
+
+        await write_behind_queue.close()
+    finally:
+        await bot.close()
+        # blocking is fine here, nothing else runs on the event loop anymore
+        closeDbConnection()
+        DatabaseExecutor.shutdown()
+
+
+def handleTermination(bot: commands.Bot) -> None:
+    """
+    Shutdown the bot like the shutdown command when the process receives
+    SIGTERM, as sent by docker stop, instead of exiting without flushing.
+    """
+    loop = asyncio.get_running_loop()
+
+    try:
+        loop.add_signal_handler(
+            signal.SIGTERM, lambda: loop.create_task(shutdownBot(bot)))
+    except NotImplementedError:
+        # the signal handlers of the event loop are not available on windows
+        logger.debug("Not handling SIGTERM on this platform")
+
+
+class ClusterLink:
+    """
+    This class is the worker side of the pipe to the launcher.
+    """
+
+    _current: "ClusterLink | None" = None
+
+    def __init__(self, cluster_id: int, connection: Connection, log_queue: Any):
+        self.cluster_id = cluster_id
+        self.connection = connection
+        self.log_queue = log_queue
+        self.bot: commands.Bot | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stats: asyncio.Future | None = None
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, link: "ClusterLink") -> None:
+        """
+        Set the link of this worker process.
+        """
+        cls._current = link
+
+    @classmethod
+    def current(cls) -> "ClusterLink | None":
+        """
+        Get the link of this worker process, None outside of a cluster.
+        """
+        return cls._current
+
+    def create_log_handler(self) -> logging.Handler:
+        """
+        Create the handler that sends the log records to the launcher.
+        """
+        handler = logging.handlers.QueueHandler(self.log_queue)
+        handler.addFilter(ClusterFilter(self.cluster_id))
+        return handler
+
+    def attach(self, bot: commands.Bot) -> None:
+        """
+        Attach the link to the bot, the pipe is read once the bot connects.
+        """
+        self.bot = bot
+        setattr(bot, "cluster", self)
+
+        async def onConnect():
+            if self._loop is None:
+                self._loop = asyncio.get_running_loop()
+                threading.Thread(
+                    target=self._read, name="discord-cluster-link", daemon=True).start()
+                self._loop.create_task(self._push_metrics())
+
+        bot.add_listener(onConnect, "on_connect")
+
+    def send(self, message: dict) -> None:
+        """
+        Send a message to the launcher.
+        """
+        with self._send_lock:
+            try:
+                self.connection.send(message)
+            except (BrokenPipeError, OSError) as error:
+                logger.warning("Could not reach the launcher: %s", error)
+
+    def broadcast_shutdown(self) -> None:
+        """
+        Ask the launcher to shutdown every other cluster.
+        """
+        self.send({"op": "shutdown", "cluster_id": self.cluster_id})
+
+    async def request_stats(self, timeout: float = 5.0) -> dict:
+        """
+        Get the latest metrics of every cluster from the launcher.
+
+        Returns:
+            dict: The metrics of each cluster id.
+        """
+        if self._stats is None or self._stats.done():
+            self._stats = asyncio.get_running_loop().create_future()
+            self.send({"op": "stats", "cluster_id": self.cluster_id})
+
+        return await asyncio.wait_for(asyncio.shield(self._stats), timeout)
+
+    def _read(self) -> None:
+        """
+        Read the messages from the launcher until the pipe is closed.
+        """
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                logger.warning("The launcher closed the cluster link")
+                return
+
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._handle, message)
+
+    def _handle(self, message: dict) -> None:
+        """
+        Handle a message from the launcher on the event loop.
+        """
+        if message["op"] == "shutdown" and self.bot is not None:
+            logger.info("Shutdown requested by the launcher")
+            asyncio.get_running_loop().create_task(shutdownBot(self.bot))
+        elif message["op"] == "stats" and self._stats is not None and not self._stats.done():
+            self._stats.set_result(message["clusters"])
+
+    async def _push_metrics(self) -> None:
+        """
+        Send the shard metrics to the launcher periodically.
+        """
+        interval = float(os.getenv("DISCORD_BOT_CLUSTER_METRICS_INTERVAL", "60"))
+
+        while self.bot is not None and not self.bot.is_closed():
+            self.send({
+                "op": "metrics",
+                "cluster_id": self.cluster_id,
+                "guilds": len(self.bot.guilds),
+                "shards": self.bot.shard_metrics.snapshot(self.bot), # type: ignore[attr-defined]
+            })
+            await asyncio.sleep(interval)
+
+
+def getClusterLogHandler() -> logging.Handler | None:
+    """
+    Get the log handler of this worker process, None outside of a cluster.
+    """
+    link = ClusterLink.current()
+    return link.create_log_handler() if link is not None else None
+
+
+def attachCluster(bot: commands.Bot) -> None:
+    """
+    Attach the bot to the launcher when running in a cluster.
+    """
+    link = ClusterLink.current()
+    if link is not None:
+        link.attach(bot)
+
+
+class ClusterWorker: # pylint: disable=too-many-instance-attributes
+    """
+    This class is the launcher side of a cluster.
+    """
+
+    def __init__(self, cluster_id: int, shard_ids: list[int]):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Any = None
+        self.connection: Connection | None = None
+        self.started_at = 0.0
+        # every restart, and the crashes in a row that set the backoff
+        self.restarts = 0
+        self.restart_streak = 0
+        self.restart_at: float | None = None
+        self.metrics: dict = {}
+
+    def is_alive(self) -> bool:
+        """
+        Check if the worker process is running.
+        """
+        return self.process is not None and self.process.is_alive()
+
+    def stats(self) -> dict:
+        """
+        Get the state and latest metrics of the cluster.
+        """
+        return {
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.is_alive(),
+            "shard_ids": self.shard_ids,
+            "restarts": self.restarts,
+            "restart_streak": self.restart_streak,
+            "guilds": self.metrics.get("guilds", 0),
+            "shards": self.metrics.get("shards", {}),
+        }
+
+
+class ClusterSupervisor:
+    """
+    This class starts, restarts and stops the worker processes.
+    """
+
+    def __init__(self, shard_count: int, clusters: int, target: Callable[..., None]):
+        self.shard_count = shard_count
+        self.target = target
+        self.workers = [
+            ClusterWorker(cluster_id, shard_ids)
+            for cluster_id, shard_ids in enumerate(splitShards(shard_count, clusters))
+        ]
+        self.context = get_context("spawn")
+        self.log_queue: Any = self.context.Queue()
+        self.stopping = False
+        self.shutdown_deadline = 0.0
+
+    def run(self) -> None:
+        """
+        Run the clusters until they are shutdown.
+        """
+        # the launcher logs through the same queue to keep the output in order
+        queue_handler = logging.handlers.QueueHandler(self.log_queue)
+        queue_handler.addFilter(ClusterFilter("launcher"))
+        logging.getLogger().addHandler(queue_handler)
+
+        listener = logging.handlers.QueueListener(
+            self.log_queue, *createOutputHandlers(ClusterFormatter, ClusterPlainFormatter))
+        listener.start()
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+
+        logger.info("Starting %s clusters for %s shards", len(self.workers), self.shard_count)
+
+        try:
+            for worker in self.workers:
+                self._spawn(worker)
+            self._supervise()
+        finally:
+            for worker in self.workers:
+                if worker.is_alive():
+                    worker.process.terminate()
+            listener.stop()
+
+    def stop(self, exclude: int | None = None) -> None:
+        """
+        Shutdown every cluster.
+
+        Arguments:
+            exclude: A cluster that is already shutting down by itself.
+        """
+        if self.stopping:
+            return
+
+        logger.info("Shutting down all clusters")
+        self.stopping = True
+        self.shutdown_deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        self.broadcast({"op": "shutdown"}, exclude)
+
+    def broadcast(self, message: dict, exclude: int | None = None) -> None:
+        """
+        Send a message to every running cluster.
+        """
+        for worker in self.workers:
+            if worker.cluster_id != exclude and worker.is_alive():
+                self._send(worker, message)
+
+    def _send(self, worker: ClusterWorker, message: dict) -> None:
+        """
+        Send a message to a cluster.
+        """
+        try:
+            worker.connection.send(message) # type: ignore[union-attr]
+        except (BrokenPipeError, OSError) as error:
+            logger.warning("Could not reach cluster %s: %s", worker.cluster_id, error)
+
+    def _spawn(self, worker: ClusterWorker) -> None:
+        """
+        Start the process of a cluster.
+        """
+        parent_connection, child_connection = self.context.Pipe()
+        worker.connection = parent_connection
+        worker.process = self.context.Process(
+            target=self.target,
+            args=(worker.cluster_id,
+                  worker.shard_ids,
+                  self.shard_count,
+                  self.log_queue,
+                  child_connection),
+            name=f"cluster-{worker.cluster_id}")
+        worker.process.start()
+        child_connection.close()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+
+        logger.info("Started cluster %s with shards %s-%s (pid %s)",
+                    worker.cluster_id,
+                    worker.shard_ids[0],
+                    worker.shard_ids[-1],
+                    worker.process.pid)
+
+    def _supervise(self) -> None:
+        """
+        Handle the messages and exits of the clusters until they all stopped.
+        """
+        interval = float(os.getenv("DISCORD_BOT_CLUSTER_METRICS_INTERVAL", "60"))
+        next_report = time.monotonic() + interval
+
+        while True:
+            running = [worker for worker in self.workers if worker.process is not None]
+
+            if self.stopping and not any(worker.is_alive() for worker in running):
+                return
+
+            if self.stopping and time.monotonic() > self.shutdown_deadline:
+                logger.warning("Clusters did not shutdown in time, terminating them")
+                return
+
+            connections = {worker.connection: worker for worker in running}
+            sentinels = {worker.process.sentinel: worker for worker in running}
+
+            for ready in wait([*connections, *sentinels], timeout=1.0):
+                if ready in connections:
+                    self._receive(connections[ready])
+
+            for worker in sentinels.values():
+                if not worker.is_alive():
+                    self._on_exit(worker)
+
+            self._restart_due()
+
+            if time.monotonic() >= next_report:
+                self._report()
+                next_report = time.monotonic() + interval
+
+    def _receive(self, worker: ClusterWorker) -> None:
+        """
+        Handle the pending messages of a cluster.
+        """
+        try:
+            while worker.connection.poll(): # type: ignore[union-attr]
+                message = worker.connection.recv() # type: ignore[union-attr]
+
+                if message["op"] == "metrics":
+                    worker.metrics = message
+                elif message["op"] == "stats":
+                    self._send(worker, {
+                        "op": "stats",
+                        "clusters": {other.cluster_id: other.stats() for other in self.workers},
+                    })
+                elif message["op"] == "shutdown":
+                    self.stop(exclude=worker.cluster_id)
+        except (EOFError, OSError):
+            pass
+
+    def _on_exit(self, worker: ClusterWorker) -> None:
+        """
+        Schedule the restart of a cluster that exited.
+        """
+        exit_code = worker.process.exitcode
+        worker.connection.close() # type: ignore[union-attr]
+        worker.process = None
+        worker.metrics = {}
+
+        if self.stopping:
+            logger.info("Cluster %s stopped", worker.cluster_id)
+            return
+
+        # a worker that ran for a while starts a new backoff, but its
+        # restarts are still counted to show slow crash loops
+        if time.monotonic() - worker.started_at > RESTART_RESET:
+            worker.restart_streak = 0
+
+        delay = min(2 ** worker.restart_streak, RESTART_MAX_DELAY)
+        worker.restart_streak += 1
+        worker.restarts += 1
+        worker.restart_at = time.monotonic() + delay
+
+        logger.error("Cluster %s exited with code %s, restarting in %ss (restart %s)",
+                     worker.cluster_id,
+                     exit_code,
+                     delay,
+                     worker.restarts)
+
+    def _restart_due(self) -> None:
+        """
+        Restart the clusters whose backoff has passed.
+        """
+        if self.stopping:
+            return
+
+        for worker in self.workers:
+            if worker.restart_at is not None and time.monotonic() >= worker.restart_at:
+                self._spawn(worker)
+
+    def _report(self) -> None:
+        """
+        Log the combined metrics of every cluster.
+        """
+        guilds = sum(worker.metrics.get("guilds", 0) for worker in self.workers)
+        events_per_second = sum(
+            shard["events_per_second"]
+            for worker in self.workers
+            for shard in worker.metrics.get("shards", {}).values())
+        alive = sum(1 for worker in self.workers if worker.is_alive())
+
+        logger.info("%s/%s clusters running, %s guilds, %.1f events/s",
+                    alive,
+                    len(self.workers),
+                    guilds,
+                    events_per_second)
@@ -0,0 +1,298 @@
+"""
+This file contains the discovery of the cogs in a directory.
+
+A cog folder can name its cogs in the "cogs" of its cog.json manifest,
+mapping each module to its cog class:
+    {
+        "cogs": {"greetings": "Greetings"}
+    }
+
+Without a manifest, every class deriving from commands.Cog or
+commands.GroupCog is found by parsing the modules with ast, nothing is
+imported. A module with classes deriving from other classes, like a base
+cog of the project, is imported to check them, and the cogs found that way
+are loaded when the bot starts. The parse results are cached on disk keyed
+by the size, mtime and hash of each file, so restarts only parse the files
+that changed.
+
+The cache file is set with the environment variable:
+    - DISCORD_BOT_COG_CACHE (default: ".cog_cache.json", empty to disable)
+"""
+
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+from discord.ext import commands
+from helpers.read_json import readJson
+
+logger = logging.getLogger("discord.core.cog.discovery")
+
+# The decorators that register a command on a cog
+COMMAND_DECORATORS = ("command", "hybrid_command")
+
+# Bumped when the cached scan results change shape
+CACHE_VERSION = 2
+
+# The base classes of a cog
+COG_BASES = ("Cog", "GroupCog")
+
+# The decorators of cogs that have to be loaded when the bot starts
+EAGER_DECORATORS = ("listener", "group", "hybrid_group")
+
+
+def isCogClass(node: ast.ClassDef) -> bool:
+    """
+    Check if a class derives from commands.Cog or commands.GroupCog.
+    """
+    for base in node.bases:
+        name = base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "")
+        if name in COG_BASES:
+            return True
+
+    return False
+
+
+def scanCommands(node: ast.ClassDef) -> list[dict] | None:
+    """
+    Find the commands of a cog class.
+
+    Returns:
+        list[dict] | None: The name, aliases, hidden flag and help of every
+        command, or None if the cog has listeners or groups and has to be
+        loaded when the bot starts.
+    """
+    found = []
+
+    for method in node.body:
+        if not isinstance(method, ast.AsyncFunctionDef):
+            continue
+
+        for decorator in method.decorator_list:
+            target = decorator.func if isinstance(decorator, ast.Call) else decorator
+            name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", "")
+
+            if name in EAGER_DECORATORS:
+                return None
+
+            if name not in COMMAND_DECORATORS:
+                continue
+
+            options = {}
+            if isinstance(decorator, ast.Call):
+                try:
+                    options = {
+                        keyword.arg: ast.literal_eval(keyword.value)
+                        for keyword in decorator.keywords
+                        if keyword.arg in ("name", "aliases", "hidden")
+                    }
+                except ValueError:
+                    # like name=NAME, only known once the module is imported
+                    return None
+
+            found.append({
+                "name": options.get("name", method.name),
+                "aliases": options.get("aliases", []),
+                "hidden": options.get("hidden", False),
+                "help": ast.get_docstring(method),
+            })
+
+    return found or None
+
+
+def scanModule(filename: str) -> dict:
+    """
+    Parse a module for its cog classes.
+
+    Returns:
+        dict: The commands of every cog class in the module under "cogs", see
+        scanCommands, and the other classes with base classes under "unsure".
+    """
+    with open(filename, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), filename)
+
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+
+    return {
+        "cogs": {node.name: scanCommands(node) for node in classes if isCogClass(node)},
+        "unsure": [node.name for node in classes if node.bases and not isCogClass(node)],
+    }
+
+
+def importedCogClasses(module: str, names: list[str]) -> list[str]:
+    """
+    Import a module to find which of its classes are cogs.
+
+    Returns:
+        list[str]: The classes that derive from commands.Cog.
+    """
+    try:
+        imported = importlib.import_module(module)
+    except Exception as error: # pylint: disable=broad-exception-caught
+        logger.warning("Could not import %s to find its cogs: %r", module, error)
+        return []
+
+    return [
+        name for name in names
+        if inspect.isclass(getattr(imported, name, None))
+        and issubclass(getattr(imported, name), commands.Cog)
+    ]
+
+
+def fileHash(filename: str) -> str:
+    """
+    Get the sha256 hash of a file.
+    """
+    with open(filename, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+class DiscoveryCache:
+    """
+    This class keeps the scanned cog classes of every module on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.changed = False
+
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    cached = json.load(file)
+                if cached.get("version") == CACHE_VERSION:
+                    self.entries = cached["files"]
+            except (OSError, ValueError) as error:
+                logger.warning("Ignoring the unreadable cog cache %s: %s", path, error)
+
+    def scan(self, filename: str) -> dict:
+        """
+        Get the cog classes of a module, parsing it only if it changed, see
+        scanModule.
+        """
+        stat = os.stat(filename)
+        entry = self.entries.get(filename)
+
+        if entry is not None and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns,
+                                                                       stat.st_size):
+            return entry["cogs"]
+
+        digest = fileHash(filename)
+
+        # touched but not changed, e.g. by a fresh checkout
+        if entry is None or entry["hash"] != digest:
+            entry = {"hash": digest, "cogs": scanModule(filename)}
+
+        entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self.entries[filename] = entry
+        self.changed = True
+
+        return entry["cogs"]
+
+    def save(self) -> None:
+        """
+        Write the cache to disk if it changed.
+        """
+        if not self.path or not self.changed:
+            return
+
+        # every cluster process writes its own file, then swaps it in
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump({"version": CACHE_VERSION, "files": self.entries}, file)
+            os.replace(temporary, self.path)
+            self.changed = False
+        except OSError as error:
+            logger.warning("Could not write the cog cache %s: %s", self.path, error)
+
+
+def declaredCogs(path: str) -> dict[str, str] | None:
+    """
+    Get the cogs named in the manifest of a cog folder.
+
+    Returns:
+        dict[str, str] | None: The cog class of every module, None if the
+        manifest does not name the cogs.
+    """
+    manifest = readJson(f"{path}/cog.json") if os.path.isfile(f"{path}/cog.json") else {}
+    declared = manifest.get("cogs") if isinstance(manifest, dict) else None
+
+    return declared if isinstance(declared, dict) else None
+
+
+def discoverFolder(cache: DiscoveryCache, directory: str, folder: str) -> list[dict]:
+    """
+    Discover the cogs of a cog folder.
+
+    Returns:
+        list[dict]: The file, module, class and commands of every cog.
+    """
+    path = f"{directory}/{folder}"
+    declared = declaredCogs(path)
+
+    cogs = []
+
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith(".py"):
+            continue
+
+        module = filename[:-3]
+        if declared is not None and module not in declared:
+            continue
+
+        try:
+            scanned = cache.scan(f"{path}/{filename}")
+        except (OSError, SyntaxError, ValueError) as error:
+            logger.warning("Skipping %s/%s, it could not be parsed: %s", path, filename, error)
+            continue
+
+        # the classes ast cannot tell apart from cogs are loaded when the bot starts
+        classes = dict(scanned["cogs"])
+        if declared is not None:
+            classes.update((name, None) for name in scanned["unsure"]
+                           if name == declared[module])
+        elif scanned["unsure"]:
+            classes.update((name, None) for name in importedCogClasses(
+                f"{directory}.{folder}.{module}", scanned["unsure"]))
+
+        names = [declared[module]] if declared is not None else list(classes)
+
+        for class_name in names:
+            if class_name not in classes:
+                logger.warning("Skipping %s/%s, it has no cog class %s",
+                               path, filename, class_name)
+                continue
+
+            cogs.append({
+                "file": f"{path}/{filename}",
+                "module": f"{directory}.{folder}.{module}",
+                "class": class_name,
+                "commands": classes[class_name],
+            })
+
+    return cogs
+
+
+def discoverCogs(directory: str) -> list[dict]:
+    """
+    Discover the cogs in the folders of a directory.
+
+    Returns:
+        list[dict]: The file, module, class and commands of every cog, the
+        commands are None for cogs that have to be loaded when the bot starts.
+    """
+    cache = DiscoveryCache(os.getenv("DISCORD_BOT_COG_CACHE", ".cog_cache.json"))
+    cogs = []
+
+    for folder in sorted(os.listdir(directory)):
+        if os.path.isdir(f"{directory}/{folder}") and not folder.startswith("__"):
+            cogs.extend(discoverFolder(cache, directory, folder))
+
+    cache.save()
+
+    return cogs
@@ -0,0 +1,556 @@
+"""
+This file contains the installation of cog packages from git repositories.
+
+Repositories are mirrored into a local cache, and every installed commit is
+exported once into a folder named after its commit id, so reinstalling or
+rolling back to a commit that was installed before never touches the
+network, and a commit that is already in the mirror is installed without
+fetching it again. The pip requirements of a cog's cog.json are built into
+wheels stored under the hash of the requirements, and installed from there.
+The repositories are fetched and the wheels built in parallel, the pip
+installs into the environment of the bot run one at a time.
+
+A cog package is installed into cogs/<name>, the name cannot be the one of
+a cog package that ships with the bot.
+
+A cog.json can list its pip requirements:
+    {
+        "requirements": ["aiohttp>=3.9"]
+    }
+
+Usage:
+    python -m helpers.cog_installer install <url> [--ref REF] [--name NAME]
+    python -m helpers.cog_installer sync
+    python -m helpers.cog_installer rollback <name> [--commit COMMIT]
+    python -m helpers.cog_installer remove <name>
+    python -m helpers.cog_installer list
+
+The installer is configured with the environment variables:
+    - DISCORD_BOT_COG_REPOS (the repositories to sync, "url[@ref]" separated by commas)
+    - DISCORD_BOT_COG_PACKAGE_CACHE (default: ".cog_packages")
+    - DISCORD_BOT_COG_INSTALL_WORKERS (default: 4)
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helpers.read_json import readJson
+
+logger = logging.getLogger("discord.cog.installer")
+
+# The folder the cog packages are installed into
+COGS_DIRECTORY = "cogs"
+
+# Guards the registry and the cogs folder while installing in parallel
+_registry_lock = threading.Lock()
+
+# One lock per repository mirror, so parallel installs fetch it once at a time
+_mirror_locks: dict[str, threading.Lock] = {}
+
+# pip installs into one environment, so only one install runs at a time
+_pip_lock = threading.Lock()
+
+# A full or abbreviated commit id, which never moves unlike branches and tags
+COMMIT_PATTERN = re.compile(r"^[0-9a-f]{7,40}$")
+
+
+class CogInstallError(Exception):
+    """
+    Raised when a cog package could not be installed.
+    """
+
+
+def getCacheDirectory() -> str:
+    """
+    Get the folder of the repository, revision and wheel caches.
+    """
+    return os.getenv("DISCORD_BOT_COG_PACKAGE_CACHE", ".cog_packages")
+
+
+def getWorkers() -> int:
+    """
+    Get the number of repositories fetched and requirements built at once.
+    """
+    return int(os.getenv("DISCORD_BOT_COG_INSTALL_WORKERS", "4"))
+
+
+def runCommand(args: list[str]) -> bytes:
+    """
+    Run a git or pip command.
+
+    Returns:
+        bytes: The output of the command.
+    """
+    try:
+        return subprocess.run(args, check=True, capture_output=True).stdout
+    except subprocess.CalledProcessError as error:
+        raise CogInstallError(
+            f"{' '.join(args[:3])} failed: {error.stderr.decode(errors='replace').strip()}"
+        ) from error
+
+
+def cogName(url: str) -> str:
+    """
+    Get the folder name of a cog package from its repository url.
+    """
+    name = url.rstrip("/").rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+    name = name.removesuffix(".git")
+    return re.sub(r"\W", "_", name)
+
+
+def validateCogName(name: str) -> None:
+    """
+    Check that a cog package can be installed under a name, it has to be a
+    module name that is not taken by a cog package of the bot.
+    """
+    if not name.isidentifier() or name == COGS_DIRECTORY:
+        raise CogInstallError(f"{name!r} is not a valid cog name, pass another name")
+
+    if os.path.isdir(os.path.join(COGS_DIRECTORY, name)) and name not in loadRegistry():
+        raise CogInstallError(f"Cog {name} ships with the bot, pass another name")
+
+
+def mirrorPath(url: str) -> str:
+    """
+    Get the path of the mirror of a repository.
+    """
+    return os.path.join(
+        getCacheDirectory(), "repos", hashlib.sha256(url.encode()).hexdigest()[:16] + ".git")
+
+
+def fetchRepository(url: str) -> str:
+    """
+    Clone or update the mirror of a repository.
+
+    Returns:
+        str: The path of the mirror.
+    """
+    mirror = mirrorPath(url)
+
+    with _registry_lock:
+        lock = _mirror_locks.setdefault(mirror, threading.Lock())
+
+    with lock:
+        if os.path.isdir(mirror):
+            runCommand(["git", f"--git-dir={mirror}", "remote", "update", "--prune"])
+        else:
+            os.makedirs(os.path.dirname(mirror), exist_ok=True)
+            runCommand(["git", "clone", "--mirror", "--quiet", "--", url, mirror])
+
+    return mirror
+
+
+def publish(temporary: str, target: str) -> None:
+    """
+    Move a finished cache entry into place, keeping the existing one if
+    another install published the same entry first.
+    """
+    try:
+        os.replace(temporary, target)
+    except OSError:
+        if not os.path.isdir(target):
+            raise
+        shutil.rmtree(temporary)
+
+
+def resolveCommit(mirror: str, ref: str) -> str:
+    """
+    Get the commit id of a branch, tag or commit.
+    """
+    return runCommand(
+        ["git", f"--git-dir={mirror}", "rev-parse", "--verify", "--end-of-options",
+         f"{ref}^{{commit}}"]).decode().strip()
+
+
+def cachedCommit(mirror: str, ref: str) -> str | None:
+    """
+    Get the commit id of a ref that is a commit id already in the mirror.
+
+    Returns:
+        str | None: The commit id, None if the repository has to be fetched.
+    """
+    if not COMMIT_PATTERN.match(ref) or not os.path.isdir(mirror):
+        return None
+
+    try:
+        return resolveCommit(mirror, ref)
+    except CogInstallError:
+        return None
+
+
+def extractArchive(tar: tarfile.TarFile, folder: str) -> None:
+    """
+    Extract a git archive, refusing the files that would end up outside of
+    the folder.
+    """
+    # the extraction filters were added in python 3.11.4
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(folder, filter="data")
+        return
+
+    for member in tar.getmembers():
+        path = os.path.normpath(member.name)
+        if member.issym():
+            path = os.path.normpath(os.path.join(os.path.dirname(path), member.linkname))
+
+        if os.path.isabs(path) or path.startswith("..") \
+                or not (member.isfile() or member.isdir() or member.issym()):
+            raise CogInstallError(f"The archive has an unsafe member {member.name}")
+
+    tar.extractall(folder) # nosec, every member was checked above
+
+
+def exportRevision(mirror: str, commit: str) -> str:
+    """
+    Export the files of a commit into the revision cache, once.
+
+    Returns:
+        str: The folder of the revision.
+    """
+    revision = os.path.join(getCacheDirectory(), "revisions", commit)
+
+    if os.path.isdir(revision):
+        return revision
+
+    archive = runCommand(
+        ["git", f"--git-dir={mirror}", "archive", "--format=tar", "--end-of-options", commit])
+
+    os.makedirs(os.path.dirname(revision), exist_ok=True)
+    temporary = tempfile.mkdtemp(prefix=f"{commit}.", dir=os.path.dirname(revision))
+    try:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            extractArchive(tar, temporary)
+    except CogInstallError:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+    publish(temporary, revision)
+
+    return revision
+
+
+def readManifest(revision: str) -> dict:
+    """
+    Read the cog.json of a revision.
+    """
+    manifest_path = os.path.join(revision, "cog.json")
+
+    if not os.path.isfile(manifest_path):
+        raise CogInstallError(f"{revision} has no cog.json")
+
+    try:
+        manifest = readJson(manifest_path)
+    except (OSError, ValueError) as error:
+        raise CogInstallError(f"The cog.json of {revision} could not be read: {error}") from error
+
+    if not isinstance(manifest, dict):
+        raise CogInstallError(f"The cog.json of {revision} is not an object")
+
+    return manifest
+
+
+def buildWheels(requirements: list[str]) -> str:
+    """
+    Build the wheels of the requirements and their dependencies in
+    parallel, once for every set of requirements.
+
+    Returns:
+        str: The folder of the wheels.
+    """
+    key = hashlib.sha256("\n".join(sorted(requirements)).encode()).hexdigest()[:16]
+    wheels = os.path.join(getCacheDirectory(), "wheels", key)
+
+    if os.path.isdir(wheels):
+        return wheels
+
+    os.makedirs(os.path.dirname(wheels), exist_ok=True)
+    temporary = tempfile.mkdtemp(prefix=f"{key}.", dir=os.path.dirname(wheels))
+    merged = os.path.join(temporary, "merged")
+
+    def build(index: int) -> None:
+        runCommand([sys.executable, "-m", "pip", "wheel", "--quiet",
+                    "--wheel-dir", os.path.join(temporary, str(index)),
+                    requirements[index]])
+
+    try:
+        with ThreadPoolExecutor(max_workers=getWorkers()) as executor:
+            list(executor.map(build, range(len(requirements))))
+
+        # merge the wheels of every requirement, shared dependencies are the same wheel
+        os.makedirs(merged)
+        for index in range(len(requirements)):
+            folder = os.path.join(temporary, str(index))
+            for wheel in os.listdir(folder):
+                os.replace(os.path.join(folder, wheel), os.path.join(merged, wheel))
+
+        publish(merged, wheels)
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+    return wheels
+
+
+def installRequirements(requirements: list[str]) -> None:
+    """
+    Install the requirements of a cog package from the wheel cache.
+    """
+    if not requirements:
+        return
+
+    # a requirement like --index-url would be read as an option of pip
+    if any(not isinstance(requirement, str) or requirement.startswith("-")
+           for requirement in requirements):
+        raise CogInstallError(f"Invalid requirements {requirements}")
+
+    wheels = buildWheels(requirements)
+
+    with _pip_lock:
+        runCommand([sys.executable, "-m", "pip", "install", "--quiet",
+                    "--no-index", "--find-links", wheels, *requirements])
+
+
+def deployRevision(revision: str, name: str) -> None:
+    """
+    Replace the installed files of a cog package with a revision.
+    """
+    target = os.path.join(COGS_DIRECTORY, name)
+    staged = os.path.join(COGS_DIRECTORY, f".{name}.new")
+    retired = os.path.join(COGS_DIRECTORY, f".{name}.old")
+
+    shutil.rmtree(staged, ignore_errors=True)
+    shutil.copytree(revision, staged)
+
+    if os.path.isdir(target):
+        shutil.rmtree(retired, ignore_errors=True)
+        os.replace(target, retired)
+    os.replace(staged, target)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def loadRegistry() -> dict:
+    """
+    Get the installed cog packages.
+    """
+    path = os.path.join(getCacheDirectory(), "installed.json")
+
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def updateRegistry(name: str, record: dict | None) -> None:
+    """
+    Record the installed revision of a cog package, None to remove it.
+    """
+    with _registry_lock:
+        registry = loadRegistry()
+
+        if record is None:
+            registry.pop(name, None)
+        else:
+            history = list(record.get("history") or registry.get(name, {}).get("history", []))
+            if not history or history[-1] != record["commit"]:
+                history.append(record["commit"])
+            registry[name] = {**record, "history": history}
+
+        os.makedirs(getCacheDirectory(), exist_ok=True)
+        path = os.path.join(getCacheDirectory(), "installed.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(registry, file, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+def installRevision(mirror: str, commit: str, name: str) -> dict:
+    """
+    Install a commit of a repository mirror as a cog package.
+
+    Returns:
+        dict: The manifest of the installed revision.
+    """
+    revision = exportRevision(mirror, commit)
+    manifest = readManifest(revision)
+
+    installRequirements(manifest.get("requirements", []))
+
+    with _registry_lock:
+        deployRevision(revision, name)
+
+    return manifest
+
+
+def installCog(url: str, ref: str = "HEAD", name: str | None = None) -> dict:
+    """
+    Fetch a repository and install one of its revisions as a cog package.
+
+    Arguments:
+        url: The git url of the repository.
+        ref: The branch, tag or commit to install.
+        name: The folder in cogs/, by default the repository name.
+
+    Returns:
+        dict: The name, url, ref and commit that was installed.
+    """
+    # a url or ref like --upload-pack=... would be read as an option of git
+    if url.startswith("-") or ref.startswith("-"):
+        raise CogInstallError(f"Invalid repository {url}@{ref}")
+
+    name = name or cogName(url)
+    validateCogName(name)
+
+    mirror = mirrorPath(url)
+    commit = cachedCommit(mirror, ref)
+    if commit is None:
+        fetchRepository(url)
+        commit = resolveCommit(mirror, ref)
+
+    manifest = installRevision(mirror, commit, name)
+
+    record = {"name": name, "url": url, "ref": ref, "commit": commit, "mirror": mirror}
+    updateRegistry(name, record)
+
+    logger.info("Installed cog %s (%s) at %s", name, manifest.get("name", name), commit[:12])
+    return record
+
+
+def rollbackCog(name: str, commit: str | None = None) -> dict:
+    """
+    Install an earlier revision of a cog package from the local cache.
+
+    Arguments:
+        name: The installed cog package.
+        commit: The commit to go back to, by default the one installed
+            before the current one.
+
+    Returns:
+        dict: The name, url, ref and commit that was installed.
+    """
+    record = loadRegistry().get(name)
+    if record is None:
+        raise CogInstallError(f"Cog {name} was not installed by the installer")
+
+    history = record["history"]
+    if commit is None:
+        if len(history) < 2:
+            raise CogInstallError(f"Cog {name} has no earlier revision")
+        commit = history[-2]
+
+    matches = [index for index, known in enumerate(history) if known.startswith(commit)]
+    if not matches:
+        raise CogInstallError(f"Cog {name} was never installed at {commit}")
+
+    # forget the revisions after the one rolled back to
+    history = history[:matches[-1] + 1]
+    installRevision(record["mirror"], history[-1], name)
+
+    record = {**record, "ref": history[-1], "commit": history[-1], "history": history}
+    updateRegistry(name, record)
+
+    logger.info("Rolled back cog %s to %s", name, history[-1][:12])
+    return record
+
+
+def removeCog(name: str) -> None:
+    """
+    Remove an installed cog package, its cached revisions are kept.
+    """
+    if name not in loadRegistry():
+        raise CogInstallError(f"Cog {name} was not installed by the installer")
+
+    shutil.rmtree(os.path.join(COGS_DIRECTORY, name), ignore_errors=True)
+    updateRegistry(name, None)
+
+    logger.info("Removed cog %s", name)
+
+
+def parseRepositorySpec(spec: str) -> tuple[str, str]:
+    """
+    Split a "url@ref" repository spec, the ref defaults to HEAD.
+    """
+    url, separator, ref = spec.strip().rpartition("@")
+
+    # an ssh url like git@github.com:org/cog.git has no ref
+    if not separator or "/" in ref or ":" in ref:
+        return spec.strip(), "HEAD"
+
+    return url, ref
+
+
+def syncCogs(specs: list[str]) -> list[dict]:
+    """
+    Install every repository of a list of "url[@ref]" specs in parallel.
+
+    Returns:
+        list[dict]: The installed revisions, failures are logged and skipped.
+    """
+    def install(spec: str) -> dict | None:
+        url, ref = parseRepositorySpec(spec)
+        try:
+            return installCog(url, ref)
+        except CogInstallError as error:
+            logger.error("Could not install cog %s: %s", spec, error)
+            return None
+
+    with ThreadPoolExecutor(max_workers=getWorkers()) as executor:
+        results = list(executor.map(install, [spec for spec in specs if spec.strip()]))
+
+    return [result for result in results if result is not None]
+
+
+def main() -> None:
+    """
+    Run the installer from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Install cog packages from git repositories.")
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    install = actions.add_parser("install", help="install a cog from a repository")
+    install.add_argument("url")
+    install.add_argument("--ref", default="HEAD", help="branch, tag or commit (default: HEAD)")
+    install.add_argument("--name", default=None, help="folder in cogs/ (default: repo name)")
+
+    actions.add_parser("sync", help="install the repositories of DISCORD_BOT_COG_REPOS")
+
+    rollback = actions.add_parser("rollback", help="go back to an installed revision")
+    rollback.add_argument("name")
+    rollback.add_argument("--commit", default=None, help="commit (default: the previous one)")
+
+    remove = actions.add_parser("remove", help="remove an installed cog")
+    remove.add_argument("name")
+
+    actions.add_parser("list", help="list the installed cogs")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+
+    try:
+        if args.action == "install":
+            installCog(args.url, args.ref, args.name)
+        elif args.action == "sync":
+            syncCogs(os.getenv("DISCORD_BOT_COG_REPOS", "").split(","))
+        elif args.action == "rollback":
+            rollbackCog(args.name, args.commit)
+        elif args.action == "remove":
+            removeCog(args.name)
+        else:
+            for name, record in sorted(loadRegistry().items()):
+                print(f"{name:<24} {record['commit'][:12]} {record['ref']:<16} {record['url']}")
+    except CogInstallError as error:
+        logger.error("%s", error)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
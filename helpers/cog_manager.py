@@ -0,0 +1,318 @@
+"""
+This file contains the loading, unloading and hot reloading of the cogs
+under cogs/.
+
+Every folder of cogs/ with a cog.json manifest is a cog package. A package
+is reloaded in place: its cogs are removed, its modules are imported again
+and its new cogs are added. If anything fails, or a cog named in the
+manifest, or loaded before when the manifest names none, is not found, the
+old modules and cogs are put back, so a broken deploy never leaves the bot
+without the package.
+
+Changed packages can be reloaded automatically with the environment variables:
+    - DISCORD_BOT_COG_WATCH (default: "False")
+    - DISCORD_BOT_COG_WATCH_INTERVAL (default: 2)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from discord.ext import commands
+from helpers.cog_discovery import DiscoveryCache, declaredCogs, discoverFolder
+from helpers.core_cogs import importCog
+
+logger = logging.getLogger("discord.cog.manager")
+
+
+class CogManagerError(Exception):
+    """
+    Raised when a cog package could not be loaded, unloaded or reloaded.
+    """
+
+
+class CogManager:
+    """
+    This class keeps track of the cog packages loaded from a directory.
+    """
+
+    def __init__(self, bot: commands.Bot, directory: str = "cogs"):
+        self.bot = bot
+        self.directory = directory
+        self.cache = DiscoveryCache(os.getenv("DISCORD_BOT_COG_CACHE", ".cog_cache.json"))
+        self.loaded: dict[str, list[commands.Cog]] = {}
+        self._lock = asyncio.Lock()
+        self._watcher: asyncio.Task | None = None
+
+    def available(self) -> list[str]:
+        """
+        Get the cog packages that can be loaded.
+        """
+        try:
+            folders = sorted(os.listdir(self.directory))
+        except OSError:
+            return []
+
+        # hidden folders are packages being swapped in by the installer
+        return [
+            folder for folder in folders
+            if not folder.startswith(".")
+            and os.path.isfile(f"{self.directory}/{folder}/cog.json")
+        ]
+
+    def package_modules(self, package: str) -> dict:
+        """
+        Get the imported modules of a cog package.
+        """
+        prefix = f"{self.directory}.{package}"
+
+        return {
+            name: module for name, module in sys.modules.items()
+            if name == prefix or name.startswith(f"{prefix}.")
+        }
+
+    async def load_all(self) -> None:
+        """
+        Load every cog package, skipping the ones that fail.
+        """
+        for package in self.available():
+            try:
+                await self.load(package)
+            except Exception as error: # pylint: disable=broad-exception-caught
+                logger.error("%s", error)
+
+    async def load(self, package: str) -> float:
+        """
+        Load a cog package.
+
+        Returns:
+            float: The load time in seconds.
+        """
+        async with self._lock:
+            if package in self.loaded:
+                raise CogManagerError(f"Cog package {package} is already loaded")
+
+            start = time.perf_counter()
+            self.loaded[package] = await self._add(package)
+
+        duration = time.perf_counter() - start
+        logger.info("Loaded cog package %s in %.1fms", package, duration * 1000)
+        return duration
+
+    async def unload(self, package: str) -> float:
+        """
+        Unload a cog package.
+
+        Returns:
+            float: The unload time in seconds.
+        """
+        async with self._lock:
+            if package not in self.loaded:
+                raise CogManagerError(f"Cog package {package} is not loaded")
+
+            start = time.perf_counter()
+            await self._remove(self.loaded.pop(package))
+            for name in self.package_modules(package):
+                del sys.modules[name]
+
+        duration = time.perf_counter() - start
+        logger.info("Unloaded cog package %s in %.1fms", package, duration * 1000)
+        return duration
+
+    async def reload(self, package: str) -> float:
+        """
+        Reload a cog package, putting the old one back if the reload fails.
+
+        Returns:
+            float: The reload time in seconds.
+        """
+        async with self._lock:
+            if package not in self.loaded:
+                raise CogManagerError(f"Cog package {package} is not loaded")
+
+            start = time.perf_counter()
+            old_cogs = self.loaded.pop(package)
+            old_modules = self.package_modules(package)
+
+            await self._remove(old_cogs)
+            for name in old_modules:
+                del sys.modules[name]
+
+            try:
+                self.loaded[package] = await self._add(package, old_cogs)
+            except Exception as error: # pylint: disable=broad-exception-caught
+                sys.modules.update(old_modules)
+                for cog in old_cogs:
+                    await self.bot.add_cog(cog)
+                self.loaded[package] = old_cogs
+                logger.error("Reloading cog package %s failed, rolled back", package)
+
+                if isinstance(error, CogManagerError):
+                    raise
+                raise CogManagerError(
+                    f"Could not reload cog package {package}: {error!r}") from error
+
+        duration = time.perf_counter() - start
+        logger.info("Reloaded cog package %s in %.1fms", package, duration * 1000)
+        return duration
+
+    def expected_cogs(
+            self,
+            package: str,
+            loaded: list[commands.Cog] | None = None) -> set[tuple[str, str]]:
+        """
+        Get the module and class of the cogs a package has to provide, the
+        ones named in its manifest, or else the ones it had loaded before.
+        """
+        declared = declaredCogs(f"{self.directory}/{package}")
+
+        if declared is not None:
+            return {(f"{self.directory}.{package}.{module}", class_name)
+                    for module, class_name in declared.items()}
+
+        return {(type(cog).__module__, type(cog).__name__) for cog in loaded or []}
+
+    async def _add(
+            self,
+            package: str,
+            loaded: list[commands.Cog] | None = None) -> list[commands.Cog]:
+        """
+        Import a cog package and add its cogs, removing them again on failure.
+
+        Arguments:
+            package: The cog package.
+            loaded: The cogs of the package before a reload.
+        """
+        try:
+            found = discoverFolder(self.cache, self.directory, package)
+            expected = self.expected_cogs(package, loaded)
+        except (OSError, ValueError) as error:
+            # a manifest that does not parse, or a package removed by a deploy
+            raise CogManagerError(
+                f"Could not discover cog package {package}: {error!r}") from error
+        finally:
+            self.cache.save()
+
+        if not found:
+            raise CogManagerError(f"Cog package {package} has no cogs")
+
+        # a module that could not be parsed is skipped by the discovery
+        missing = expected - {
+            (cog["module"], cog["class"]) for cog in found}
+        if missing:
+            raise CogManagerError(
+                f"Cog package {package} is missing the cogs "
+                f"{', '.join(f'{module}.{name}' for module, name in sorted(missing))}")
+
+        added: list[commands.Cog] = []
+
+        try:
+            imports = await asyncio.gather(*(importCog(cog["module"]) for cog in found))
+
+            for cog, (module, _) in zip(found, imports):
+                instance = getattr(module, cog["class"])(self.bot)
+                await self.bot.add_cog(instance)
+                added.append(instance)
+        except Exception as error: # pylint: disable=broad-exception-caught
+            await self._remove(added)
+            for name in self.package_modules(package):
+                del sys.modules[name]
+            raise CogManagerError(f"Could not load cog package {package}: {error!r}") from error
+
+        return added
+
+    async def _remove(self, cogs: list[commands.Cog]) -> None:
+        """
+        Remove cogs from the bot.
+        """
+        for cog in reversed(cogs):
+            await self.bot.remove_cog(cog.qualified_name)
+
+    def signature(self, package: str) -> tuple:
+        """
+        Get the names, sizes and mtimes of the files of a cog package.
+        """
+        path = f"{self.directory}/{package}"
+        files = []
+
+        for root, folders, filenames in os.walk(path):
+            folders[:] = [folder for folder in folders if folder != "__pycache__"]
+            for filename in filenames:
+                if filename.endswith((".py", ".json")):
+                    try:
+                        stat = os.stat(f"{root}/{filename}")
+                    except FileNotFoundError:
+                        # swapped out by a deploy since the walk listed it
+                        continue
+                    files.append((f"{root}/{filename}", stat.st_mtime_ns, stat.st_size))
+
+        return tuple(sorted(files))
+
+    def start_watching(self) -> None:
+        """
+        Start reloading the cog packages when their files change.
+        """
+        if self._watcher is None:
+            self._watcher = asyncio.get_running_loop().create_task(self._watch())
+
+    async def _watch(self) -> None:
+        """
+        Poll the cog packages, and reload the loaded ones or load the new
+        ones once their files stopped changing for one interval.
+        """
+        interval = float(os.getenv("DISCORD_BOT_COG_WATCH_INTERVAL", "2"))
+        seen = {package: self.signature(package) for package in self.available()}
+        pending: dict[str, tuple] = {}
+
+        logger.info("Watching %s for changed cogs every %ss", self.directory, interval)
+
+        while True:
+            await asyncio.sleep(interval)
+
+            for package in self.available():
+                signature = self.signature(package)
+
+                if signature == seen.get(package):
+                    pending.pop(package, None)
+                    continue
+
+                # wait for the deploy to finish writing the files
+                if pending.get(package) != signature:
+                    pending[package] = signature
+                    continue
+
+                del pending[package]
+                is_new = package not in seen
+                seen[package] = signature
+
+                try:
+                    if package in self.loaded:
+                        await self.reload(package)
+                    elif is_new:
+                        await self.load(package)
+                except Exception as error: # pylint: disable=broad-exception-caught
+                    # the watcher keeps running for the next deploy
+                    logger.error("%s", error)
+
+
+def getCogManager(bot: commands.Bot) -> CogManager:
+    """
+    Get the cog manager of the bot.
+    """
+    return getattr(bot, "cog_manager")
+
+
+async def setupCogManager(bot: commands.Bot, directory: str = "cogs") -> CogManager:
+    """
+    Load the cog packages and start the file watcher if it is enabled.
+    """
+    manager = CogManager(bot, directory)
+    setattr(bot, "cog_manager", manager)
+
+    await manager.load_all()
+
+    if os.getenv("DISCORD_BOT_COG_WATCH", "False") == "True":
+        manager.start_watching()
+
+    return manager
@@ -1,55 +1,163 @@
 """
 This file is for handling the loading of the core cogs
+
+The cog modules are imported concurrently in threads, then added to the bot
+in order. With the environment variable DISCORD_BOT_LAZY_COGS set to "True",
+cogs that only have commands are not imported until one of their commands is
+first used, stub commands with the same names stand in for them until then.
+The cogs are found by helpers.cog_discovery.
 """
 
+import asyncio
 import os
-import sys
 import importlib
 import logging
+import time
 import traceback
+from types import ModuleType
 from discord.ext import commands
+from helpers.cog_discovery import discoverCogs
 from helpers.logs import TerminalColors
 
 logger = logging.getLogger("discord.core.cog.loader")
 
-def getClassName(filename: str) -> str:
+async def importCog(module_name: str) -> tuple[ModuleType, float]:
     """
-    Get the class name from the filename.
+    Import a cog module in a thread.
+
+    Returns:
+        tuple[ModuleType, float]: The module and the import time in seconds.
     """
-    with open(filename, "r", encoding="utf-8") as file:
-        for line in file:
-            if line.startswith("class"):
-                return line.split(" ")[1].split("(")[0]
+    def timedImport() -> tuple[ModuleType, float]:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        return module, time.perf_counter() - start
 
-    logger.warning("Could not find class name in file %s%s%s",
-                    TerminalColors.RED_BOLD,
-                    filename,
-                    TerminalColors.RESET_COLOR)
-    sys.exit(1)
+    return await asyncio.to_thread(timedImport)
+
+
+async def addCog(
+        bot: commands.Bot,
+        module: ModuleType,
+        class_name: str,
+        import_time: float) -> None:
+    """
+    Add the cog of an imported module to the bot and log the load time.
+    """
+    start = time.perf_counter()
+    class_ = getattr(module, class_name)
+    await bot.add_cog(class_(bot))
+
+    logger.info("Loaded core cog %s%s%s in %.1fms (import %.1fms)",
+                TerminalColors.GREEN_BOLD,
+                module.__name__,
+                TerminalColors.RESET_COLOR,
+                (import_time + time.perf_counter() - start) * 1000,
+                import_time * 1000)
+
+
+class LazyCog:
+    """
+    This class stands in for a cog until one of its commands is first used.
+    """
+
+    def __init__(self, bot: commands.Bot, module_name: str, class_name: str):
+        self.bot = bot
+        self.module_name = module_name
+        self.class_name = class_name
+        self.stubs: list[str] = []
+        self._lock = asyncio.Lock()
+
+    def register(self, found: list[dict]) -> None:
+        """
+        Register a stub command for every command of the cog.
+        """
+        async def stub(ctx: commands.Context):
+            await self.invoke(ctx)
+
+        for command in found:
+            stub_command = commands.Command(
+                stub,
+                name=command["name"],
+                aliases=command["aliases"],
+                hidden=command["hidden"],
+                help=command["help"],
+                ignore_extra=True)
+            self.bot.add_command(stub_command)
+            self.stubs.append(stub_command.name)
+
+    async def load(self) -> None:
+        """
+        Import the cog and replace the stub commands with the real ones.
+        """
+        async with self._lock:
+            if not self.stubs:
+                return
+
+            module, import_time = await importCog(self.module_name)
+
+            for name in self.stubs:
+                self.bot.remove_command(name)
+            self.stubs = []
+
+            await addCog(self.bot, module, self.class_name, import_time)
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        """
+        Load the cog on first use, then run the real command.
+        """
+        await self.load()
+
+        command = ctx.bot.get_command(ctx.invoked_with)
+        if command is None:
+            return
+
+        ctx.command = command
+        await command.invoke(ctx)
 
 
 async def loadCoreCogs(bot: commands.Bot , directory: str) -> None:
     """
     Iterate through the commands folder and load all commands.
     """
-    for folder in os.listdir(directory):
-        try:
-            # get the class from the module
-            for files in os.listdir(f"{directory}/{folder}"):
-                if files.endswith(".py"):
-                    class_name = getClassName(f"{directory}/{folder}/{files}")
-                    module_name = f"{directory}.{folder}.{files[:-3]}"
-                    module = importlib.import_module(module_name)
-                    class_ = getattr(module, class_name)
-                    await bot.add_cog(class_(bot))
-                    logger.info("Loaded core cog %s%s%s",
-                                TerminalColors.GREEN_BOLD,
-                                module_name,
-                                TerminalColors.RESET_COLOR)
-        except ImportError as import_error:
+    start = time.perf_counter()
+    lazy = os.getenv("DISCORD_BOT_LAZY_COGS", "False") == "True"
+    eager = []
+
+    for cog in discoverCogs(directory):
+        module_name, class_name = cog["module"], cog["class"]
+        found = cog["commands"] if lazy else None
+
+        if found is None:
+            eager.append((module_name, class_name))
+            continue
+
+        LazyCog(bot, module_name, class_name).register(found)
+        logger.info("Registered %s commands of core cog %s%s%s to load on first use",
+                    len(found),
+                    TerminalColors.GREEN_BOLD,
+                    module_name,
+                    TerminalColors.RESET_COLOR)
+
+    # import every module at once, then add the cogs in order
+    imports = await asyncio.gather(
+        *(importCog(module_name) for module_name, _ in eager),
+        return_exceptions=True)
+
+    for (module_name, class_name), result in zip(eager, imports):
+        if isinstance(result, ImportError):
             logger.warning("Could not load core cog %s%s%s - Exception: %s",
                             TerminalColors.RED_BOLD,
-                            folder,
+                            module_name,
                             TerminalColors.RESET_COLOR,
-                            import_error)
-            logger.warning(traceback.format_exc())
+                            result)
+            logger.warning("".join(traceback.format_exception(result)))
+            continue
+
+        if isinstance(result, BaseException):
+            raise result
+
+        module, import_time = result
+        await addCog(bot, module, class_name, import_time)
+
+    logger.info("Loaded core cogs in %.1fms", (time.perf_counter() - start) * 1000)
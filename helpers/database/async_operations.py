@@ -0,0 +1,235 @@
+"""
+This file contains the async versions of the database operations.
+
+Each operation runs the matching synchronous helper in the database
+executor, so validation and logging behave exactly the same while the
+event loop stays free.
+"""
+from typing import Any, AsyncIterator
+from pymongo import MongoClient
+from helpers.database.executor import runDbOperation
+from helpers.database import create, read, update, delete
+from helpers.database.cache import document_cache
+from helpers.database.tenancy import routeNamespace
+from helpers.database.validation import validateNamespace
+from helpers.database.write_behind import bufferInsertOneDocument, bufferUpdateDocument
+
+
+async def asyncCreateDatabase(db_connection: MongoClient, database_name: str) -> bool:
+    """
+    Create a database in the mongoDB without blocking the event loop.
+    """
+    return await runDbOperation(create.createDatabase, db_connection, database_name)
+
+
+async def asyncCreateCollection(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str) -> bool:
+    """
+    Create a collection in the mongoDB database without blocking the event loop.
+    """
+    return await runDbOperation(
+        create.createCollection,
+        db_connection,
+        database_name,
+        collection_name)
+
+
+async def asyncInsertOneDocument(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        document: dict,
+        buffered: bool = False) -> bool:
+    """
+    Create a document in the mongoDB collection without blocking the event loop.
+
+    With buffered set the insert is queued in the write-behind queue and
+    written with the next batch, True then means the write was accepted.
+    """
+    if buffered:
+        return await bufferInsertOneDocument(
+            db_connection,
+            database_name,
+            collection_name,
+            document)
+
+    return await runDbOperation(
+        create.insertOneDocument,
+        db_connection,
+        database_name,
+        collection_name,
+        document)
+
+
+async def asyncInsertManyDocuments(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        documents: list) -> bool:
+    """
+    Insert many documents in the mongoDB collection without blocking the event loop.
+    """
+    return await runDbOperation(
+        create.insertManyDocuments,
+        db_connection,
+        database_name,
+        collection_name,
+        documents)
+
+
+async def asyncFetchOneDocument(
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        use_cache: bool = True) -> dict:
+    """
+    Fetch one document from the collection without blocking the event loop.
+
+    Cached documents are returned straight away without using the executor.
+    """
+    if use_cache and validateNamespace(database_name, collection_name):
+        cached = document_cache.get(database_name, collection_name, query, record_miss=False)
+        if cached is not None:
+            return cached
+
+    return await runDbOperation(
+        read.fetchOneDocument,
+        db,
+        database_name,
+        collection_name,
+        query,
+        use_cache)
+
+
+async def asyncFetchAllDocuments(
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any) -> list | bool:
+    """
+    Fetch all documents from the collection without blocking the event loop.
+    """
+    return await runDbOperation(
+        read.fetchAllDocuments,
+        db,
+        database_name,
+        collection_name,
+        query)
+
+
+async def asyncStreamDocuments(
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        **options: Any) -> AsyncIterator[list]:
+    """
+    Stream the documents from the collection in batches without blocking the
+    event loop. See read.openCursor for the options.
+
+    Yields:
+        list: The next batch of up to batch_size documents.
+    """
+    batch_size = options.setdefault("batch_size", read.DEFAULT_BATCH_SIZE)
+    cursor = await runDbOperation(
+        read.openCursor, db, database_name, collection_name, query, **options)
+
+    if cursor is None:
+        return
+
+    _, guild_id = routeNamespace(database_name)
+
+    try:
+        while batch := await runDbOperation(read.nextBatch, cursor, batch_size, guild_id):
+            yield batch
+    finally:
+        await runDbOperation(cursor.close)
+
+
+async def asyncFetchPage(
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        **options: Any) -> tuple[list, Any]:
+    """
+    Fetch a page of documents using keyset pagination without blocking the
+    event loop. See read.fetchPage for the options.
+    """
+    return await runDbOperation(
+        read.fetchPage,
+        db,
+        database_name,
+        collection_name,
+        query,
+        **options)
+
+
+async def asyncUpdateDocument( # pylint: disable=too-many-arguments
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        new_values: Any,
+        buffered: bool = False) -> bool:
+    """
+    Update a document in the collection without blocking the event loop.
+
+    With buffered set the update is queued in the write-behind queue and
+    written with the next batch, True then means the write was accepted.
+    """
+    if buffered:
+        return await bufferUpdateDocument(
+            db_connection,
+            database_name,
+            collection_name,
+            query,
+            new_values)
+
+    return await runDbOperation(
+        update.updateDocument,
+        db_connection,
+        database_name,
+        collection_name,
+        query,
+        new_values)
+
+
+async def asyncDeleteDatabase(db_connection: MongoClient, database_name: str) -> bool:
+    """
+    Delete a database in the mongoDB without blocking the event loop.
+    """
+    return await runDbOperation(delete.deleteDatabase, db_connection, database_name)
+
+
+async def asyncDeleteCollection(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str) -> bool:
+    """
+    Delete a collection in the mongoDB database without blocking the event loop.
+    """
+    return await runDbOperation(
+        delete.deleteCollection,
+        db_connection,
+        database_name,
+        collection_name)
+
+
+async def asyncDeleteOneDocument(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        document: Any) -> bool:
+    """
+    Delete a document in the mongoDB database without blocking the event loop.
+    """
+    return await runDbOperation(
+        delete.deleteOneDocument,
+        db_connection,
+        database_name,
+        collection_name,
+        document)
@@ -0,0 +1,241 @@
+"""
+This file contains the read-through cache for single document lookups.
+
+Documents are cached per (database, collection, query) with a TTL and a
+memory bound, least recently used entries are evicted first. The write
+helpers invalidate every cached lookup of the collection they change.
+
+The cache belongs to one process. Writes made by other processes, like the
+other workers of a cluster, or outside of the bot are not seen until the
+cached lookup expires, so a lookup can be stale for up to
+DISCORD_MONGO_DB_CACHE_TTL seconds. Lower the TTL, or disable the cache with
+DISCORD_MONGO_DB_CACHE_MAX_BYTES set to 0, where that matters.
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+import bson
+from bson import json_util
+
+logger = logging.getLogger("discord.db.cache")
+
+
+def normalizeQuery(query: Any) -> str:
+    """
+    Normalize a query into a string usable as a cache key.
+
+    The top level fields of a filter are combined with AND, so their order
+    does not matter and they are sorted. Nested documents keep their order
+    as mongoDB compares embedded documents field by field.
+    """
+    if isinstance(query, dict):
+        query = sorted(query.items())
+
+    return json_util.dumps(query)
+
+
+def hitCounters(hits: int, misses: int) -> dict:
+    """
+    Get the hit and miss counters of a cache with its hit ratio.
+    """
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+    }
+
+
+def documentSize(document: dict) -> int:
+    """
+    Get the approximate memory size of a document in bytes.
+    """
+    try:
+        return len(bson.encode(document))
+    except (TypeError, bson.errors.InvalidDocument):
+        return len(repr(document))
+
+
+class DocumentCache: # pylint: disable=too-many-instance-attributes
+    """
+    This class is a memory bounded LRU cache with a TTL for documents.
+
+    Arguments:
+        max_bytes: The memory bound of the cached documents, 0 disables the cache.
+        ttl: The number of seconds a cached document is valid.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, int, dict]] = OrderedDict()
+        self._generations: dict[tuple[str, str], int] = {}
+        self._keys: dict[tuple[str, str], set[tuple]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the cache stores anything.
+        """
+        return self.max_bytes > 0
+
+    def generation(self, database_name: str, collection_name: str) -> int:
+        """
+        Get the write generation of a collection.
+
+        Readers take it before going to the database and pass it to put, so
+        a lookup that raced with a write is not cached.
+        """
+        with self._lock:
+            return self._generations.setdefault((database_name, collection_name), 0)
+
+    def get(
+            self,
+            database_name: str,
+            collection_name: str,
+            query: Any,
+            record_miss: bool = True) -> dict | None:
+        """
+        Get a cached document, or None on a miss.
+
+        Callers that fall back to fetchOneDocument on a miss pass record_miss
+        as False, so the miss is only counted once.
+        """
+        if not self.enabled:
+            return None
+
+        key = (database_name, collection_name, normalizeQuery(query))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                if record_miss:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return copy.deepcopy(entry[2])
+
+    def put( # pylint: disable=too-many-arguments
+            self,
+            database_name: str,
+            collection_name: str,
+            query: Any,
+            document: dict,
+            generation: int) -> None:
+        """
+        Cache a document fetched at the given write generation.
+        """
+        if not self.enabled:
+            return
+
+        key = (database_name, collection_name, normalizeQuery(query))
+        size = documentSize(document)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if self._generations.get((database_name, collection_name), 0) != generation:
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, size, copy.deepcopy(document))
+            self._keys.setdefault((database_name, collection_name), set()).add(key)
+            self._bytes += size
+
+            # evict the least recently used documents until we fit
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, database_name: str, collection_name: str | None = None) -> None:
+        """
+        Drop the cached lookups of a collection, or of a whole database.
+        """
+        with self._lock:
+            if collection_name is not None:
+                namespace = (database_name, collection_name)
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            else:
+                for namespace in self._generations:
+                    if namespace[0] == database_name:
+                        self._generations[namespace] += 1
+
+            for namespace in [namespace for namespace in self._keys
+                              if namespace[0] == database_name
+                              and collection_name in (None, namespace[1])]:
+                for key in self._keys.pop(namespace):
+                    self._remove(key)
+
+        logger.debug("Invalidated cached documents of %s.%s",
+                     database_name,
+                     collection_name or "*")
+
+    def clear(self) -> None:
+        """
+        Drop every cached document.
+        """
+        with self._lock:
+            # lookups that are still running must not cache what they read
+            for namespace in self._generations:
+                self._generations[namespace] += 1
+
+            self._entries.clear()
+            self._keys.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the hit ratio and memory use of the cache.
+        """
+        with self._lock:
+            return {
+                **hitCounters(self.hits, self.misses),
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: tuple) -> None:
+        """
+        Remove an entry, the lock must be held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            self._keys.get(key[:2], set()).discard(key)
+
+
+# The process wide document cache
+document_cache = DocumentCache(
+    max_bytes=int(os.getenv("DISCORD_MONGO_DB_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("DISCORD_MONGO_DB_CACHE_TTL", "60")),
+)
+
+
+def getDocumentCacheStats() -> dict:
+    """
+    Get the hit ratio and memory use of the document cache.
+
+    Returns:
+        dict: The counters, number of entries and bytes used.
+    """
+    return document_cache.stats()
@@ -5,16 +5,83 @@ Class for the database configuration for the bot and all cogs.
 import os
 import sys
 import logging
+import threading
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 
-def getDbConnection() -> MongoClient:
+logger = logging.getLogger("discord.db.connection")
+
+# Optional connection pool settings and the MongoClient option they map to
+POOL_OPTIONS = {
+    "DISCORD_MONGO_DB_MAX_POOL_SIZE": "maxPoolSize",
+    "DISCORD_MONGO_DB_MIN_POOL_SIZE": "minPoolSize",
+    "DISCORD_MONGO_DB_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "DISCORD_MONGO_DB_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "DISCORD_MONGO_DB_MAX_CONNECTING": "maxConnecting",
+}
+
+
+class DatabaseConnection:
+    """
+    This class holds the process wide pooled mongoDB client.
+    """
+
+    _client: MongoClient | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls) -> MongoClient:
+        """
+        Get the shared client, creating it on first use.
+        """
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = createDbClient()
+
+        return cls._client
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Close the shared client and all pooled connections.
+        """
+        with cls._lock:
+            if cls._client is not None:
+                cls._client.close()
+                cls._client = None
+                logger.info("Database connection closed.")
+
+
+def getPoolOptions() -> dict:
+    """
+    Get the connection pool options from the environment.
+
+    Returns:
+        dict: The MongoClient keyword arguments for every option that is set.
+    """
+    options = {}
+
+    for env_var, option in POOL_OPTIONS.items():
+        value = os.getenv(env_var, None)
+        if value is not None:
+            options[option] = int(value)
+
+    return options
+
+
+def createDbClient() -> MongoClient:
     """
-    Connects and returns a mongoDB Client.
+    Create a new pooled mongoDB Client.
 
     Using either the following environment variables or default values:
         - DISCORD_MONGO_DB_HOST_NAME
         - DISCORD_MONGO_DB_PORT
-        - DISCORD_MONGO_DB_DATABASE_NAME
+        - DISCORD_MONGO_DB_MAX_POOL_SIZE
+        - DISCORD_MONGO_DB_MIN_POOL_SIZE
+        - DISCORD_MONGO_DB_MAX_IDLE_TIME_MS
+        - DISCORD_MONGO_DB_WAIT_QUEUE_TIMEOUT_MS
+        - DISCORD_MONGO_DB_MAX_CONNECTING
     """
 
     # The certificate file for the database are located:
@@ -34,10 +101,51 @@ def getDbConnection() -> MongoClient:
             int(port),
             tls=True,
             tlsCRLFile="/etc/ssl/ca.pem",
-            tlsCertificateKeyFile="/etc/ssl/bot.pem"
+            tlsCertificateKeyFile="/etc/ssl/bot.pem",
+            **getPoolOptions()
         )
 
         return db_conn
 
     logging.error("Missing environment variables for the database connection.")
     sys.exit(1)
+
+
+def getDbConnection() -> MongoClient:
+    """
+    Returns the shared mongoDB Client.
+
+    The client is created on first use and reused by every caller, so the
+    TLS handshake and server discovery only happen once per process.
+    Callers must not close it, use closeDbConnection on shutdown instead.
+    """
+    return DatabaseConnection.get_client()
+
+
+def closeDbConnection() -> None:
+    """
+    Close the shared mongoDB Client.
+    """
+    DatabaseConnection.close()
+
+
+def pingDatabase(db_connection: MongoClient | None = None) -> bool:
+    """
+    Check the database is reachable.
+
+    Arguments:
+        db_connection: The client to check, defaults to the shared client.
+
+    Returns:
+        bool: True if the database answered the ping, False otherwise.
+    """
+    if db_connection is None:
+        db_connection = getDbConnection()
+
+    try:
+        db_connection.admin.command("ping")
+    except PyMongoError as error:
+        logger.error("Database health check failed: %s", error)
+        return False
+
+    return True
@@ -3,7 +3,16 @@ This file contains the create operations for the mongoDB database.
 """
 import logging
 from pymongo import MongoClient
-from helpers.database.validation import stringValidation
+from helpers.database.cache import document_cache
+from helpers.database.namespace_index import namespace_index
+from helpers.database.tenancy import (
+    ensureGuildIndexes,
+    guildIdFromDatabase,
+    registerGuild,
+    routeNamespace,
+    scopeDocument,
+)
+from helpers.database.validation import stringValidation, validateNamespace
 
 logger = logging.getLogger("discord.db.create")
 
@@ -15,8 +24,18 @@ def createDatabase(db_connection: MongoClient ,database_name: str) -> bool:
         logger.error("Invalid database name.")
         return False
 
+    # in the shared storage mode a guild database is an entry in the _bot_guilds collection
+    shared_database_name, guild_id = routeNamespace(database_name)
+    if guild_id is not None:
+        if not registerGuild(db_connection, guild_id):
+            logger.error("Database %s already exists", database_name)
+            return False
+        namespace_index.add_database(shared_database_name)
+        logger.info("Database %s created successfully", database_name)
+        return True
+
     # check if the database already exists
-    if database_name in db_connection.list_database_names():
+    if namespace_index.database_exists(db_connection, database_name):
         logger.error("Database %s already exists", database_name)
         return False
 
@@ -25,6 +44,12 @@ def createDatabase(db_connection: MongoClient ,database_name: str) -> bool:
 
     # check if the database was created
     if created_db.name == database_name:
+        # mongoDB only creates the database with its first collection, so a
+        # guild database is recorded as provisioned in the _bot_guilds collection
+        guild_id = guildIdFromDatabase(database_name)
+        if guild_id is not None:
+            registerGuild(db_connection, guild_id)
+        namespace_index.add_database(database_name)
         logger.info("Database %s created successfully", database_name)
         return True
 
@@ -41,15 +66,27 @@ def createCollection(
     Create a collection in the mongoDB database.
     """
 
-    if not stringValidation(database_name) or not stringValidation(collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return False
 
+    database_name, guild_id = routeNamespace(database_name)
+
+    # in the shared storage mode the collection is shared by every guild
+    if guild_id is not None:
+        if not namespace_index.collection_exists(db_connection, database_name, collection_name):
+            db_connection[database_name].create_collection(collection_name)
+            namespace_index.add_collection(database_name, collection_name)
+        ensureGuildIndexes(db_connection, collection_name)
+        logger.info("Collection %s created successfully", collection_name)
+        return True
+
     # create the collection
     collection = db_connection[database_name].create_collection(collection_name)
 
     # check if the collection was created
     if collection.database.name == database_name and collection.name == collection_name:
+        namespace_index.add_collection(database_name, collection_name)
         logger.info("Collection %s created successfully", collection_name)
         return True
 
@@ -67,17 +104,22 @@ def insertOneDocument(
     Create a document in the mongoDB collection.
     """
 
-    if not stringValidation(database_name) or not stringValidation(collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return False
 
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # check if the collection exists
-    if collection_name not in db_connection[database_name].list_collection_names():
+    if not namespace_index.collection_exists(
+            db_connection, shared_database_name, collection_name):
         logger.error("Collection %s does not exist", collection_name)
         return False
 
     # insert the document
-    insert = db_connection[database_name][collection_name].insert_one(document)
+    insert = db_connection[shared_database_name][collection_name].insert_one(
+        scopeDocument(document, guild_id))
+    document_cache.invalidate(database_name, collection_name)
 
     # check if the document was created
     if insert.acknowledged:
@@ -97,17 +139,22 @@ def insertManyDocuments(
     Insert many documents in the mongoDB collection.
     """
 
-    if not stringValidation(database_name) or not stringValidation(collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return False
 
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # check if the collection exists
-    if collection_name not in db_connection[database_name].list_collection_names():
+    if not namespace_index.collection_exists(
+            db_connection, shared_database_name, collection_name):
         logger.error("Collection %s does not exist", collection_name)
         return False
 
     # insert the documents
-    insert = db_connection[database_name][collection_name].insert_many(documents)
+    insert = db_connection[shared_database_name][collection_name].insert_many(
+        [scopeDocument(document, guild_id) for document in documents])
+    document_cache.invalidate(database_name, collection_name)
 
     # check if the documents were created
     if insert.acknowledged:
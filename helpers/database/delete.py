@@ -4,7 +4,11 @@ This file contains the delete operations for the database.
 import logging
 from typing import Any
 from pymongo import MongoClient
-from validation import validateMultipleStrings, validateInDatabase
+from helpers.database.cache import document_cache
+from helpers.database.namespace_index import namespace_index
+from helpers.database.tenancy import purgeGuild, routeNamespace, scopeQuery
+from helpers.database.validation import (
+    validateInDatabase, validateMultipleStrings, validateNamespace)
 
 logger = logging.getLogger("discord.db.delete")
 
@@ -17,26 +21,24 @@ def deleteDatabase(db_connection: MongoClient, database_name: str) -> bool:
         return False
 
     # check if the database exists
-    if validateInDatabase(
+    if not validateInDatabase(
         db_connection,
         logger,
         database_name=database_name):
         return False
 
-    # delete the database
-    db_connection.drop_database(database_name)
+    # in the shared storage mode only the documents of the guild are deleted
+    _, guild_id = routeNamespace(database_name)
+    if guild_id is not None:
+        purgeGuild(db_connection, guild_id)
+    else:
+        # delete the database, drop_database raises if the drop failed
+        db_connection.drop_database(database_name)
+        namespace_index.drop_database(database_name)
+    document_cache.invalidate(database_name)
 
-    # check if the database was deleted
-    if validateInDatabase(
-        db_connection,
-        logger,
-        database_name=database_name):
-        return True
-
-    logger.error(
-        "You shouldn't see this message, check that database %s was deleted successfully",
-        database_name)
-    return False
+    logger.info("Database %s deleted successfully", database_name)
+    return True
 
 def deleteCollection(
         db_connection: MongoClient,
@@ -46,33 +48,30 @@ def deleteCollection(
     Delete a collection in the mongoDB database.
     """
 
-    if validateMultipleStrings(database_name, collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return False
 
     # check if the collection exists
-    if validateInDatabase(
+    if not validateInDatabase(
         db_connection,
         logger,
         database_name=database_name,
         collection_name=collection_name):
         return False
 
-    # delete the collection
-    db_connection[database_name].drop_collection(collection_name)
+    # in the shared storage mode only the documents of the guild are deleted
+    _, guild_id = routeNamespace(database_name)
+    if guild_id is not None:
+        purgeGuild(db_connection, guild_id, collection_name)
+    else:
+        # delete the collection, drop_collection raises if the drop failed
+        db_connection[database_name].drop_collection(collection_name)
+        namespace_index.drop_collection(database_name, collection_name)
+    document_cache.invalidate(database_name, collection_name)
 
-    # check if the collection was deleted
-    if validateInDatabase(
-        db_connection,
-        logger,
-        database_name=database_name,
-        collection_name=collection_name):
-        return True
-
-    logger.error(
-        "You shouldn't see this message, check that collection %s was deleted successfully",
-        collection_name)
-    return False
+    logger.info("Collection %s deleted successfully", collection_name)
+    return True
 
 def deleteOneDocument(
         db_connection: MongoClient,
@@ -83,7 +82,7 @@ def deleteOneDocument(
     Delete a document in the mongoDB database.
     """
 
-    if not validateMultipleStrings(database_name, collection_name):
+    if not validateNamespace(database_name, collection_name):
         return False
 
     # check if the collection exists
@@ -94,8 +93,12 @@ def deleteOneDocument(
         collection_name=collection_name):
         return False
 
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # delete the document
-    deleted_item = db_connection[database_name][collection_name].delete_one(document)
+    deleted_item = db_connection[shared_database_name][collection_name].delete_one(
+        scopeQuery(document, guild_id))
+    document_cache.invalidate(database_name, collection_name)
 
     # check if the document was deleted
     if deleted_item.deleted_count > 0:
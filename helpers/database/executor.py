@@ -0,0 +1,68 @@
+"""
+This file contains the bounded thread pool used to run the blocking
+pymongo operations off of the bot's event loop.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger("discord.db.executor")
+
+
+class DatabaseExecutor:
+    """
+    This class holds the process wide thread pool for database operations.
+
+    The number of worker threads can be set with the environment variable:
+        - DISCORD_MONGO_DB_EXECUTOR_WORKERS (default: 8)
+    """
+
+    _executor: ThreadPoolExecutor | None = None
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """
+        Get the thread pool, creating it on first use.
+        """
+        if cls._executor is None:
+            workers = int(os.getenv("DISCORD_MONGO_DB_EXECUTOR_WORKERS", "8"))
+            cls._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="discord-db"
+            )
+            logger.debug("Database executor started with %s workers", workers)
+
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls, wait: bool = True) -> None:
+        """
+        Shutdown the thread pool, waiting for pending operations by default.
+        """
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=wait)
+            cls._executor = None
+            logger.debug("Database executor shutdown")
+
+
+async def runDbOperation(operation: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking database operation in the database executor.
+
+    Arguments:
+        operation: The blocking function to run.
+        *args: The positional arguments for the function.
+        **kwargs: The keyword arguments for the function.
+
+    Returns:
+        Any: The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        DatabaseExecutor.get_executor(),
+        functools.partial(operation, *args, **kwargs)
+    )
@@ -0,0 +1,198 @@
+"""
+This file contains the migration from per-guild databases to the shared
+storage mode.
+
+Every "<guild_id>_db" database is copied in bulk into the shared collections
+with a guild_id field added to each document and its _id scoped by the
+guild. The migration can be re-run, documents that were already copied by
+the same guild are skipped. With --drop a guild database is only dropped
+once every one of its documents was found in the shared collections. A
+guild collection named like a collection of the bot ("_bot_...") is not
+copied, and its database is not dropped, rename it and run the migration
+again.
+
+Usage:
+    python -m helpers.database.migrate [--batch-size N] [--workers N] [--drop]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from helpers.database.connection import closeDbConnection, getDbConnection
+from helpers.database.tenancy import (
+    DUPLICATE_KEY_ERROR,
+    GUILD_ID_FIELD,
+    ensureGuildIndexes,
+    getSharedDatabaseName,
+    guildIdFromDatabase,
+    isReservedCollection,
+    registerGuild,
+    scopeDocument,
+)
+
+logger = logging.getLogger("discord.db.migrate")
+
+
+def copyBatch(
+        db_connection: MongoClient,
+        collection_name: str,
+        guild_id: int,
+        documents: list) -> int:
+    """
+    Copy a batch of scoped documents of a guild into a shared collection.
+
+    A duplicate key is only skipped when the document with that _id was
+    already copied for the same guild, any other conflict is raised.
+
+    Returns:
+        int: The number of documents copied, documents that were already
+        copied by an earlier run are not counted.
+    """
+    collection = db_connection[getSharedDatabaseName()][collection_name]
+
+    try:
+        return len(collection.insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as error:
+        write_errors = error.details["writeErrors"]
+        if any(write_error["code"] != DUPLICATE_KEY_ERROR for write_error in write_errors):
+            raise
+
+        duplicate_ids = [write_error["op"]["_id"] for write_error in write_errors]
+        already_copied = collection.count_documents(
+            {"_id": {"$in": duplicate_ids}, GUILD_ID_FIELD: guild_id})
+
+        # the key of another unique index, or an _id taken by another guild
+        if already_copied != len(duplicate_ids):
+            raise
+
+        return error.details["nInserted"]
+
+
+def verifyBatch(db_connection: MongoClient, collection_name: str, documents: list) -> bool:
+    """
+    Check that every document of a batch is in the shared collection.
+    """
+    document_ids = [document["_id"] for document in documents]
+
+    return db_connection[getSharedDatabaseName()][collection_name].count_documents(
+        {"_id": {"$in": document_ids}}) == len(document_ids)
+
+
+def migrateGuildDatabase(
+        db_connection: MongoClient,
+        database_name: str,
+        batch_size: int,
+        drop: bool) -> int:
+    """
+    Copy one per-guild database into the shared collections.
+
+    Returns:
+        int: The number of documents copied.
+    """
+    guild_id = guildIdFromDatabase(database_name)
+    database = db_connection[database_name]
+    copied = 0
+    verified = True
+
+    def flush(collection_name: str, batch: list) -> int:
+        nonlocal verified
+        batch_copied = copyBatch(db_connection, collection_name, guild_id, batch)
+        verified = verifyBatch(db_connection, collection_name, batch) and verified
+        return batch_copied
+
+    for collection_name in database.list_collection_names():
+        if isReservedCollection(database_name, collection_name):
+            logger.error("Not copying %s.%s, the name is reserved for the bot",
+                         database_name, collection_name)
+            verified = False
+            continue
+
+        ensureGuildIndexes(db_connection, collection_name)
+
+        batch = []
+        for document in database[collection_name].find({}, batch_size=batch_size):
+            batch.append(scopeDocument(document, guild_id))
+            if len(batch) >= batch_size:
+                copied += flush(collection_name, batch)
+                batch = []
+
+        if batch:
+            copied += flush(collection_name, batch)
+
+    registerGuild(db_connection, guild_id)
+
+    if drop and verified:
+        db_connection.drop_database(database_name)
+    elif drop:
+        logger.error("Not dropping %s, some of its documents are missing "
+                     "from the shared collections", database_name)
+
+    logger.info("Migrated %s documents from %s", copied, database_name)
+    return copied
+
+
+def migrateToSharedStorage(
+        db_connection: MongoClient,
+        batch_size: int = 1000,
+        workers: int = 4,
+        drop: bool = False) -> int:
+    """
+    Copy every per-guild database into the shared collections.
+
+    Arguments:
+        db_connection: The database connection.
+        batch_size: The number of documents written per insert.
+        workers: The number of guild databases migrated at the same time.
+        drop: Whether to drop each guild database once it was copied and verified.
+
+    Returns:
+        int: The number of documents copied.
+    """
+    start = time.perf_counter()
+    database_names = [
+        name for name in db_connection.list_database_names()
+        if guildIdFromDatabase(name) is not None
+    ]
+
+    logger.info("Migrating %s guild databases", len(database_names))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        copied = sum(executor.map(
+            lambda name: migrateGuildDatabase(db_connection, name, batch_size, drop),
+            database_names))
+
+    logger.info("Migrated %s documents from %s guild databases in %.2fs",
+                copied,
+                len(database_names),
+                time.perf_counter() - start)
+    return copied
+
+
+def main() -> None:
+    """
+    Run the migration from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Move the per-guild databases into the shared storage mode.")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="documents written per insert (default: 1000)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="guild databases migrated at the same time (default: 4)")
+    parser.add_argument("--drop", action="store_true",
+                        help="drop each guild database once it was copied and verified")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+
+    try:
+        migrateToSharedStorage(getDbConnection(), args.batch_size, args.workers, args.drop)
+    finally:
+        closeDbConnection()
+
+
+if __name__ == "__main__":
+    main()
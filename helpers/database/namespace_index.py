@@ -0,0 +1,252 @@
+"""
+This file contains the in-process index of existing databases and collections.
+
+The validation helpers use it to answer "does this database/collection exist"
+without listing every database or collection on each operation. The index is
+warmed once, kept up to date by our own create/drop helpers and refreshed
+after a TTL or, optionally, from a change stream.
+"""
+
+import logging
+import os
+import threading
+import time
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from helpers.database.cache import hitCounters
+
+logger = logging.getLogger("discord.db.namespace")
+
+
+class NamespaceIndex: # pylint: disable=too-many-instance-attributes
+    """
+    This class caches the database and collection names of a mongoDB client.
+    """
+
+    def __init__(self, ttl: float):
+        """
+        Initialize the index.
+
+        Arguments:
+            ttl: The number of seconds before a listing is refreshed.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._client_id: int | None = None
+        self._databases: set[str] = set()
+        self._databases_loaded_at: float | None = None
+        self._collections: dict[str, set[str]] = {}
+        self._collections_loaded_at: dict[str, float] = {}
+
+    def _is_stale(self, loaded_at: float | None) -> bool:
+        """
+        Check if a listing needs to be refreshed.
+        """
+        return loaded_at is None or time.monotonic() - loaded_at > self.ttl
+
+    def _bind(self, db_connection: MongoClient) -> None:
+        """
+        Reset the index when it is used with a different client.
+        """
+        if self._client_id != id(db_connection):
+            self._client_id = id(db_connection)
+            self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forget every cached listing.
+        """
+        self._databases = set()
+        self._databases_loaded_at = None
+        self._collections = {}
+        self._collections_loaded_at = {}
+
+    def warm(self, db_connection: MongoClient) -> None:
+        """
+        Load the database names in a single round trip.
+        """
+        names = set(db_connection.list_database_names())
+
+        with self._lock:
+            self._bind(db_connection)
+            self._databases = names
+            self._databases_loaded_at = time.monotonic()
+
+        logger.debug("Namespace index warmed with %s databases", len(names))
+
+    def database_names(self, db_connection: MongoClient) -> set[str]:
+        """
+        List the database names in a single round trip, warming the index.
+        """
+        self.warm(db_connection)
+
+        with self._lock:
+            return set(self._databases)
+
+    def database_exists(self, db_connection: MongoClient, database_name: str) -> bool:
+        """
+        Check if a database exists, listing the databases only when stale.
+        """
+        with self._lock:
+            self._bind(db_connection)
+            if not self._is_stale(self._databases_loaded_at):
+                self.hits += 1
+                return database_name in self._databases
+            self.misses += 1
+
+        self.warm(db_connection)
+
+        with self._lock:
+            return database_name in self._databases
+
+    def collection_exists(
+            self,
+            db_connection: MongoClient,
+            database_name: str,
+            collection_name: str) -> bool:
+        """
+        Check if a collection exists, listing the collections only when stale.
+        """
+        with self._lock:
+            self._bind(db_connection)
+            if not self._is_stale(self._collections_loaded_at.get(database_name)):
+                self.hits += 1
+                return collection_name in self._collections[database_name]
+            self.misses += 1
+
+        names = set(db_connection[database_name].list_collection_names())
+
+        with self._lock:
+            self._collections[database_name] = names
+            self._collections_loaded_at[database_name] = time.monotonic()
+            if names:
+                self._databases.add(database_name)
+            return collection_name in names
+
+    def add_database(self, database_name: str) -> None:
+        """
+        Record a database created by this process.
+        """
+        with self._lock:
+            self._databases.add(database_name)
+
+    def drop_database(self, database_name: str) -> None:
+        """
+        Record a database dropped by this process.
+        """
+        with self._lock:
+            self._databases.discard(database_name)
+            self._collections[database_name] = set()
+            self._collections_loaded_at[database_name] = time.monotonic()
+
+    def add_collection(self, database_name: str, collection_name: str) -> None:
+        """
+        Record a collection created by this process.
+        """
+        with self._lock:
+            self._databases.add(database_name)
+            if database_name in self._collections:
+                self._collections[database_name].add(collection_name)
+
+    def drop_collection(self, database_name: str, collection_name: str) -> None:
+        """
+        Record a collection dropped by this process.
+        """
+        with self._lock:
+            if database_name in self._collections:
+                self._collections[database_name].discard(collection_name)
+
+    def invalidate(self) -> None:
+        """
+        Force the next lookups to refresh from the database.
+        """
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        """
+        Get the hit and miss counters of the index.
+        """
+        with self._lock:
+            return {
+                **hitCounters(self.hits, self.misses),
+                "databases": len(self._databases),
+                "indexed_collections": sum(len(names) for names in self._collections.values()),
+            }
+
+
+# The process wide index, refreshed every DISCORD_MONGO_DB_NAMESPACE_TTL seconds
+namespace_index = NamespaceIndex(float(os.getenv("DISCORD_MONGO_DB_NAMESPACE_TTL", "300")))
+
+
+def getNamespaceIndexStats() -> dict:
+    """
+    Get the hit and miss counters of the namespace index.
+
+    Returns:
+        dict: The counters, hit ratio and number of indexed names.
+    """
+    return namespace_index.stats()
+
+
+def applyChangeEvent(change: dict) -> None:
+    """
+    Apply a change stream event to the namespace index.
+
+    Arguments:
+        change: The change stream event document.
+    """
+    operation = change.get("operationType")
+    namespace = change.get("ns", {})
+    database_name = namespace.get("db")
+    collection_name = namespace.get("coll")
+
+    if operation == "dropDatabase":
+        namespace_index.drop_database(database_name)
+    elif operation == "drop":
+        namespace_index.drop_collection(database_name, collection_name)
+    elif operation == "create":
+        namespace_index.add_collection(database_name, collection_name)
+    elif operation == "rename":
+        namespace_index.drop_collection(database_name, collection_name)
+        target = change.get("to", {})
+        namespace_index.add_collection(target.get("db"), target.get("coll"))
+    elif operation == "invalidate":
+        namespace_index.invalidate()
+
+
+def watchNamespaceChanges(db_connection: MongoClient) -> None:
+    """
+    Keep the namespace index up to date from a cluster wide change stream.
+
+    This blocks, so it should be run in its own thread. Change streams need a
+    replica set; on a standalone server the index falls back to the TTL.
+    """
+    pipeline = [{"$match": {"operationType": {
+        "$in": ["create", "drop", "dropDatabase", "rename", "invalidate"]
+    }}}]
+
+    try:
+        with db_connection.watch(pipeline, show_expanded_events=True) as stream:
+            logger.info("Watching namespace changes")
+            for change in stream:
+                applyChangeEvent(change)
+    except PyMongoError as error:
+        logger.warning("Namespace change stream stopped, using the TTL only: %s", error)
+
+
+def startNamespaceWatcher(db_connection: MongoClient) -> threading.Thread:
+    """
+    Start watching namespace changes in a daemon thread.
+    """
+    watcher = threading.Thread(
+        target=watchNamespaceChanges,
+        args=(db_connection,),
+        name="discord-db-namespace-watcher",
+        daemon=True
+    )
+    watcher.start()
+
+    return watcher
@@ -2,28 +2,52 @@
 This file contains the read operations for the database.
 """
 import logging
-from typing import Any
-from pymongo import MongoClient
-from validation import validateMultipleStrings
+from itertools import islice
+from typing import Any, Iterator
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.cursor import Cursor
+from helpers.database.cache import document_cache
+from helpers.database.tenancy import routeNamespace, scopeQuery, unscopeDocument
+from helpers.database.validation import validateNamespace
 
 logger = logging.getLogger("discord.db.read")
 
+# The number of documents fetched per round trip by the cursors
+DEFAULT_BATCH_SIZE = 100
+
 def fetchOneDocument(
         db: MongoClient,
         database_name: str,
         collection_name: str,
-        query: Any) -> dict:
+        query: Any,
+        use_cache: bool = True) -> dict:
     """
     Fetch one document from the collection in the mongoDB database.
+
+    Lookups are answered from the document cache when possible, set
+    use_cache to False to always read from the database.
     """
 
     # validate the database and collection names
-    if not validateMultipleStrings(database_name, collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return {}
 
+    if use_cache:
+        cached = document_cache.get(database_name, collection_name, query)
+        if cached is not None:
+            return cached
+        generation = document_cache.generation(database_name, collection_name)
+
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # fetch one document
-    document = db[database_name][collection_name].find_one(query)
+    document = unscopeDocument(
+        db[shared_database_name][collection_name].find_one(scopeQuery(query, guild_id)),
+        guild_id)
+
+    if use_cache:
+        document_cache.put(database_name, collection_name, query, document or {}, generation)
 
     if document:
         logger.info("Document fetched successfully")
@@ -42,12 +66,18 @@ def fetchAllDocuments(
     Fetch all documents from the collection in the mongoDB database.
     """
 
-    if not validateMultipleStrings(database_name, collection_name):
+    if not validateNamespace(database_name, collection_name):
         logger.error("Invalid database or collection name.")
         return False
 
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # fetch all documents
-    documents = list(db[database_name][collection_name].find(query))
+    documents = [
+        unscopeDocument(document, guild_id)
+        for document in db[shared_database_name][collection_name].find(
+            scopeQuery(query, guild_id))
+    ]
 
     if documents:
         logger.info("Documents fetched successfully")
@@ -55,3 +85,205 @@ def fetchAllDocuments(
 
     logger.error("Documents not found")
     return False
+
+
+def openCursor( # pylint: disable=too-many-arguments
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        *,
+        projection: Any = None,
+        sort: list | None = None,
+        limit: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> Cursor | None:
+    """
+    Open a cursor on the collection in the mongoDB database.
+
+    Arguments:
+        db: The database connection.
+        database_name: The name of the database.
+        collection_name: The name of the collection.
+        query: The filter of the documents.
+        projection: The fields to return, all fields by default.
+        sort: A list of (key, direction) pairs to sort by.
+        limit: The maximum number of documents, 0 for no limit.
+        batch_size: The number of documents fetched per round trip.
+
+    Returns:
+        Cursor | None: The cursor, or None if the names are invalid.
+    """
+
+    if not validateNamespace(database_name, collection_name):
+        logger.error("Invalid database or collection name.")
+        return None
+
+    database_name, guild_id = routeNamespace(database_name)
+
+    return db[database_name][collection_name].find(
+        scopeQuery(query, guild_id),
+        projection,
+        sort=sort,
+        limit=limit,
+        batch_size=batch_size)
+
+
+def nextBatch(cursor: Cursor, batch_size: int, guild_id: int | None = None) -> list:
+    """
+    Read the next batch of documents from a cursor.
+
+    Arguments:
+        cursor: The cursor opened by openCursor.
+        batch_size: The number of documents to read.
+        guild_id: The guild the cursor is scoped by, to give the documents
+            back their original _id.
+
+    Returns:
+        list: Up to batch_size documents, empty once the cursor is exhausted.
+    """
+    return [unscopeDocument(document, guild_id) for document in islice(cursor, batch_size)]
+
+
+def streamDocuments( # pylint: disable=too-many-arguments
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        *,
+        projection: Any = None,
+        sort: list | None = None,
+        limit: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[list]:
+    """
+    Stream the documents from the collection in batches.
+
+    Only one batch is held in memory at a time, so memory use does not grow
+    with the size of the collection. See openCursor for the arguments.
+
+    Yields:
+        list: The next batch of up to batch_size documents.
+    """
+
+    cursor = openCursor(
+        db,
+        database_name,
+        collection_name,
+        query,
+        projection=projection,
+        sort=sort,
+        limit=limit,
+        batch_size=batch_size)
+
+    if cursor is None:
+        return
+
+    _, guild_id = routeNamespace(database_name)
+
+    with cursor:
+        while batch := nextBatch(cursor, batch_size, guild_id):
+            yield batch
+
+
+def fieldValue(document: dict, key: str) -> Any:
+    """
+    Get the value of a field of a document, following the dots of a nested key.
+    """
+    value: Any = document
+    for field in key.split("."):
+        value = value[field]
+
+    return value
+
+
+def projectField(projection: dict, key: str) -> dict:
+    """
+    Make a projection return a field, a nested field with a dotted key.
+
+    An inclusion projection gets the field, unless its parent is included
+    already, and loses the nested fields of the field, mongoDB rejects a
+    projection of both. An exclusion projection loses every exclusion of the
+    field, its parents and its nested fields.
+    """
+    fields = key.split(".")
+    parents = {".".join(fields[:depth]) for depth in range(1, len(fields))}
+    remaining = {field: value for field, value in projection.items()
+                 if not field.startswith(f"{key}.")}
+
+    if not any(projection.values()):
+        return {field: value for field, value in remaining.items()
+                if field != key and field not in parents}
+
+    if parents & remaining.keys():
+        return remaining
+
+    return {**remaining, key: 1}
+
+
+def fetchPage( # pylint: disable=too-many-arguments
+        db: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        *,
+        page_size: int = 50,
+        after: Any = None,
+        key: str = "_id",
+        descending: bool = False,
+        projection: Any = None) -> tuple[list, Any]:
+    """
+    Fetch a page of documents using keyset pagination.
+
+    Instead of skipping over the previous pages, the next page starts after
+    the last key of the previous one, so every page costs the same.
+
+    Arguments:
+        db: The database connection.
+        database_name: The name of the database.
+        collection_name: The name of the collection.
+        query: The filter of the documents, None for every document.
+        page_size: The number of documents in a page.
+        after: The key returned with the previous page, None for the first page.
+        key: The unique, indexed field to paginate on, a dotted key for a
+            nested field.
+        descending: Whether to page from the highest key down.
+        projection: The fields to return, the key and _id are always included.
+
+    Returns:
+        tuple[list, Any]: The documents of the page and the key to pass as
+        after for the next page, or None when there are no more pages.
+    """
+
+    query = query or {}
+
+    if after is not None:
+        query = {"$and": [query, {key: {"$lt" if descending else "$gt": after}}]}
+
+    if isinstance(projection, (list, tuple)):
+        projection = dict.fromkeys(projection, 1)
+
+    # the key is read for the next page, an empty projection would only return _id
+    if isinstance(projection, dict):
+        projection = projectField(projectField(projection, key), "_id") or None
+
+    cursor = openCursor(
+        db,
+        database_name,
+        collection_name,
+        query,
+        projection=projection,
+        sort=[(key, DESCENDING if descending else ASCENDING)],
+        limit=page_size,
+        batch_size=page_size)
+
+    if cursor is None:
+        return [], None
+
+    _, guild_id = routeNamespace(database_name)
+
+    with cursor:
+        documents = [unscopeDocument(document, guild_id) for document in cursor]
+
+    if len(documents) < page_size:
+        return documents, None
+
+    return documents, fieldValue(documents[-1], key)
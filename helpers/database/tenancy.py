@@ -0,0 +1,420 @@
+"""
+This file contains the storage mode routing for per-guild data.
+
+By default every guild gets its own "<guild_id>_db" database. In the shared
+storage mode the guild databases are mapped onto shared collections of a
+single database, and every document carries a guild_id field that is used as
+the shard key and the prefix of the compound indexes. The _id of a document
+is stored as {"guild_id": ..., "_id": ...}, so two guilds can use the same
+_id, and the helpers give back the original _id on reads. The collections of
+the bot itself in the shared database start with "_bot_", guild databases
+cannot use such collection names so they never land in them. The create, read,
+update and delete helpers route through here, so callers keep using the
+"<guild_id>_db" names in both modes.
+
+The storage mode is set with the environment variables:
+    - DISCORD_MONGO_DB_STORAGE_MODE ("per_guild" or "shared", default: "per_guild")
+    - DISCORD_MONGO_DB_SHARED_DATABASE (default: "botocat")
+    - DISCORD_MONGO_DB_SHARD_COLLECTIONS (default: "False")
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import BulkWriteError, OperationFailure
+
+logger = logging.getLogger("discord.db.tenancy")
+
+STORAGE_MODE_PER_GUILD = "per_guild"
+STORAGE_MODE_SHARED = "shared"
+
+# The collections of the bot in the shared database start with this prefix
+RESERVED_COLLECTION_PREFIX = "_bot_"
+
+# The collection of the shared database that records the provisioned guilds
+GUILDS_COLLECTION = f"{RESERVED_COLLECTION_PREFIX}guilds"
+
+# The field every document in a shared collection is scoped by
+GUILD_ID_FIELD = "guild_id"
+
+GUILD_DATABASE_PATTERN = re.compile(r"^(\d+)_db$")
+
+# The mongoDB error code of a duplicate key
+DUPLICATE_KEY_ERROR = 11000
+
+# The query operators that hold a list of queries
+LOGICAL_OPERATORS = ("$and", "$or", "$nor")
+
+# Collections whose guild indexes were already ensured by this process
+_indexed_collections: set[str] = set()
+
+
+class RegisteredGuilds:
+    """
+    This class caches the ids of the guilds registered in the shared storage.
+    """
+
+    def __init__(self, ttl: float):
+        """
+        Initialize the cache.
+
+        Arguments:
+            ttl: The number of seconds before the registered guilds are listed again.
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._client_id: int | None = None
+        self._guild_ids: set[int] = set()
+        self._loaded_at: float | None = None
+
+    def contains(self, db_connection: MongoClient, guild_id: int) -> bool:
+        """
+        Check if a guild is registered, listing the guilds only when stale.
+        """
+        with self._lock:
+            if (self._client_id == id(db_connection) and self._loaded_at is not None
+                    and time.monotonic() - self._loaded_at <= self.ttl):
+                return guild_id in self._guild_ids
+
+        guild_ids = fetchRegisteredGuilds(db_connection)
+
+        with self._lock:
+            self._client_id = id(db_connection)
+            self._guild_ids = guild_ids
+            self._loaded_at = time.monotonic()
+            return guild_id in guild_ids
+
+    def add(self, guild_ids: list[int]) -> None:
+        """
+        Record guilds registered by this process.
+        """
+        with self._lock:
+            self._guild_ids.update(guild_ids)
+
+    def discard(self, guild_ids: list[int]) -> None:
+        """
+        Record guilds purged by this process.
+        """
+        with self._lock:
+            self._guild_ids.difference_update(guild_ids)
+
+    def invalidate(self) -> None:
+        """
+        Force the next lookup to list the registered guilds again.
+        """
+        with self._lock:
+            self._guild_ids = set()
+            self._loaded_at = None
+
+
+# The process wide cache of the registered guilds
+registered_guilds = RegisteredGuilds(float(os.getenv("DISCORD_MONGO_DB_NAMESPACE_TTL", "300")))
+
+
+def getStorageMode() -> str:
+    """
+    Get the configured storage mode.
+    """
+    return os.getenv("DISCORD_MONGO_DB_STORAGE_MODE", STORAGE_MODE_PER_GUILD)
+
+
+def isSharedStorage() -> bool:
+    """
+    Check if guild data is kept in shared collections.
+    """
+    return getStorageMode() == STORAGE_MODE_SHARED
+
+
+def getSharedDatabaseName() -> str:
+    """
+    Get the name of the database holding the shared collections.
+    """
+    return os.getenv("DISCORD_MONGO_DB_SHARED_DATABASE", "botocat")
+
+
+def guildDatabaseName(guild_id: int) -> str:
+    """
+    Get the per-guild database name of a guild.
+    """
+    return f"{guild_id}_db"
+
+
+def guildIdFromDatabase(database_name: str) -> int | None:
+    """
+    Get the guild id from a per-guild database name.
+
+    Returns:
+        int | None: The guild id, or None if this is not a guild database.
+    """
+    match = GUILD_DATABASE_PATTERN.match(database_name)
+
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
+def isReservedCollection(database_name: str, collection_name: str) -> bool:
+    """
+    Check if a guild database uses the name of a collection of the bot.
+    """
+    return (guildIdFromDatabase(database_name) is not None
+            and collection_name.startswith(RESERVED_COLLECTION_PREFIX))
+
+
+def routeNamespace(database_name: str) -> tuple[str, int | None]:
+    """
+    Route a database name to where its data is stored.
+
+    Returns:
+        tuple[str, int | None]: The database to use, and the guild id to
+        scope by, which is None unless a guild database is routed to the
+        shared collections.
+    """
+    if not isSharedStorage():
+        return database_name, None
+
+    guild_id = guildIdFromDatabase(database_name)
+
+    if guild_id is None:
+        return database_name, None
+
+    return getSharedDatabaseName(), guild_id
+
+
+def scopeId(value: Any, guild_id: int) -> Any:
+    """
+    Turn the _id condition of a query into the condition on the scoped _id.
+
+    Returns:
+        Any: The exact scoped _id for a value, the operators for an operator
+        expression, which then apply to the "_id._id" field.
+    """
+    if isinstance(value, dict) and value and all(key.startswith("$") for key in value):
+        return value
+
+    return {GUILD_ID_FIELD: guild_id, "_id": value}
+
+
+def scopeIds(query: dict, guild_id: int) -> dict:
+    """
+    Rewrite the _id conditions of a query, also in $and, $or and $nor.
+    """
+    scoped = {}
+
+    for key, value in query.items():
+        if key == "_id":
+            scoped_id = scopeId(value, guild_id)
+            scoped["_id._id" if scoped_id is value else "_id"] = scoped_id
+        elif key in LOGICAL_OPERATORS and isinstance(value, list):
+            scoped[key] = [scopeIds(clause, guild_id) if isinstance(clause, dict) else clause
+                           for clause in value]
+        else:
+            scoped[key] = value
+
+    return scoped
+
+
+def scopeQuery(query: Any, guild_id: int | None) -> Any:
+    """
+    Restrict a query to the documents of a guild.
+    """
+    if guild_id is None:
+        return query
+
+    if not query:
+        return {GUILD_ID_FIELD: guild_id}
+
+    if isinstance(query, dict):
+        query = scopeIds(query, guild_id)
+
+        if GUILD_ID_FIELD not in query:
+            return {GUILD_ID_FIELD: guild_id, **query}
+
+    return {"$and": [query, {GUILD_ID_FIELD: guild_id}]}
+
+
+def scopeDocument(document: dict, guild_id: int | None) -> dict:
+    """
+    Tag a document with the guild it belongs to and scope its _id by the
+    guild, generating the _id if the document has none.
+    """
+    if guild_id is None:
+        return document
+
+    original_id = document["_id"] if "_id" in document else ObjectId()
+
+    return {
+        **document,
+        "_id": {GUILD_ID_FIELD: guild_id, "_id": original_id},
+        GUILD_ID_FIELD: guild_id,
+    }
+
+
+def unscopeDocument(document: Any, guild_id: int | None) -> Any:
+    """
+    Give a document read from a shared collection back its original _id.
+    """
+    if guild_id is None or not isinstance(document, dict):
+        return document
+
+    scoped_id = document.get("_id")
+    if isinstance(scoped_id, dict) and "_id" in scoped_id:
+        return {**document, "_id": scoped_id["_id"]}
+
+    return document
+
+
+def ensureGuildIndexes(db_connection: MongoClient, collection_name: str) -> None:
+    """
+    Create the guild_id compound index of a shared collection, and shard the
+    collection on it when DISCORD_MONGO_DB_SHARD_COLLECTIONS is True.
+    """
+    if collection_name in _indexed_collections:
+        return
+
+    database_name = getSharedDatabaseName()
+    shard_key = [(GUILD_ID_FIELD, ASCENDING), ("_id", ASCENDING)]
+
+    db_connection[database_name][collection_name].create_index(shard_key)
+
+    # a guild is registered at most once
+    if collection_name == GUILDS_COLLECTION:
+        db_connection[database_name][collection_name].create_index(
+            GUILD_ID_FIELD, unique=True)
+
+    if os.getenv("DISCORD_MONGO_DB_SHARD_COLLECTIONS", "False") == "True":
+        try:
+            db_connection.admin.command(
+                "shardCollection",
+                f"{database_name}.{collection_name}",
+                key=dict(shard_key))
+        except OperationFailure as error:
+            logger.warning("Could not shard collection %s: %s", collection_name, error)
+
+    _indexed_collections.add(collection_name)
+
+
+def registerGuild(db_connection: MongoClient, guild_id: int) -> bool:
+    """
+    Record a guild as provisioned in the _bot_guilds collection of the shared
+    database, which is kept in both storage modes.
+
+    Returns:
+        bool: True if the guild was added, False if it was already provisioned.
+    """
+    ensureGuildIndexes(db_connection, GUILDS_COLLECTION)
+
+    result = db_connection[getSharedDatabaseName()][GUILDS_COLLECTION].update_one(
+        {GUILD_ID_FIELD: guild_id},
+        {"$setOnInsert": {GUILD_ID_FIELD: guild_id}},
+        upsert=True)
+    registered_guilds.add([guild_id])
+
+    return result.upserted_id is not None
+
+
+def registerGuilds(db_connection: MongoClient, guild_ids: list[int]) -> int:
+    """
+    Record many guilds as provisioned in one bulk write.
+
+    Guilds that were already registered are skipped by the unique index.
+
+    Returns:
+        int: The number of guilds that were added.
+    """
+    if not guild_ids:
+        return 0
+
+    ensureGuildIndexes(db_connection, GUILDS_COLLECTION)
+
+    try:
+        result = db_connection[getSharedDatabaseName()][GUILDS_COLLECTION].insert_many(
+            [{GUILD_ID_FIELD: guild_id} for guild_id in guild_ids],
+            ordered=False)
+    except BulkWriteError as error:
+        if any(write_error["code"] != DUPLICATE_KEY_ERROR
+               for write_error in error.details["writeErrors"]):
+            raise
+        registered_guilds.add(guild_ids)
+        return error.details["nInserted"]
+
+    registered_guilds.add(guild_ids)
+    return len(result.inserted_ids)
+
+
+def unregisterGuild(db_connection: MongoClient, guild_id: int) -> bool:
+    """
+    Forget a provisioned guild, the shared storage purges its guilds with
+    purgeGuild instead.
+
+    Returns:
+        bool: True if the guild was registered, False otherwise.
+    """
+    registered_guilds.discard([guild_id])
+
+    return db_connection[getSharedDatabaseName()][GUILDS_COLLECTION].delete_one(
+        {GUILD_ID_FIELD: guild_id}).deleted_count > 0
+
+
+def fetchRegisteredGuilds(db_connection: MongoClient) -> set[int]:
+    """
+    Get the ids of every registered guild.
+    """
+    return set(
+        db_connection[getSharedDatabaseName()][GUILDS_COLLECTION].distinct(GUILD_ID_FIELD))
+
+
+def purgeGuilds(db_connection: MongoClient, guild_ids: list[int]) -> int:
+    """
+    Delete the documents of many guilds from every shared collection.
+
+    Returns:
+        int: The number of deleted documents.
+    """
+    if not guild_ids:
+        return 0
+
+    database = db_connection[getSharedDatabaseName()]
+    query = {GUILD_ID_FIELD: {"$in": guild_ids}}
+    registered_guilds.discard(guild_ids)
+
+    return sum(
+        database[name].delete_many(query).deleted_count
+        for name in database.list_collection_names())
+
+
+def purgeGuild(
+        db_connection: MongoClient,
+        guild_id: int,
+        collection_name: str | None = None) -> int:
+    """
+    Delete the documents of a guild from the shared collections.
+
+    Arguments:
+        db_connection: The database connection.
+        guild_id: The guild to delete.
+        collection_name: Only purge this collection, by default the guild is
+            purged from every shared collection and unregistered.
+
+    Returns:
+        int: The number of deleted documents.
+    """
+    database = db_connection[getSharedDatabaseName()]
+
+    if collection_name is not None:
+        collection_names = [collection_name]
+    else:
+        collection_names = database.list_collection_names()
+        registered_guilds.discard([guild_id])
+
+    deleted = 0
+    for name in collection_names:
+        deleted += database[name].delete_many({GUILD_ID_FIELD: guild_id}).deleted_count
+
+    return deleted
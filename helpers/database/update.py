@@ -4,6 +4,8 @@ This file contains the update operations for the database.
 import logging
 from typing import Any
 from pymongo import MongoClient
+from helpers.database.cache import document_cache
+from helpers.database.tenancy import isReservedCollection, routeNamespace, scopeQuery
 
 logger = logging.getLogger("discord.db.update")
 
@@ -17,9 +19,16 @@ def updateDocument(
     Update a document in the collection in the mongoDB database.
     """
 
+    if isReservedCollection(database_name, collection_name):
+        logger.error("Collection %s is reserved for the bot", collection_name)
+        return False
+
+    shared_database_name, guild_id = routeNamespace(database_name)
+
     # update the document
-    updated_document = db_connection[database_name][collection_name].update_one(
-        query, new_values)
+    updated_document = db_connection[shared_database_name][collection_name].update_one(
+        scopeQuery(query, guild_id), new_values)
+    document_cache.invalidate(database_name, collection_name)
 
     # check if the document was updated
     if updated_document.modified_count:
@@ -4,11 +4,14 @@ This file contains validation functions for database operations.
 
 import logging
 from pymongo import MongoClient
+from helpers.database.namespace_index import namespace_index
+from helpers.database.tenancy import isReservedCollection, registered_guilds, routeNamespace
 logger = logging.getLogger("discord.db.validation")
 
 def stringValidation(operation: str) -> bool:
     """
-    Validate the operation is alphanumeric.
+    Validate the operation is alphanumeric, underscores are allowed so the
+    "<guild_id>_db" guild database names pass.
 
     Arguments:
         operation: The operation to validate.
@@ -17,8 +20,8 @@ def stringValidation(operation: str) -> bool:
         bool: True if the operation is valid, False otherwise.
     """
 
-    # validate the string is just alphanumeric
-    if not operation.isalnum():
+    # validate the string is just alphanumeric or underscores
+    if not operation.replace("_", "").isalnum():
         logger.error("Value %s is not alphanumeric", operation)
         return False
 
@@ -60,6 +63,27 @@ def validateMultipleStrings(*args: str) -> bool:
 
     return True
 
+def validateNamespace(database_name: str, collection_name: str) -> bool:
+    """
+    Validate the names of a database and a collection, guild databases
+    cannot use the collections reserved for the bot.
+
+    Arguments:
+        database_name: The name of the database.
+        collection_name: The name of the collection.
+
+    Returns:
+        bool: True if the names are valid, False otherwise.
+    """
+    if not validateMultipleStrings(database_name, collection_name):
+        return False
+
+    if isReservedCollection(database_name, collection_name):
+        logger.error("Collection %s is reserved for the bot", collection_name)
+        return False
+
+    return True
+
 def validateInDatabase(
         db: MongoClient,
         db_command_loggeer: logging.Logger,
@@ -69,6 +93,9 @@ def validateInDatabase(
     """
     Validate the collection exists in the database.
 
+    The lookup is answered from the namespace index, which only lists the
+    databases or collections again once its TTL has expired.
+
     Arguments:
         db: The database connection.
         database_name: The name of the database.
@@ -78,15 +105,24 @@ def validateInDatabase(
         bool: True if the collection exists, False otherwise.
     """
 
+    # guild databases in the shared storage mode live in the shared database,
+    # they exist once the guild is registered
+    if database_name is not None:
+        shared_database_name, guild_id = routeNamespace(database_name)
+        if guild_id is not None and not registered_guilds.contains(db, guild_id):
+            db_command_loggeer.error("Database %s does not exist", database_name)
+            return False
+        database_name = shared_database_name
+
     # check if the database exists
     if database_name is not None and collection_name is None:
-        if database_name not in db.list_database_names():
+        if not namespace_index.database_exists(db, database_name):
             db_command_loggeer.error("Database %s does not exist", database_name)
             return False
 
     # check if the collection exists
     if collection_name is not None and database_name is not None:
-        if collection_name not in db[database_name].list_collection_names():
+        if not namespace_index.collection_exists(db, database_name, collection_name):
             db_command_loggeer.error("Collection %s does not exist", collection_name)
             return False
 
@@ -0,0 +1,236 @@
+"""
+This file contains the write-behind queue for high frequency document writes.
+
+Buffered inserts and updates are grouped per (database, collection) and sent
+with a single bulk_write once a batch is full or the flush interval expires.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any
+from pymongo import InsertOne, MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
+from helpers.database.cache import document_cache
+from helpers.database.executor import runDbOperation
+from helpers.database.namespace_index import namespace_index
+from helpers.database.tenancy import routeNamespace, scopeDocument, scopeQuery
+from helpers.database.validation import validateNamespace
+
+logger = logging.getLogger("discord.db.write_behind")
+
+
+def flushBatch(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        operations: list) -> bool:
+    """
+    Write a batch of buffered operations to the mongoDB collection.
+
+    Arguments:
+        db_connection: The database connection.
+        database_name: The name of the database.
+        collection_name: The name of the collection.
+        operations: The pymongo InsertOne/UpdateOne operations, in order.
+
+    Returns:
+        bool: True if the batch was written, False otherwise.
+    """
+
+    shared_database_name, _ = routeNamespace(database_name)
+
+    # check if the collection exists
+    if not namespace_index.collection_exists(
+            db_connection, shared_database_name, collection_name):
+        logger.error("Collection %s does not exist, dropping %s buffered writes",
+                     collection_name,
+                     len(operations))
+        return False
+
+    try:
+        result = db_connection[shared_database_name][collection_name].bulk_write(
+            operations,
+            ordered=True
+        )
+        document_cache.invalidate(database_name, collection_name)
+    except PyMongoError as error:
+        # part of an ordered batch may have been written before the error
+        document_cache.invalidate(database_name, collection_name)
+        logger.error("Failed to flush %s buffered writes to %s.%s: %s",
+                     len(operations),
+                     database_name,
+                     collection_name,
+                     error)
+        return False
+
+    if result.acknowledged:
+        logger.debug("Flushed %s buffered writes to %s.%s",
+                     len(operations),
+                     database_name,
+                     collection_name)
+        return True
+
+    logger.error(
+        "You shouldn't see this message, check that the buffered writes were flushed")
+    return False
+
+
+class WriteBehindQueue: # pylint: disable=too-many-instance-attributes
+    """
+    This class buffers document writes and flushes them in batches.
+
+    Arguments:
+        max_batch_size: The number of writes that triggers an early flush.
+        flush_interval: The number of seconds between timed flushes.
+        max_pending: The number of buffered writes before callers have to wait.
+    """
+
+    def __init__(self, max_batch_size: int, flush_interval: float, max_pending: int):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._batches: dict[tuple[str, str], list] = {}
+        self._connections: dict[tuple[str, str], MongoClient] = {}
+        self._flush_locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._pending = 0
+        self._condition = asyncio.Condition()
+        self._flush_task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of buffered writes that have not been flushed yet.
+        """
+        return self._pending
+
+    async def enqueue(
+            self,
+            db_connection: MongoClient,
+            database_name: str,
+            collection_name: str,
+            operation: InsertOne | UpdateOne) -> bool:
+        """
+        Buffer a write, waiting while the queue is full.
+
+        Returns:
+            bool: True if the write was buffered, False if the names are invalid.
+        """
+        if not validateNamespace(database_name, collection_name):
+            logger.error("Invalid database or collection name.")
+            return False
+
+        self._start()
+        namespace = (database_name, collection_name)
+
+        async with self._condition:
+            # apply backpressure until a flush frees some space
+            await self._condition.wait_for(lambda: self._pending < self.max_pending)
+
+            batch = self._batches.setdefault(namespace, [])
+            batch.append(operation)
+            self._connections[namespace] = db_connection
+            self._pending += 1
+            batch_full = len(batch) >= self.max_batch_size
+
+        if batch_full:
+            await self._flush_namespace(namespace)
+
+        return True
+
+    async def flush(self) -> None:
+        """
+        Flush every buffered write.
+        """
+        for namespace in list(self._batches):
+            await self._flush_namespace(namespace)
+
+    async def close(self) -> None:
+        """
+        Stop the timed flushes and flush every buffered write.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def _start(self) -> None:
+        """
+        Start the timed flush task if it is not running.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """
+        Flush the buffered writes every flush interval.
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            # always flush what is left when the loop shuts the task down
+            await self.flush()
+
+    async def _flush_namespace(self, namespace: tuple[str, str]) -> None:
+        """
+        Flush the buffered writes of a single collection.
+
+        Flushes of the same collection are serialized so batches reach the
+        database in the order they were buffered.
+        """
+        flush_lock = self._flush_locks.setdefault(namespace, asyncio.Lock())
+
+        async with flush_lock:
+            async with self._condition:
+                operations = self._batches.pop(namespace, [])
+                db_connection = self._connections.pop(namespace, None)
+                self._pending -= len(operations)
+                self._condition.notify_all()
+
+            if operations and db_connection is not None:
+                await runDbOperation(flushBatch, db_connection, *namespace, operations)
+
+
+# The process wide write-behind queue
+write_behind_queue = WriteBehindQueue(
+    max_batch_size=int(os.getenv("DISCORD_MONGO_DB_WRITE_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("DISCORD_MONGO_DB_WRITE_FLUSH_INTERVAL", "1.0")),
+    max_pending=int(os.getenv("DISCORD_MONGO_DB_WRITE_MAX_PENDING", "10000")),
+)
+
+
+async def bufferInsertOneDocument(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        document: dict) -> bool:
+    """
+    Buffer a document insert in the write-behind queue.
+    """
+    _, guild_id = routeNamespace(database_name)
+
+    return await write_behind_queue.enqueue(
+        db_connection,
+        database_name,
+        collection_name,
+        InsertOne(scopeDocument(document, guild_id)))
+
+
+async def bufferUpdateDocument(
+        db_connection: MongoClient,
+        database_name: str,
+        collection_name: str,
+        query: Any,
+        new_values: Any) -> bool:
+    """
+    Buffer a document update in the write-behind queue.
+    """
+    _, guild_id = routeNamespace(database_name)
+
+    return await write_behind_queue.enqueue(
+        db_connection,
+        database_name,
+        collection_name,
+        UpdateOne(scopeQuery(query, guild_id), new_values))
@@ -7,6 +7,8 @@ import logging
 from pymongo import MongoClient
 from discord import Guild
 from helpers.database.create import createDatabase
+from helpers.database.executor import runDbOperation
+from helpers.database.tenancy import guildDatabaseName
 
 logger = logging.getLogger("discord.guilds.add")
 
@@ -15,9 +17,12 @@ def addGuild(
         guild: Guild) -> bool:
     """
     Add a new guild to the database.
+
+    In the shared storage mode the guild is registered in the shared
+    collections instead of getting its own database.
     """
 
-    database_name = str(guild.id) + "_db"
+    database_name = guildDatabaseName(guild.id)
 
     # create the database
     guild_created = createDatabase(db_connection, database_name)
@@ -33,3 +38,12 @@ def addGuild(
         guild.name)
 
     return False
+
+
+async def asyncAddGuild(
+        db_connection: MongoClient,
+        guild: Guild) -> bool:
+    """
+    Add a new guild to the database without blocking the event loop.
+    """
+    return await runDbOperation(addGuild, db_connection, guild)
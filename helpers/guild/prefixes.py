@@ -0,0 +1,224 @@
+"""
+This file contains the per-guild command prefixes.
+
+The prefixes are stored in the "_bot_prefixes" collection of the shared
+database, one {"guild_id", "prefix"} document per guild that changed its
+prefix, kept unique by an index on guild_id. They are loaded in bulk into
+the prefix index when the bot starts and the index is updated on every
+write, so resolving the prefix of a message is a dictionary lookup without
+any I/O.
+Guilds without their own prefix use the default prefix from
+DISCORD_BOT_COMMAND_PREFIX.
+"""
+
+import logging
+from discord import Message
+from discord.ext import commands
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+from helpers.database.cache import document_cache
+from helpers.database.create import createCollection
+from helpers.database.delete import deleteOneDocument
+from helpers.database.executor import runDbOperation
+from helpers.database.namespace_index import namespace_index
+from helpers.database.read import streamDocuments
+from helpers.database.tenancy import (
+    GUILD_ID_FIELD, RESERVED_COLLECTION_PREFIX, getSharedDatabaseName)
+
+logger = logging.getLogger("discord.guilds.prefixes")
+
+PREFIXES_COLLECTION = f"{RESERVED_COLLECTION_PREFIX}prefixes"
+
+# The longest prefix a guild can set
+MAX_PREFIX_LENGTH = 10
+
+# The number of prefixes read per round trip when loading them
+LOAD_BATCH_SIZE = 1000
+
+
+class PrefixIndex:
+    """
+    This class holds the command prefix of every guild in memory.
+    """
+
+    def __init__(self, default_prefix: str = "!"):
+        self.default_prefix = default_prefix
+        self._prefixes: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def get(self, guild_id: int | None) -> str:
+        """
+        Get the prefix of a guild, the default prefix outside of guilds.
+        """
+        return self._prefixes.get(guild_id, self.default_prefix)
+
+    def has_prefix(self, guild_id: int) -> bool:
+        """
+        Check if a guild set its own prefix.
+        """
+        return guild_id in self._prefixes
+
+    def get_prefix(self, _bot: commands.Bot, message: Message) -> str:
+        """
+        Resolve the prefix of a message, used as the command_prefix of the bot.
+        """
+        return self._prefixes.get(
+            message.guild.id if message.guild is not None else None,
+            self.default_prefix)
+
+    def replace(self, prefixes: dict[int, str]) -> None:
+        """
+        Replace every prefix with the loaded prefixes.
+        """
+        self._prefixes = prefixes
+
+    def set(self, guild_id: int, prefix: str) -> None:
+        """
+        Record the prefix of a guild.
+        """
+        self._prefixes[guild_id] = prefix
+
+    def forget(self, guild_id: int) -> str | None:
+        """
+        Forget the prefix of a guild.
+
+        Returns:
+            str | None: The forgotten prefix, None if the guild had none.
+        """
+        return self._prefixes.pop(guild_id, None)
+
+
+# The process wide prefix index
+prefix_index = PrefixIndex()
+
+
+def validatePrefix(prefix: str) -> bool:
+    """
+    Validate a prefix is short and has no whitespace.
+    """
+    return 0 < len(prefix) <= MAX_PREFIX_LENGTH and not any(char.isspace() for char in prefix)
+
+
+def loadPrefixes(db_connection: MongoClient) -> int:
+    """
+    Load the prefixes of every guild into the prefix index in batches,
+    creating the prefixes collection on first use. If the database cannot
+    be reached the guilds keep the default prefix.
+
+    Returns:
+        int: The number of guilds with their own prefix.
+    """
+    database_name = getSharedDatabaseName()
+
+    try:
+        if not namespace_index.collection_exists(
+                db_connection, database_name, PREFIXES_COLLECTION):
+            createCollection(db_connection, database_name, PREFIXES_COLLECTION)
+
+        try:
+            db_connection[database_name][PREFIXES_COLLECTION].create_index(
+                GUILD_ID_FIELD, unique=True)
+        except OperationFailure as error:
+            logger.warning("Could not create the unique index of the prefixes: %s", error)
+
+        prefixes = {}
+        for batch in streamDocuments(
+                db_connection,
+                database_name,
+                PREFIXES_COLLECTION,
+                {},
+                projection={"_id": False, GUILD_ID_FIELD: True, "prefix": True},
+                batch_size=LOAD_BATCH_SIZE):
+            for document in batch:
+                prefixes[document[GUILD_ID_FIELD]] = document["prefix"]
+    except PyMongoError as error:
+        logger.error("Could not load the prefixes, using the default prefix: %s", error)
+        return 0
+
+    prefix_index.replace(prefixes)
+    logger.info("Loaded the prefixes of %s guilds", len(prefixes))
+
+    return len(prefixes)
+
+
+def setGuildPrefix(db_connection: MongoClient | None, guild_id: int, prefix: str) -> bool:
+    """
+    Store the prefix of a guild and update the prefix index.
+
+    Without a database connection the prefix is only kept until the bot
+    restarts.
+
+    Returns:
+        bool: True if the prefix was stored, False otherwise.
+    """
+    if not validatePrefix(prefix):
+        logger.error("Invalid prefix %s for guild %s", prefix, guild_id)
+        return False
+
+    if db_connection is not None:
+        # an upsert, so processes setting the prefix of a guild at once
+        # cannot each insert a document
+        result = db_connection[getSharedDatabaseName()][PREFIXES_COLLECTION].update_one(
+            {GUILD_ID_FIELD: guild_id},
+            {"$set": {"prefix": prefix}},
+            upsert=True)
+        document_cache.invalidate(getSharedDatabaseName(), PREFIXES_COLLECTION)
+
+        if not result.acknowledged:
+            logger.error("Prefix of guild %s could not be stored", guild_id)
+            return False
+
+    prefix_index.set(guild_id, prefix)
+    logger.info("Prefix of guild %s set to %s", guild_id, prefix)
+
+    return True
+
+
+def removeGuildPrefix(db_connection: MongoClient | None, guild_id: int) -> bool:
+    """
+    Go back to the default prefix for a guild.
+
+    Returns:
+        bool: True if the guild had its own prefix, False otherwise.
+    """
+    if not prefix_index.has_prefix(guild_id):
+        return False
+
+    if db_connection is not None and not deleteOneDocument(
+            db_connection,
+            getSharedDatabaseName(),
+            PREFIXES_COLLECTION,
+            {GUILD_ID_FIELD: guild_id}):
+        logger.error("Prefix of guild %s could not be removed", guild_id)
+        return False
+
+    prefix_index.forget(guild_id)
+    logger.info("Prefix of guild %s reset to the default prefix", guild_id)
+
+    return True
+
+
+async def asyncLoadPrefixes(db_connection: MongoClient) -> int:
+    """
+    Load the prefixes of every guild without blocking the event loop.
+    """
+    return await runDbOperation(loadPrefixes, db_connection)
+
+
+async def asyncSetGuildPrefix(
+        db_connection: MongoClient | None,
+        guild_id: int,
+        prefix: str) -> bool:
+    """
+    Store the prefix of a guild without blocking the event loop.
+    """
+    return await runDbOperation(setGuildPrefix, db_connection, guild_id, prefix)
+
+
+async def asyncRemoveGuildPrefix(db_connection: MongoClient | None, guild_id: int) -> bool:
+    """
+    Go back to the default prefix for a guild without blocking the event loop.
+    """
+    return await runDbOperation(removeGuildPrefix, db_connection, guild_id)
@@ -0,0 +1,191 @@
+"""
+This file contains the startup reconciliation of the provisioned guilds.
+
+Guilds the bot joined while it was offline never reach on_guild_join, and
+guilds it left never get cleaned up. On startup the guilds the bot is in are
+compared with the provisioned guilds in a single query, then the missing
+guilds are provisioned concurrently. The data of the left guilds is only
+removed when pruning is enabled, otherwise they are logged.
+
+The provisioned guilds are recorded in the _bot_guilds collection of the shared
+database in both storage modes. mongoDB only creates a database with its
+first collection, so the database names alone miss the guilds whose
+database is still empty.
+
+The reconciliation is configured with the environment variables:
+    - DISCORD_GUILD_RECONCILE_WORKERS (default: 16)
+    - DISCORD_GUILD_RECONCILE_PRUNE (default: "False")
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+from pymongo import MongoClient
+from discord.ext import commands
+from helpers.database.cache import document_cache
+from helpers.database.executor import runDbOperation
+from helpers.database.namespace_index import namespace_index
+from helpers.database.tenancy import (
+    fetchRegisteredGuilds,
+    guildDatabaseName,
+    guildIdFromDatabase,
+    isSharedStorage,
+    purgeGuilds,
+    registerGuilds,
+)
+from helpers.database.create import createDatabase
+from helpers.guild.prefixes import prefix_index
+from helpers.guild.remove_guilds import removeGuild
+from helpers.shards import ownsGuild
+
+logger = logging.getLogger("discord.guilds.reconcile")
+
+# Stops overlapping reconciliations when on_ready fires again after a reconnect
+_reconcile_lock = asyncio.Lock()
+
+
+def fetchProvisionedGuilds(db_connection: MongoClient) -> set[int]:
+    """
+    Get the ids of every provisioned guild.
+
+    In the per-guild storage mode the guild databases that were created
+    before the guilds were registered are registered too.
+    """
+    registered = fetchRegisteredGuilds(db_connection)
+
+    if isSharedStorage():
+        return registered
+
+    database_names = namespace_index.database_names(db_connection)
+    listed = {
+        guild_id for guild_id in map(guildIdFromDatabase, database_names)
+        if guild_id is not None
+    }
+
+    registerGuilds(db_connection, sorted(listed - registered))
+
+    return registered | listed
+
+
+async def runConcurrently(
+        operation: Callable[[int], Awaitable[bool]],
+        guild_ids: list[int],
+        workers: int,
+        action: str) -> int:
+    """
+    Run an operation for every guild with a bounded number of workers,
+    logging the progress every 10 percent.
+
+    Returns:
+        int: The number of guilds the operation succeeded for.
+    """
+    semaphore = asyncio.Semaphore(workers)
+    step = max(len(guild_ids) // 10, 1)
+    done = 0
+    succeeded = 0
+
+    async def worker(guild_id: int) -> None:
+        nonlocal done, succeeded
+        async with semaphore:
+            if await operation(guild_id):
+                succeeded += 1
+        done += 1
+        if done % step == 0 or done == len(guild_ids):
+            logger.info("%s %s/%s guilds", action, done, len(guild_ids))
+
+    await asyncio.gather(*(worker(guild_id) for guild_id in guild_ids))
+
+    return succeeded
+
+
+async def provisionGuilds(
+        db_connection: MongoClient,
+        guild_ids: list[int],
+        workers: int) -> int:
+    """
+    Provision the given guilds.
+
+    Returns:
+        int: The number of guilds provisioned.
+    """
+    if isSharedStorage():
+        return await runDbOperation(registerGuilds, db_connection, guild_ids)
+
+    return await runConcurrently(
+        lambda guild_id: runDbOperation(
+            createDatabase, db_connection, guildDatabaseName(guild_id)),
+        guild_ids,
+        workers,
+        "Provisioned")
+
+
+async def removeGuilds(
+        db_connection: MongoClient,
+        guild_ids: list[int],
+        workers: int) -> int:
+    """
+    Remove the data of the given guilds.
+
+    Returns:
+        int: The number of guilds removed.
+    """
+    if isSharedStorage():
+        await runDbOperation(purgeGuilds, db_connection, guild_ids)
+        for guild_id in guild_ids:
+            document_cache.invalidate(guildDatabaseName(guild_id))
+            prefix_index.forget(guild_id)
+        return len(guild_ids)
+
+    return await runConcurrently(
+        lambda guild_id: runDbOperation(removeGuild, db_connection, guild_id),
+        guild_ids,
+        workers,
+        "Removed")
+
+
+async def reconcileGuilds(bot: commands.Bot, db_connection: MongoClient) -> None:
+    """
+    Provision the guilds the bot is in but were not provisioned, and remove
+    the data of the guilds the bot is no longer in.
+    """
+    if _reconcile_lock.locked():
+        logger.debug("Guild reconciliation already running")
+        return
+
+    async with _reconcile_lock:
+        start = time.perf_counter()
+        workers = int(os.getenv("DISCORD_GUILD_RECONCILE_WORKERS", "16"))
+        prune = os.getenv("DISCORD_GUILD_RECONCILE_PRUNE", "False") == "True"
+
+        current = {guild.id for guild in bot.guilds}
+        provisioned = await runDbOperation(fetchProvisionedGuilds, db_connection)
+
+        missing = sorted(current - provisioned)
+        # guilds of the shards run by other processes are not ours to remove
+        left = sorted(
+            guild_id for guild_id in provisioned - current if ownsGuild(bot, guild_id))
+
+        logger.info("Reconciling guilds: %s connected, %s provisioned, %s missing, %s left",
+                    len(current),
+                    len(provisioned),
+                    len(missing),
+                    len(left))
+
+        added = await provisionGuilds(db_connection, missing, workers)
+
+        removed = 0
+        # never wipe everything because the guild list is not available yet
+        if prune and left and current:
+            removed = await removeGuilds(db_connection, left, workers)
+        elif left:
+            logger.info("Keeping the data of %s left guilds, set "
+                        "DISCORD_GUILD_RECONCILE_PRUNE to True to remove it: %s",
+                        len(left),
+                        left)
+
+        logger.info("Guild reconciliation finished in %.2fs: %s provisioned, %s removed",
+                    time.perf_counter() - start,
+                    added,
+                    removed)
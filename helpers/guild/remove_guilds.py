@@ -0,0 +1,58 @@
+"""
+This file contains the operations to remove a guild
+from the database, and is used by the bot when it leaves a guild.
+"""
+
+import logging
+from pymongo import MongoClient
+from helpers.database.delete import deleteDatabase
+from helpers.database.executor import runDbOperation
+from helpers.database.tenancy import guildDatabaseName, isSharedStorage, unregisterGuild
+from helpers.guild.prefixes import prefix_index, removeGuildPrefix
+
+logger = logging.getLogger("discord.guilds.remove")
+
+def removeGuild(
+        db_connection: MongoClient,
+        guild_id: int) -> bool:
+    """
+    Remove the data of a guild from the database.
+
+    In the shared storage mode only the documents of the guild are deleted.
+    """
+
+    database_name = guildDatabaseName(guild_id)
+
+    # delete the database
+    guild_removed = deleteDatabase(db_connection, database_name)
+
+    # a guild database without collections is not listed, but still registered
+    if not isSharedStorage():
+        guild_removed = unregisterGuild(db_connection, guild_id) or guild_removed
+
+    if guild_removed:
+        # the prefixes live in the shared database, where the guild was just purged
+        if isSharedStorage():
+            prefix_index.forget(guild_id)
+        else:
+            removeGuildPrefix(db_connection, guild_id)
+
+        logger.info("Database %s for guild %s removed successfully",
+                    database_name,
+                    guild_id)
+        return True
+
+    logger.error("Database %s for guild %s could not be removed",
+                 database_name,
+                 guild_id)
+
+    return False
+
+
+async def asyncRemoveGuild(
+        db_connection: MongoClient,
+        guild_id: int) -> bool:
+    """
+    Remove the data of a guild without blocking the event loop.
+    """
+    return await runDbOperation(removeGuild, db_connection, guild_id)
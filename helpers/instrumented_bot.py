@@ -0,0 +1,94 @@
+"""
+This file contains the bot class and the function creating the bot.
+
+The bot is composed of the mixins of the helpers that hook into it, each
+overriding one method of discord.py and calling the next one. Closing the
+bot, by the shutdown command, SIGTERM or Ctrl+C, sends the queued messages
+and flushes the buffered database writes first. The mixins are:
+    - MessageFilterMixin: process_commands
+    - ProfilerMixin: invoke, and _schedule_event as discord.py has no public
+      hook around the event handlers it schedules
+    - ShardMetricsMixin: dispatch
+"""
+
+import logging
+from typing import Any
+from discord.ext import commands
+from helpers.database.write_behind import write_behind_queue
+from helpers.message_filter import MessageFilterMixin, createMessageFilter
+from helpers.profiler import ProfilerMixin, createProfiler
+from helpers.send_queue import getSendQueue
+from helpers.shards import (
+    ShardMetrics,
+    ShardMetricsMixin,
+    getShardOptions,
+    isSharded,
+    registerShardEvents,
+)
+
+logger = logging.getLogger("discord.bot")
+
+
+class InstrumentationMixin(MessageFilterMixin, ProfilerMixin, ShardMetricsMixin):
+    """
+    This mixin gives the bot its shard metrics, profiler and message filter.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.shard_metrics = ShardMetrics()
+        self.profiler = createProfiler()
+        self.message_filter = createMessageFilter()
+        super().__init__(*args, **kwargs)
+
+    async def close(self) -> None:
+        """
+        Send the queued messages while the connection is still open, flush
+        the buffered writes, then close the connection to Discord.
+        """
+        if not self.is_closed(): # type: ignore[attr-defined]
+            send_queue = getSendQueue(self)
+            if send_queue is not None:
+                if not await send_queue.drain():
+                    logger.warning("Queued messages were not sent within %ss",
+                                   send_queue.drain_timeout)
+                await send_queue.close()
+
+            await write_behind_queue.close()
+
+        await super().close() # type: ignore[misc]
+
+
+class InstrumentedBot( # pylint: disable=too-many-ancestors
+        InstrumentationMixin, commands.Bot):
+    """
+    A single shard bot that keeps shard metrics, profiles its handlers and
+    filters the messages that cannot be commands.
+    """
+
+
+class InstrumentedShardedBot( # pylint: disable=too-many-ancestors
+        InstrumentationMixin, commands.AutoShardedBot):
+    """
+    A sharded bot that keeps shard metrics, profiles its handlers and
+    filters the messages that cannot be commands.
+    """
+
+
+def createBot(**kwargs: Any) -> commands.Bot:
+    """
+    Create the bot, sharded or not depending on DISCORD_BOT_SHARD_MODE.
+
+    Arguments:
+        **kwargs: The keyword arguments for the bot.
+    """
+    if isSharded():
+        options = getShardOptions()
+        logger.info("Starting in sharded mode %s",
+                    options or "with the recommended shard count")
+        bot: commands.Bot = InstrumentedShardedBot(**kwargs, **options)
+    else:
+        bot = InstrumentedBot(**kwargs)
+
+    registerShardEvents(bot)
+
+    return bot
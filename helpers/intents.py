@@ -0,0 +1,206 @@
+"""
+This module works out the gateway intents and the member cache from what the
+cogs declare they need.
+
+Every cog folder can have a cog.json manifest listing the intents it uses,
+on top of the ones the bot always needs for prefix commands:
+    {
+        "intents": ["members"],
+        "chunk_guilds": false
+    }
+
+Privileged intents like members and presences are only requested when a cog
+asks for them, and every member of a guild is only downloaded at startup
+when a cog sets chunk_guilds.
+
+The intents can be overridden with the environment variable:
+    - DISCORD_BOT_INTENTS ("auto", "all" or a list of extra intents, default: "auto")
+"""
+
+import logging
+import os
+import discord
+from discord.ext import commands
+from helpers.read_json import readJson
+
+try:
+    import resource
+except ImportError:
+    # resource is only available on unix
+    resource = None # pylint: disable=invalid-name
+
+logger = logging.getLogger("discord.intents")
+
+# The intents needed to receive prefix commands in guilds and direct messages
+BASE_INTENTS = ("guilds", "guild_messages", "dm_messages", "message_content")
+
+# The folders the cogs are loaded from
+COG_DIRECTORIES = ("core", "cogs")
+
+# A rough size in bytes of a cached member with its user and roles
+MEMBER_SIZE_ESTIMATE = 1024
+
+# The intents with the most gateway traffic, reported when they are disabled
+NOISY_INTENTS = ("presences", "members", "typing", "reactions", "voice_states")
+
+# The intent each event needs to be received
+EVENT_INTENTS = {
+    "on_member_join": "members",
+    "on_member_remove": "members",
+    "on_member_update": "members",
+    "on_raw_member_remove": "members",
+    "on_presence_update": "presences",
+    "on_typing": "typing",
+    "on_raw_typing": "typing",
+    "on_reaction_add": "reactions",
+    "on_reaction_remove": "reactions",
+    "on_raw_reaction_add": "reactions",
+    "on_raw_reaction_remove": "reactions",
+    "on_voice_state_update": "voice_states",
+    "on_member_ban": "moderation",
+    "on_member_unban": "moderation",
+    "on_invite_create": "invites",
+    "on_invite_delete": "invites",
+    "on_guild_emojis_update": "emojis_and_stickers",
+    "on_guild_stickers_update": "emojis_and_stickers",
+    "on_webhooks_update": "webhooks",
+    "on_integration_create": "integrations",
+    "on_scheduled_event_create": "guild_scheduled_events",
+}
+
+
+def readCogManifests() -> dict[str, dict]:
+    """
+    Read the cog.json manifest of every cog folder, a manifest that cannot
+    be read is skipped, so its cogs get the default intents.
+
+    Returns:
+        dict[str, dict]: The manifest of each cog folder that has one.
+    """
+    manifests = {}
+
+    for directory in COG_DIRECTORIES:
+        if not os.path.isdir(directory):
+            continue
+
+        for folder in sorted(os.listdir(directory)):
+            path = f"{directory}/{folder}/cog.json"
+            if not os.path.isfile(path):
+                continue
+
+            try:
+                manifest = readJson(path)
+            except (OSError, ValueError) as error:
+                logger.error("Skipping the intents of %s, it could not be read: %s", path, error)
+                continue
+
+            if not isinstance(manifest, dict):
+                logger.error("Skipping the intents of %s, it is not an object", path)
+                continue
+
+            manifests[f"{directory}/{folder}"] = manifest
+
+    return manifests
+
+
+def requestedIntents(manifests: dict[str, dict]) -> tuple[set[str], bool]:
+    """
+    Collect the intents requested by the cog manifests.
+
+    Returns:
+        tuple[set[str], bool]: The names of the requested intents, and
+        whether a cog needs every member downloaded at startup.
+    """
+    names = set(BASE_INTENTS)
+    chunk_guilds = False
+
+    for cog, manifest in manifests.items():
+        for name in manifest.get("intents", []):
+            if name not in discord.Intents.VALID_FLAGS:
+                logger.warning("Cog %s requested the unknown intent %s", cog, name)
+                continue
+            names.add(name)
+
+        chunk_guilds = chunk_guilds or bool(manifest.get("chunk_guilds", False))
+
+    return names, chunk_guilds
+
+
+def getIntentOptions() -> dict:
+    """
+    Get the intents and member cache keyword arguments for the bot.
+
+    Returns:
+        dict: The intents, member_cache_flags and chunk_guilds_at_startup.
+    """
+    override = os.getenv("DISCORD_BOT_INTENTS", "auto")
+
+    if override == "all":
+        logger.info("Using all gateway intents")
+        return {
+            "intents": discord.Intents.all(),
+            "member_cache_flags": discord.MemberCacheFlags.all(),
+            "chunk_guilds_at_startup": True,
+        }
+
+    manifests = readCogManifests()
+
+    if override != "auto":
+        manifests["DISCORD_BOT_INTENTS"] = {
+            "intents": [name.strip() for name in override.split(",") if name.strip()]
+        }
+
+    names, chunk_guilds = requestedIntents(manifests)
+
+    intents = discord.Intents(**{name: True for name in names})
+
+    # without chunking, only the members seen in events are cached
+    chunk_guilds = chunk_guilds and intents.members
+
+    logger.info("Using the gateway intents %s", ", ".join(sorted(names)))
+
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.from_intents(intents),
+        "chunk_guilds_at_startup": chunk_guilds,
+    }
+
+
+def checkCogIntents(bot: commands.Bot) -> None:
+    """
+    Warn about the cog listeners that will never be called because their
+    intent was not requested in the cog manifest.
+    """
+    for cog_name, cog in bot.cogs.items():
+        for event_name, _ in cog.get_listeners():
+            intent = EVENT_INTENTS.get(event_name)
+            if intent is not None and not getattr(bot.intents, intent):
+                logger.warning("Cog %s listens to %s but the %s intent is not enabled, "
+                               "add it to the intents of its cog.json",
+                               cog_name,
+                               event_name,
+                               intent)
+
+
+def reportIntentSavings(bot: commands.Bot) -> None:
+    """
+    Log the members left out of the cache and the memory this saves.
+    """
+    disabled = [name for name in NOISY_INTENTS if not getattr(bot.intents, name)]
+
+    members = sum(guild.member_count or 0 for guild in bot.guilds)
+    cached = sum(len(guild.members) for guild in bot.guilds)
+    skipped = max(members - cached, 0)
+
+    logger.info("Cached %s of %s members, about %.1fMiB saved",
+                cached,
+                members,
+                skipped * MEMBER_SIZE_ESTIMATE / 1024 / 1024)
+
+    if resource is not None:
+        # ru_maxrss is in kilobytes on linux
+        logger.info("Peak RSS %.1fMiB",
+                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+    if disabled:
+        logger.info("Not receiving the events of the intents %s", ", ".join(disabled))
@@ -0,0 +1,129 @@
+"""
+This file contains the JSON codec of the bot and the optional fast mode.
+
+With the environment variable DISCORD_BOT_FAST_MODE set to "True":
+    - uvloop is installed as the event loop policy
+    - orjson decodes the files read with readJson
+
+Both packages are optional, see requirements-fast.txt. When one of them is
+not installed the bot logs a warning and keeps using asyncio or json.
+discord.py decodes the gateway payloads and the HTTP responses with orjson
+whenever it is installed, with or without the fast mode, so the docker
+image only installs requirements-fast.txt when it is built with
+--build-arg FAST_MODE=true.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None # pylint: disable=invalid-name
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None # pylint: disable=invalid-name
+
+logger = logging.getLogger("discord.fast_mode")
+
+
+def standardDumps(data: Any) -> str:
+    """
+    Encode a JSON document with json, as compact as discord.py sends it.
+    """
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=True)
+
+
+def orjsonDumps(data: Any) -> str:
+    """
+    Encode a JSON document with orjson.
+    """
+    return orjson.dumps(data).decode("utf-8") # pylint: disable=no-member
+
+
+class JsonCodec: # pylint: disable=too-few-public-methods
+    """
+    This class holds the JSON codec used by the bot, chosen once when the
+    fast mode is installed.
+    """
+
+    # "orjson" once the fast mode installed it
+    name = "json"
+    loads: Callable[[bytes | str], Any] = staticmethod(json.loads)
+    dumps: Callable[[Any], str] = staticmethod(standardDumps)
+
+    @classmethod
+    def use_orjson(cls) -> bool:
+        """
+        Decode and encode with orjson from now on, if it is installed.
+
+        Returns:
+            bool: True if orjson is used.
+        """
+        if orjson is None:
+            return False
+
+        cls.name = "orjson"
+        cls.loads = staticmethod(orjson.loads) # pylint: disable=no-member
+        cls.dumps = staticmethod(orjsonDumps)
+
+        return True
+
+
+def loadJson(data: bytes | str) -> Any:
+    """
+    Decode a JSON document with the codec of the bot.
+    """
+    return JsonCodec.loads(data)
+
+
+def dumpJson(data: Any) -> str:
+    """
+    Encode a JSON document with the codec of the bot.
+    """
+    return JsonCodec.dumps(data)
+
+
+def isFastMode() -> bool:
+    """
+    Check if the fast mode is enabled.
+    """
+    return os.getenv("DISCORD_BOT_FAST_MODE", "False") == "True"
+
+
+def useUvloop() -> bool:
+    """
+    Run the event loops created from now on with uvloop, if it is installed.
+
+    Returns:
+        bool: True if uvloop is used.
+    """
+    if uvloop is None:
+        return False
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def installFastMode() -> None:
+    """
+    Install uvloop and orjson if DISCORD_BOT_FAST_MODE is set, before the
+    event loop of the bot is created.
+    """
+    if not isFastMode():
+        return
+
+    if useUvloop():
+        logger.info("Fast mode: running the event loop with uvloop %s", uvloop.__version__)
+    else:
+        logger.warning("Fast mode: uvloop is not installed, using the asyncio event loop")
+
+    if JsonCodec.use_orjson():
+        logger.info("Fast mode: decoding the JSON files with orjson %s", orjson.__version__)
+    else:
+        logger.warning("Fast mode: orjson is not installed, decoding the JSON files with json")
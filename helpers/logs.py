@@ -3,8 +3,12 @@ This module contains the logging configuration for the discord bot.
 """
 
 from abc import abstractmethod
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
 import sys
 from helpers.env import getEnvVar
 from helpers.terminal_colors import TerminalColors
@@ -12,6 +16,9 @@ from helpers.terminal_colors import TerminalColors
 class CustomFormatter(logging.Formatter):
     """
     This class is used to create a custom logging formatter.
+
+    A formatter is built once for every log level, as building one parses
+    the format strings, so formatting a record only has to pick one.
     """
     debugging_enabled = False
 
@@ -19,7 +26,7 @@ class CustomFormatter(logging.Formatter):
     log_level = getEnvVar("DISCORD_BOT_LOG_LEVEL")
 
     if log_level is not None:
-        if log_level == 10:
+        if int(log_level) == logging.DEBUG:
             debugging_enabled = True
 
     if debugging_enabled is True:
@@ -31,6 +38,11 @@ class CustomFormatter(logging.Formatter):
     level_format = "%(levelname)-8s"
     post_format = " | %(name)-35s | %(message)s"
 
+    # Set the date format
+    date_format = "%Y-%m-%d %H:%M:%S"
+
+    reset_color = TerminalColors.RESET_COLOR
+
     FORMATS = {
         logging.DEBUG: TerminalColors.BLUE,
         logging.INFO: TerminalColors.GREEN,
@@ -39,32 +51,175 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: TerminalColors.RED,
     }
 
-    def format(self, record: logging.LogRecord):
+    def __init__(self):
+        super().__init__()
+        self.formatters = {
+            level: self.create_formatter(color_code)
+            for level, color_code in self.FORMATS.items()
+        }
+        self.default_formatter = self.create_formatter(self.reset_color)
+
+    def create_formatter(self, color_code: str) -> logging.Formatter:
         """
-        Initialize the formatter
+        Create the formatter of a log level.
         """
-
-        # Set the date format
-        dt_fmt = "%Y-%m-%d %H:%M:%S"
-
-        # Set the log format
-        color_code = self.FORMATS.get(
-            record.levelno,
-            TerminalColors.RESET_COLOR
-        )
         log_fmt = (
             self.pre_format
             + color_code
             + self.level_format
-            + TerminalColors.RESET_COLOR
+            + self.reset_color
             + self.post_format
         )
 
-        # Create the formatter
-        formatter = logging.Formatter(log_fmt, dt_fmt, style="%")
+        return logging.Formatter(log_fmt, self.date_format, style="%")
+
+    def format(self, record: logging.LogRecord):
+        """
+        Format the record with the formatter of its level
+        """
+        return self.formatters.get(record.levelno, self.default_formatter).format(record)
+
+
+class PlainFormatter(CustomFormatter):
+    """
+    This class is used to format the log records without colours for log files.
+    """
+    FORMATS: dict[int, str] = {}
+
+    reset_color = ""
+
 
-        # Return the formatted record
-        return formatter.format(record)
+class JsonFormatter(logging.Formatter):
+    """
+    This class is used to format the log records as JSON lines for log shippers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # the timestamp only changes once a second, so it is formatted once
+        self.last_second = -1
+        self.last_time = ""
+
+    def format(self, record: logging.LogRecord):
+        """
+        Format the record as a single line JSON object
+        """
+        second = int(record.created)
+        if second != self.last_second:
+            self.last_second = second
+            self.last_time = self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z")
+
+        entry = {
+            "time": self.last_time,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        if hasattr(record, "cluster_id"):
+            entry["cluster_id"] = getattr(record, "cluster_id")
+
+        if record.levelno <= logging.DEBUG:
+            entry["function"] = record.funcName
+            entry["line"] = record.lineno
+            entry["path"] = record.pathname
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def createFormatter(text_formatter: type[logging.Formatter] = CustomFormatter
+                    ) -> logging.Formatter:
+    """
+    Create the console formatter selected with DISCORD_BOT_LOG_FORMAT.
+
+    Arguments:
+        text_formatter: The formatter class of the "text" format.
+    """
+    if os.getenv("DISCORD_BOT_LOG_FORMAT", "text") == "json":
+        return JsonFormatter()
+
+    return text_formatter()
+
+
+def createOutputHandlers(
+        text_formatter: type[logging.Formatter] = CustomFormatter,
+        file_formatter: type[logging.Formatter] = PlainFormatter) -> list[logging.Handler]:
+    """
+    Create the console handler, and the rotating file handler when
+    DISCORD_BOT_LOG_FILE is set.
+
+    Arguments:
+        text_formatter: The formatter class of the console in the "text" format.
+        file_formatter: The formatter class of the log file in the "text" format.
+    """
+    # Create the console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+
+    # Attach the formatter to the console_handler
+    console_handler.setFormatter(createFormatter(text_formatter))
+
+    handlers: list[logging.Handler] = [console_handler]
+
+    log_file = os.getenv("DISCORD_BOT_LOG_FILE", None)
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("DISCORD_BOT_LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("DISCORD_BOT_LOG_FILE_BACKUPS", "5")),
+            encoding="utf-8")
+        file_handler.setFormatter(createFormatter(file_formatter))
+        handlers.append(file_handler)
+
+    return handlers
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    This class hands the log records to the log listener thread through a
+    bounded queue, so logging never waits on the console or the log file.
+
+    When the queue is full the record is dropped with the "drop" policy, or
+    the caller waits for room with the "block" policy.
+    """
+
+    def __init__(self, max_size: int, policy: str):
+        super().__init__(queue.Queue(max_size))
+        self.policy = policy
+        self.dropped: dict[str, int] = {}
+        self.unreported = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Put a record on the queue following the queue policy.
+        """
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+
+        try:
+            if self.unreported:
+                self.queue.put_nowait(self.dropped_record())
+                self.unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+            self.unreported += 1
+
+    def dropped_record(self) -> logging.LogRecord:
+        """
+        Create the record that reports the records dropped since the last report.
+        """
+        return logging.LogRecord(
+            "discord.logs",
+            logging.WARNING,
+            __file__,
+            0,
+            "Log queue full, dropped %s log records (%s in total)",
+            (self.unreported, sum(self.dropped.values())),
+            None)
 
 
 class Logger:
@@ -74,18 +229,28 @@ class Logger:
 
     log_level = logging.INFO
 
-    def __init__(self, log_level: int):
+    # The queue handler and the listener writing its records, when enabled
+    queue_handler: BoundedQueueHandler | None = None
+    listener: logging.handlers.QueueListener | None = None
+
+    def __init__(self, log_level: int, handler: logging.Handler | None = None):
         """
         Initialize the logger.
         """
         self.log_level = log_level
+        self.handler = handler
 
     @staticmethod
-    def setup_logging(log_level: int):
+    def setup_logging(log_level: int, handler: logging.Handler | None = None):
         """
         Setup the logging configuration for the bot
+
+        Arguments:
+            log_level: The log level of the bot.
+            handler: The handler to log to instead of the console, used by
+                the clusters to send their logs to the launcher.
         """
-        logger = Logger(log_level)
+        logger = Logger(log_level, handler)
         logger.setup_root_logging()
         logger.setup_discord_logging()
         logger.setup_db_logging()
@@ -100,14 +265,47 @@ class Logger:
         # Set the log level for the root logger
         root_logger.setLevel(self.log_level)
 
-        # Create the console handler
-        console_handler = logging.StreamHandler(sys.stdout)
+        if self.handler is not None:
+            root_logger.addHandler(self.handler)
+            return
+
+        handlers = createOutputHandlers()
 
-        # Attach the formatter to the console_handler
-        console_handler.setFormatter(CustomFormatter())
+        if os.getenv("DISCORD_BOT_LOG_QUEUE", "False") != "True":
+            # Add the handlers to the main bot logger
+            for handler in handlers:
+                root_logger.addHandler(handler)
+            return
+
+        # Write the records from a listener thread instead of the caller
+        Logger.queue_handler = BoundedQueueHandler(
+            int(os.getenv("DISCORD_BOT_LOG_QUEUE_SIZE", "10000")),
+            os.getenv("DISCORD_BOT_LOG_QUEUE_POLICY", "drop"))
+        Logger.listener = logging.handlers.QueueListener(
+            Logger.queue_handler.queue, *handlers, respect_handler_level=True)
+        Logger.listener.start()
+        atexit.register(Logger.stop_logging)
+
+        root_logger.addHandler(Logger.queue_handler)
+
+    @classmethod
+    def stop_logging(cls):
+        """
+        Stop the log listener after writing the queued records
+        """
+        if cls.listener is not None:
+            cls.listener.stop()
+            cls.listener = None
+
+    @classmethod
+    def get_dropped_records(cls) -> dict[str, int]:
+        """
+        Get the number of log records dropped by the full log queue per level
+        """
+        if cls.queue_handler is None:
+            return {}
 
-        # Add the console_handler to the main bot logger
-        root_logger.addHandler(console_handler)
+        return dict(cls.queue_handler.dropped)
 
     def setup_discord_logging(self):
         """
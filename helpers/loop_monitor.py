@@ -0,0 +1,158 @@
+"""
+This file contains the watchdog of the event loop.
+
+A task on the event loop sleeps for a short interval and records how late it
+wakes up, the loop lag. A watchdog thread checks that the task keeps waking
+up; when the loop has been blocked for longer than the threshold it logs the
+stack of the event loop thread, so the synchronous call holding the loop
+shows up in the logs before the gateway heartbeats start failing.
+
+The watchdog is configured with the environment variables:
+    - DISCORD_BOT_LOOP_MONITOR (default: "True")
+    - DISCORD_BOT_LOOP_MONITOR_INTERVAL (default: 0.25)
+    - DISCORD_BOT_LOOP_BLOCK_THRESHOLD (default: 0.5)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from discord.ext import commands
+
+logger = logging.getLogger("discord.loop")
+
+# The number of lag samples kept for the percentiles
+LAG_HISTORY = 2400
+
+
+class LoopMonitor: # pylint: disable=too-many-instance-attributes
+    """
+    This class measures the lag of the event loop and traces what blocks it.
+
+    Arguments:
+        interval: The number of seconds between two lag samples.
+        threshold: The number of seconds the loop may be blocked before its
+            stack is logged.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples: deque[float] = deque(maxlen=LAG_HISTORY)
+        self.stalls = 0
+        self.last_stall: dict | None = None
+        self.last_beat = time.monotonic()
+        self._blocked = False
+        self._thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """
+        Start sampling the event loop this is called from, and the watchdog.
+        """
+        if self._task is not None:
+            return
+
+        self._thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+
+        threading.Thread(target=self._watch, name="discord-loop-watchdog", daemon=True).start()
+
+        logger.info("Watching the event loop, tracing blocks longer than %.0fms",
+                    self.threshold * 1000)
+
+    def stop(self) -> None:
+        """
+        Stop the sampling task and the watchdog.
+        """
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def percentiles(self) -> dict[str, float]:
+        """
+        Get the percentiles of the recent loop lag in seconds.
+
+        Returns:
+            dict[str, float]: The p50, p95, p99 and max lag, zero without samples.
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+        def percentile(fraction: float) -> float:
+            return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+        return {
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": samples[-1],
+        }
+
+    async def _sample(self) -> None:
+        """
+        Record how late the loop wakes up from every sleep.
+        """
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self.samples.append(lag)
+            self.last_beat = now
+
+            if self._blocked:
+                self._blocked = False
+                logger.warning("The event loop was blocked for %.0fms", lag * 1000)
+
+    def _watch(self) -> None:
+        """
+        Log the stack of the event loop thread when it stops waking up.
+        """
+        while not self._stop.wait(self.threshold / 4):
+            blocked = time.monotonic() - self.last_beat - self.interval
+
+            if blocked < self.threshold or self._blocked:
+                continue
+
+            self._blocked = True
+            self.stalls += 1
+
+            frame = sys._current_frames().get(self._thread_id) # pylint: disable=protected-access
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.last_stall = {"time": time.time(), "blocked": blocked, "stack": stack}
+
+            logger.warning("The event loop is blocked for %.0fms, it is running:\n%s",
+                           blocked * 1000, stack)
+
+
+def getLoopMonitor(bot: commands.Bot) -> LoopMonitor | None:
+    """
+    Get the event loop monitor of the bot, None if it is disabled.
+    """
+    return getattr(bot, "loop_monitor", None)
+
+
+def startLoopMonitor(bot: commands.Bot) -> LoopMonitor | None:
+    """
+    Start watching the event loop if DISCORD_BOT_LOOP_MONITOR is not "False".
+    """
+    if os.getenv("DISCORD_BOT_LOOP_MONITOR", "True") != "True":
+        return None
+
+    monitor = LoopMonitor(
+        float(os.getenv("DISCORD_BOT_LOOP_MONITOR_INTERVAL", "0.25")),
+        float(os.getenv("DISCORD_BOT_LOOP_BLOCK_THRESHOLD", "0.5")))
+    monitor.start()
+
+    setattr(bot, "loop_monitor", monitor)
+    return monitor
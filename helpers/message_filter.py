@@ -0,0 +1,134 @@
+"""
+This file contains the fast path of the command processing.
+
+discord.py builds a Context for every message that is not sent by a bot,
+resolving the prefix, the author and the command, only to find out that most
+messages are no commands. The message filter rejects those messages before
+that: messages of bots and webhooks, and messages that do not start with a
+prefix of the bot. A string or list command_prefix is turned into the
+matcher once, a callable one, like the per-guild prefixes or a mention of
+the bot, is resolved per message without building a Context.
+
+The filter is enabled with the environment variable:
+    - DISCORD_BOT_MESSAGE_FILTER (default: "True")
+"""
+
+import inspect
+import logging
+import os
+from typing import Any
+from discord import Message
+from discord.ext import commands
+
+logger = logging.getLogger("discord.message_filter")
+
+
+class MessageFilter:
+    """
+    This class rejects the messages that cannot be commands and counts them.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.bot_authors = 0
+        self.no_prefix = 0
+        self._prefix_source: Any = None
+        self._prefixes: str | tuple[str, ...] | None = None
+
+    def prefixes(self, bot: commands.Bot, message: Message) -> str | tuple[str, ...] | None:
+        """
+        Get the prefixes a command in the message could start with.
+
+        Returns:
+            str | tuple[str, ...] | None: The prefixes, None if they are only
+            known once awaited.
+        """
+        command_prefix = bot.command_prefix
+
+        if not callable(command_prefix):
+            # turned into the matcher again only when the prefix is replaced
+            if command_prefix is not self._prefix_source:
+                self._prefix_source = command_prefix
+                self._prefixes = command_prefix if isinstance(command_prefix, str) \
+                    else tuple(command_prefix)
+            return self._prefixes
+
+        prefixes = command_prefix(bot, message)
+        if inspect.isawaitable(prefixes):
+            # leave the coroutine prefixes to discord.py
+            if inspect.iscoroutine(prefixes):
+                prefixes.close()
+            return None
+
+        return prefixes if isinstance(prefixes, str) else tuple(prefixes)
+
+    def could_be_command(self, bot: commands.Bot, message: Message) -> bool:
+        """
+        Check if a message could be a command, without building a Context.
+        """
+        self.checked += 1
+
+        if message.author.bot:
+            self.bot_authors += 1
+            return False
+
+        prefixes = self.prefixes(bot, message)
+        if prefixes is not None and not message.content.startswith(prefixes):
+            self.no_prefix += 1
+            return False
+
+        return True
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the number of messages checked, rejected and passed on.
+        """
+        return {
+            "checked": self.checked,
+            "bot_authors": self.bot_authors,
+            "no_prefix": self.no_prefix,
+            "passed": self.checked - self.bot_authors - self.no_prefix,
+        }
+
+
+def isMessageFilterEnabled() -> bool:
+    """
+    Check if the messages should be filtered before the command processing.
+    """
+    return os.getenv("DISCORD_BOT_MESSAGE_FILTER", "True") == "True"
+
+
+def createMessageFilter() -> MessageFilter | None:
+    """
+    Create the message filter, None if it is disabled.
+    """
+    if not isMessageFilterEnabled():
+        return None
+
+    return MessageFilter()
+
+
+def getMessageFilter(bot: commands.Bot) -> MessageFilter | None:
+    """
+    Get the message filter of the bot, None if it is disabled.
+    """
+    return getattr(bot, "message_filter", None)
+
+
+class MessageFilterMixin: # pylint: disable=too-few-public-methods
+    """
+    This mixin skips the command processing of the messages that cannot be
+    commands.
+    """
+
+    message_filter: MessageFilter | None
+
+    async def process_commands(self, message: Message) -> None:
+        """
+        Process the commands of the message, if it could be one.
+        """
+        if self.message_filter is not None and not self.message_filter.could_be_command(
+                self, message): # type: ignore[arg-type]
+            return
+
+        await super().process_commands(message) # type: ignore[misc]
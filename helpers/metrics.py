@@ -0,0 +1,301 @@
+"""
+This file contains the Prometheus endpoint of the bot metrics.
+
+The metrics of the profiler, the shards, the event loop, the message filter,
+the send queue, the log queue and the database are served in the Prometheus
+text format on /metrics. The endpoint only listens on the local host by
+default, every cluster listens on the port plus its cluster id.
+
+The endpoint is configured with the environment variables:
+    - DISCORD_BOT_METRICS_PORT (default: unset, the endpoint is disabled)
+    - DISCORD_BOT_METRICS_HOST (default: "127.0.0.1")
+"""
+
+import asyncio
+import logging
+import os
+from aiohttp import web
+from discord.ext import commands
+from helpers.database.cache import getDocumentCacheStats
+from helpers.database.write_behind import write_behind_queue
+from helpers.logs import Logger
+from helpers.loop_monitor import getLoopMonitor
+from helpers.message_filter import getMessageFilter
+from helpers.profiler import LATENCY_BUCKETS, getProfiler
+from helpers.send_queue import getSendQueue
+
+logger = logging.getLogger("discord.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escapeLabel(value: str) -> str:
+    """
+    Escape a label value for the Prometheus text format.
+    """
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsWriter:
+    """
+    This class writes metrics in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def family(self, name: str, kind: str, description: str) -> None:
+        """
+        Start a metric family.
+        """
+        self.lines.append(f"# HELP botocat_{name} {description}")
+        self.lines.append(f"# TYPE botocat_{name} {kind}")
+
+    def sample(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        """
+        Write a sample of a metric.
+        """
+        if labels:
+            rendered = ",".join(f"{key}=\"{escapeLabel(str(label))}\""
+                                for key, label in labels.items())
+            self.lines.append(f"botocat_{name}{{{rendered}}} {value}")
+        else:
+            self.lines.append(f"botocat_{name} {value}")
+
+    def text(self) -> str:
+        """
+        Get the written metrics.
+        """
+        return "\n".join(self.lines) + "\n"
+
+
+def writeProfilerMetrics(writer: MetricsWriter, bot: commands.Bot) -> None:
+    """
+    Write the counters of the event handlers and commands.
+    """
+    profiler = getProfiler(bot)
+    if profiler is None:
+        return
+
+    stats = sorted(profiler.stats.items())
+
+    writer.family("handler_calls_total", "counter", "Calls of the handler.")
+    for (kind, cog, handler), handler_stats in stats:
+        writer.sample("handler_calls_total", handler_stats.calls,
+                      {"kind": kind, "cog": cog, "handler": handler})
+
+    writer.family("handler_errors_total", "counter", "Calls of the handler that raised.")
+    for (kind, cog, handler), handler_stats in stats:
+        writer.sample("handler_errors_total", handler_stats.errors,
+                      {"kind": kind, "cog": cog, "handler": handler})
+
+    writer.family("handler_latency_seconds", "histogram", "Latency of the handler.")
+    for (kind, cog, handler), handler_stats in stats:
+        labels = {"kind": kind, "cog": cog, "handler": handler}
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, handler_stats.buckets):
+            seen += count
+            writer.sample("handler_latency_seconds_bucket", seen, {**labels, "le": str(bound)})
+        writer.sample("handler_latency_seconds_bucket", handler_stats.calls,
+                      {**labels, "le": "+Inf"})
+        writer.sample("handler_latency_seconds_sum", handler_stats.total_time, labels)
+        writer.sample("handler_latency_seconds_count", handler_stats.calls, labels)
+
+    writer.family("handler_blocking_seconds_total", "counter",
+                  "Time the handler held the event loop.")
+    for (kind, cog, handler), handler_stats in stats:
+        writer.sample("handler_blocking_seconds_total", handler_stats.blocking_time,
+                      {"kind": kind, "cog": cog, "handler": handler})
+
+    writer.family("handler_slow_callbacks_total", "counter",
+                  "Steps of the handler that held the event loop past the threshold.")
+    for (kind, cog, handler), handler_stats in stats:
+        writer.sample("handler_slow_callbacks_total", handler_stats.slow_callbacks,
+                      {"kind": kind, "cog": cog, "handler": handler})
+
+
+def writeShardMetrics(writer: MetricsWriter, bot: commands.Bot) -> None:
+    """
+    Write the latency, events and reconnects of every shard.
+    """
+    shards = getattr(bot, "shard_metrics").snapshot(bot)
+
+    writer.family("shard_latency_seconds", "gauge", "Gateway latency of the shard.")
+    for shard_id, shard in shards.items():
+        # the latency is infinite until the first heartbeat
+        if shard["latency"] != float("inf"):
+            writer.sample("shard_latency_seconds", shard["latency"], {"shard": str(shard_id)})
+
+    for name, key, description in (
+            ("shard_events_total", "events", "Events received on the shard."),
+            ("shard_reconnects_total", "reconnects", "New gateway sessions of the shard."),
+            ("shard_resumes_total", "resumes", "Resumed gateway sessions of the shard.")):
+        writer.family(name, "counter", description)
+        for shard_id, shard in shards.items():
+            writer.sample(name, shard[key], {"shard": str(shard_id)})
+
+    writer.family("guilds", "gauge", "Guilds of this process.")
+    writer.sample("guilds", len(bot.guilds))
+
+
+def writeLoopMetrics(writer: MetricsWriter, bot: commands.Bot) -> None:
+    """
+    Write the lag of the event loop and the number of times it was blocked.
+    """
+    monitor = getLoopMonitor(bot)
+    if monitor is None:
+        return
+
+    writer.family("loop_lag_seconds", "gauge", "Recent lag of the event loop.")
+    for name, lag in monitor.percentiles().items():
+        writer.sample("loop_lag_seconds", lag, {"quantile": name})
+
+    writer.family("loop_blocked_total", "counter",
+                  "Times the event loop was blocked past the threshold.")
+    writer.sample("loop_blocked_total", monitor.stalls)
+
+    writer.family("loop_tasks", "gauge", "Pending tasks on the event loop.")
+    writer.sample("loop_tasks", len(asyncio.all_tasks()))
+
+
+def writeMessageFilterMetrics(writer: MetricsWriter, bot: commands.Bot) -> None:
+    """
+    Write the messages checked and rejected by the message filter.
+    """
+    message_filter = getMessageFilter(bot)
+    if message_filter is None:
+        return
+
+    stats = message_filter.stats()
+    writer.family("messages_checked_total", "counter",
+                  "Messages checked by the message filter.")
+    writer.sample("messages_checked_total", stats["checked"])
+
+    writer.family("messages_filtered_total", "counter",
+                  "Messages rejected before the command processing.")
+    for reason in ("bot_authors", "no_prefix"):
+        writer.sample("messages_filtered_total", stats[reason], {"reason": reason})
+
+
+def writeSendQueueMetrics(writer: MetricsWriter, bot: commands.Bot) -> None:
+    """
+    Write the messages queued, merged, dropped and waiting in the send queue.
+    """
+    send_queue = getSendQueue(bot)
+    if send_queue is None:
+        return
+
+    stats = send_queue.stats()
+    for name, key, kind, description in (
+            ("send_queue_queued_total", "queued", "counter", "Messages queued by the cogs."),
+            ("send_queue_sent_total", "sent", "counter", "Queued messages sent."),
+            ("send_queue_coalesced_total", "coalesced", "counter",
+             "Parts merged into a waiting message."),
+            ("send_queue_dropped_total", "dropped", "counter",
+             "Messages dropped because the queue of the channel was full."),
+            ("send_queue_errors_total", "errors", "counter", "Queued messages that failed."),
+            ("send_queue_pending", "pending", "gauge", "Messages waiting to be sent."),
+            ("send_queue_channels", "channels", "gauge", "Channels with a send queue.")):
+        writer.family(name, kind, description)
+        writer.sample(name, stats[key])
+
+
+def writeRuntimeMetrics(writer: MetricsWriter) -> None:
+    """
+    Write the metrics of the log queue and the database.
+    """
+    writer.family("log_records_dropped_total", "counter", "Log records dropped by the log queue.")
+    for level, count in sorted(Logger.get_dropped_records().items()):
+        writer.sample("log_records_dropped_total", count, {"level": level})
+
+    cache = getDocumentCacheStats()
+    for name, key, kind, description in (
+            ("document_cache_hits_total", "hits", "counter", "Document cache hits."),
+            ("document_cache_misses_total", "misses", "counter", "Document cache misses."),
+            ("document_cache_evictions_total", "evictions", "counter",
+             "Documents evicted from the document cache."),
+            ("document_cache_entries", "entries", "gauge", "Documents in the document cache."),
+            ("document_cache_bytes", "bytes", "gauge", "Memory used by the document cache.")):
+        writer.family(name, kind, description)
+        writer.sample(name, cache[key])
+
+    writer.family("write_behind_pending", "gauge", "Buffered writes not flushed yet.")
+    writer.sample("write_behind_pending", write_behind_queue.pending)
+
+
+def renderMetrics(bot: commands.Bot) -> str:
+    """
+    Render every metric of the bot in the Prometheus text format.
+    """
+    writer = MetricsWriter()
+    writeProfilerMetrics(writer, bot)
+    writeShardMetrics(writer, bot)
+    writeLoopMetrics(writer, bot)
+    writeMessageFilterMetrics(writer, bot)
+    writeSendQueueMetrics(writer, bot)
+    writeRuntimeMetrics(writer)
+    return writer.text()
+
+
+class MetricsServer:
+    """
+    This class serves the metrics of the bot over HTTP.
+    """
+
+    def __init__(self, bot: commands.Bot, host: str, port: int):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        """
+        Start listening for scrapes.
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+        logger.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        """
+        Stop listening for scrapes.
+        """
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, _request: web.Request) -> web.Response:
+        """
+        Answer a scrape with the current metrics.
+        """
+        return web.Response(
+            body=renderMetrics(self.bot).encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE})
+
+
+async def setupMetricsServer(bot: commands.Bot) -> MetricsServer | None:
+    """
+    Start the metrics endpoint if DISCORD_BOT_METRICS_PORT is set.
+    """
+    port = os.getenv("DISCORD_BOT_METRICS_PORT", None)
+    if not port:
+        return None
+
+    server = MetricsServer(
+        bot,
+        os.getenv("DISCORD_BOT_METRICS_HOST", "127.0.0.1"),
+        int(port) + int(os.getenv("DISCORD_BOT_CLUSTER_ID", "0")))
+
+    try:
+        await server.start()
+    except OSError as error:
+        logger.error("Could not serve the metrics on port %s: %s", server.port, error)
+        return None
+
+    setattr(bot, "metrics_server", server)
+    return server
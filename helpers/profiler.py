@@ -0,0 +1,313 @@
+"""
+This file contains the profiler of the event handlers and commands of the cogs.
+
+Every dispatched event handler and every invoked command is timed, and counted
+against its cog:
+    - the number of calls and of calls that raised
+    - a histogram of the latency, from the dispatch to the end of the handler
+    - the time the handler held the event loop between its awaits, and the
+      number of slow callbacks, steps that held it longer than the threshold
+
+The time on the event loop of a command is also part of the on_message
+handler that invoked it.
+
+The profiler adds a little work to every handler and command, and the event
+loop monitor already reports what blocks the loop, so it is off unless it is
+enabled to track down a slow cog.
+
+The profiler is configured with the environment variables:
+    - DISCORD_BOT_PROFILER (default: "False")
+    - DISCORD_BOT_PROFILER_SLOW_CALLBACK (default: 0.1)
+"""
+
+import bisect
+import logging
+import os
+import time
+import types
+from typing import Any, Callable, Coroutine
+from discord.ext import commands
+
+logger = logging.getLogger("discord.profiler")
+
+# The upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The cog name of the handlers that do not belong to a cog
+NO_COG = "bot"
+
+
+class HandlerStats: # pylint: disable=too-many-instance-attributes
+    """
+    This class holds the counters of an event handler or a command.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.blocking_time = 0.0
+        self.max_blocking = 0.0
+        self.slow_callbacks = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, duration: float, failed: bool, timer: "BlockingTimer | None") -> None:
+        """
+        Count a call of the handler.
+        """
+        self.calls += 1
+        self.errors += failed
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+        if timer is not None:
+            self.blocking_time += timer.total
+            self.max_blocking = max(self.max_blocking, timer.longest)
+            self.slow_callbacks += timer.slow
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a latency quantile as the upper bound of its histogram bucket.
+        """
+        wanted = fraction * self.calls
+        seen = 0
+
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return bound
+
+        return self.max_time
+
+
+class BlockingTimer:
+    """
+    This class runs a coroutine and times each of its steps, the time it
+    holds the event loop between two awaits.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.total = 0.0
+        self.longest = 0.0
+        self.slow = 0
+
+    @types.coroutine
+    def run(self, coro: Coroutine) -> Any:
+        """
+        Await a coroutine, driving it one step at a time.
+        """
+        send: Callable[[Any], Any] = coro.send
+        value: Any = None
+
+        while True:
+            start = time.perf_counter()
+            try:
+                yielded = send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.record(time.perf_counter() - start)
+
+            try:
+                value = yield yielded
+                send = coro.send
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as error: # pylint: disable=broad-exception-caught
+                send, value = coro.throw, error
+
+    def record(self, step: float) -> None:
+        """
+        Count the time of a step.
+        """
+        self.total += step
+        self.longest = max(self.longest, step)
+        if step > self.threshold:
+            self.slow += 1
+
+
+class Profiler:
+    """
+    This class keeps the counters of every event handler and command.
+    """
+
+    def __init__(self, slow_callback: float):
+        self.slow_callback = slow_callback
+        self.started_at = time.monotonic()
+        self.stats: dict[tuple[str, str, str], HandlerStats] = {}
+
+    def record( # pylint: disable=too-many-arguments
+            self,
+            kind: str,
+            cog: str,
+            handler: str,
+            duration: float,
+            failed: bool,
+            timer: BlockingTimer | None = None) -> None:
+        """
+        Count a call of an event handler or a command.
+
+        Arguments:
+            kind: "event" or "command".
+            cog: The name of the cog of the handler.
+            handler: The name of the handler.
+            duration: The latency of the call in seconds.
+            failed: If the call raised.
+            timer: The time the call held the event loop.
+        """
+        key = (kind, cog, handler)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = HandlerStats()
+
+        stats.add(duration, failed, timer)
+
+        if timer is not None and timer.longest > self.slow_callback:
+            logger.warning("%s %s of cog %s blocked the event loop for %.0fms",
+                           kind.capitalize(), handler, cog, timer.longest * 1000)
+
+    async def measure(self, kind: str, cog: str, handler: str, coro: Coroutine) -> Any:
+        """
+        Await a coroutine and count it against a handler.
+        """
+        timer = BlockingTimer(self.slow_callback)
+        start = time.perf_counter()
+        failed = True
+
+        try:
+            result = await timer.run(coro)
+            failed = False
+            return result
+        finally:
+            self.record(kind, cog, handler, time.perf_counter() - start, failed, timer)
+
+    def wrap(self, coro: Callable[..., Coroutine], event_name: str) -> Callable[..., Coroutine]:
+        """
+        Wrap an event handler so its calls are counted.
+        """
+        cog, handler = handlerName(coro, event_name)
+
+        async def profiled(*args: Any, **kwargs: Any) -> Any:
+            return await self.measure("event", cog, handler, coro(*args, **kwargs))
+
+        return profiled
+
+    def cogs(self) -> dict[str, HandlerStats]:
+        """
+        Get the counters of every cog, the sums of its handlers and commands.
+        """
+        totals: dict[str, HandlerStats] = {}
+
+        for (_, cog, _), stats in self.stats.items():
+            total = totals.setdefault(cog, HandlerStats())
+            total.calls += stats.calls
+            total.errors += stats.errors
+            total.total_time += stats.total_time
+            total.max_time = max(total.max_time, stats.max_time)
+            total.blocking_time += stats.blocking_time
+            total.max_blocking = max(total.max_blocking, stats.max_blocking)
+            total.slow_callbacks += stats.slow_callbacks
+            total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+
+        return totals
+
+    def reset(self) -> None:
+        """
+        Drop every counter.
+        """
+        self.stats.clear()
+        self.started_at = time.monotonic()
+
+
+def handlerName(coro: Callable[..., Coroutine], event_name: str) -> tuple[str, str]:
+    """
+    Get the cog and the name of an event handler.
+
+    Returns:
+        tuple[str, str]: The name of the cog, or "bot" for handlers outside
+        of a cog, and the name of the handler.
+    """
+    owner = getattr(coro, "__self__", None)
+
+    if isinstance(owner, commands.Cog):
+        return owner.qualified_name, coro.__qualname__
+
+    if isinstance(owner, commands.Bot):
+        return NO_COG, event_name
+
+    name = getattr(coro, "__name__", event_name)
+    return NO_COG, f"{getattr(coro, '__module__', '')}.{name}".lstrip(".")
+
+
+def isProfilerEnabled() -> bool:
+    """
+    Check if the handlers should be profiled.
+    """
+    return os.getenv("DISCORD_BOT_PROFILER", "False") == "True"
+
+
+def createProfiler() -> Profiler | None:
+    """
+    Create the profiler, None if it is disabled.
+    """
+    if not isProfilerEnabled():
+        return None
+
+    return Profiler(float(os.getenv("DISCORD_BOT_PROFILER_SLOW_CALLBACK", "0.1")))
+
+
+def getProfiler(bot: commands.Bot) -> Profiler | None:
+    """
+    Get the profiler of the bot, None if it is disabled.
+    """
+    return getattr(bot, "profiler", None)
+
+
+class ProfilerMixin: # pylint: disable=too-few-public-methods
+    """
+    This mixin profiles every event handler and command of the bot.
+    """
+
+    profiler: Profiler | None
+
+    def _schedule_event(
+            self,
+            coro: Callable[..., Coroutine],
+            event_name: str,
+            *args: Any,
+            **kwargs: Any) -> Any:
+        """
+        Wrap the event handler in the profiler, then schedule it as usual.
+
+        discord.py has no public hook around the event handlers it schedules,
+        so this is the one private method the bot class overrides.
+        """
+        if self.profiler is not None:
+            coro = self.profiler.wrap(coro, event_name)
+
+        return super()._schedule_event( # type: ignore[misc]
+            coro, event_name, *args, **kwargs)
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        """
+        Invoke the command of the context, counting it against its cog.
+        """
+        if self.profiler is None or ctx.command is None:
+            await super().invoke(ctx) # type: ignore[misc]
+            return
+
+        command = ctx.command
+        await self.profiler.measure(
+            "command",
+            command.cog_name or NO_COG,
+            command.qualified_name,
+            super().invoke(ctx)) # type: ignore[misc]
+
+        # the errors of commands are handled by the bot, not raised
+        if ctx.command_failed:
+            self.profiler.stats[("command", command.cog_name or NO_COG,
+                                 command.qualified_name)].errors += 1
@@ -1,8 +1,8 @@
 """
 This module contains functions to read json files.
 """
-import json
 import os
+from helpers.json_codec import loadJson
 
 
 def readJson(path) -> dict | list:
@@ -14,11 +14,11 @@ def readJson(path) -> dict | list:
         # load all json files from the given directory and return them in a dictionary
         for filename in os.listdir(path):
             if filename.endswith(".json"):
-                with open(f"{path}/{filename}", encoding="utf-8") as json_file:
-                    read_json[filename[:-5]] = json.load(json_file)
+                with open(f"{path}/{filename}", "rb") as json_file:
+                    read_json[filename[:-5]] = loadJson(json_file.read())
     elif os.path.isfile(path) and path.endswith(".json"):
         # load a single json file and return it as a dictionary
-        with open(path, encoding="utf-8") as json_file:
-            return json.load(json_file)
+        with open(path, "rb") as json_file:
+            return loadJson(json_file.read())
 
     return read_json
@@ -0,0 +1,335 @@
+"""
+This file contains the outbound message queue for the cogs.
+
+Every channel has a bounded queue and a token bucket that follows the rate
+limit of sending messages to a channel, so a burst of events waits in the
+queue instead of running into 429 responses. Messages sent with
+send_coalesced are merged while they wait, a mass join sends
+"Welcome A, B, C." instead of one message per member. A queue that is full
+drops new messages, and a channel's worker task and bucket are forgotten
+once the bucket is refilled and nothing is left to send. When the bot is
+closed the waiting messages are sent for up to the drain timeout, and only
+the messages left after it are dropped.
+
+The queue is configured with the environment variables:
+    - DISCORD_BOT_SEND_QUEUE (default: "True")
+    - DISCORD_BOT_SEND_RATE (default: 5, messages per channel per period)
+    - DISCORD_BOT_SEND_PER (default: 5.0, seconds)
+    - DISCORD_BOT_SEND_QUEUE_DEPTH (default: 50, messages per channel)
+    - DISCORD_BOT_SEND_DRAIN_TIMEOUT (default: 5.0, seconds)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger("discord.send_queue")
+
+# The longest message content Discord accepts
+MAX_MESSAGE_LENGTH = 2000
+
+
+class TokenBucket:
+    """
+    This class tracks the messages a channel can send before it is rate limited.
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        """
+        Add the tokens regained since the last update.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Take a token if one is left.
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until the next one.
+        """
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        return (1 - self.tokens) * self.per / self.rate
+
+    def is_full(self) -> bool:
+        """
+        Check if the bucket is refilled completely.
+        """
+        self.refill()
+        return self.tokens >= self.rate
+
+
+class OutboundMessage:
+    """
+    This class is a queued message, or a template that queued parts are merged into.
+    """
+
+    __slots__ = ("content", "template", "parts")
+
+    def __init__(self, content: str, template: str | None = None):
+        self.content = content
+        self.template = template
+        self.parts: list[str] = []
+
+    def merge(self, part: str) -> bool:
+        """
+        Add a part to the merged message if it still fits in one message.
+        """
+        if self.template is None or len(self.render(part)) > MAX_MESSAGE_LENGTH:
+            return False
+
+        self.parts.append(part)
+        return True
+
+    def render(self, extra_part: str | None = None) -> str:
+        """
+        Get the content of the message, with an extra part when given.
+        """
+        if self.template is None:
+            return self.content
+
+        parts = self.parts if extra_part is None else [*self.parts, extra_part]
+        return self.template.format(", ".join(parts))
+
+
+class ChannelQueue: # pylint: disable=too-few-public-methods
+    """
+    This class holds the queued messages and the bucket of a channel.
+    """
+
+    def __init__(self, channel: discord.abc.Messageable, bucket: TokenBucket):
+        self.channel = channel
+        self.bucket = bucket
+        self.messages: deque[OutboundMessage] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class SendQueue: # pylint: disable=too-many-instance-attributes
+    """
+    This class sends the messages of the cogs without exceeding the channel
+    rate limits.
+
+    Arguments:
+        rate: The number of messages a channel can send per period.
+        per: The length of the period in seconds.
+        depth: The number of messages that can wait per channel.
+        drain_timeout: The seconds the waiting messages get to be sent on close.
+    """
+
+    def __init__(self, rate: int, per: float, depth: int, drain_timeout: float = 5.0):
+        self.rate = rate
+        self.per = per
+        self.depth = depth
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self._channels: dict[int, ChannelQueue] = {}
+
+    def _channel_queue(self, channel: discord.abc.Messageable) -> ChannelQueue:
+        """
+        Get the queue of a channel, starting its worker if it is not running.
+        """
+        channel_id = channel.id
+        queue = self._channels.get(channel_id)
+
+        if queue is None:
+            queue = ChannelQueue(channel, TokenBucket(self.rate, self.per))
+            self._channels[channel_id] = queue
+
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(channel_id, queue))
+
+        return queue
+
+    def _enqueue(self, queue: ChannelQueue, message: OutboundMessage) -> bool:
+        """
+        Add a message to the queue of a channel, unless the queue is full.
+        """
+        if len(queue.messages) >= self.depth:
+            self.dropped += 1
+            logger.warning("Send queue of channel %s is full, dropped a message",
+                           queue.channel.id)
+            return False
+
+        queue.messages.append(message)
+        queue.wakeup.set()
+        self.queued += 1
+        return True
+
+    def send(self, channel: discord.abc.Messageable, content: str) -> bool:
+        """
+        Queue a message to a channel.
+
+        Returns:
+            bool: True if the message was queued, False if the queue was full.
+        """
+        return self._enqueue(self._channel_queue(channel), OutboundMessage(content))
+
+    def send_coalesced(self, channel: discord.abc.Messageable, template: str, part: str) -> bool:
+        """
+        Queue a part of a message to a channel, merged with the parts of the
+        same template that are still waiting, like send_coalesced(channel,
+        "Welcome {}.", member.mention).
+
+        Returns:
+            bool: True if the part was queued, False if the queue was full.
+        """
+        queue = self._channel_queue(channel)
+
+        # the newest waiting message of the template takes the part if it fits
+        for message in reversed(queue.messages):
+            if message.template == template:
+                if message.merge(part):
+                    self.coalesced += 1
+                    return True
+                break
+
+        message = OutboundMessage(template, template)
+        message.parts.append(part)
+        return self._enqueue(queue, message)
+
+    async def _drain(self, channel_id: int, queue: ChannelQueue) -> None:
+        """
+        Send the messages of a channel as fast as its bucket allows, and
+        forget the channel once its bucket is refilled and nothing is left.
+        """
+        try:
+            while True:
+                while queue.messages:
+                    delay = queue.bucket.acquire()
+                    if delay:
+                        # the waiting messages keep merging during the delay
+                        await asyncio.sleep(delay)
+                        continue
+
+                    await self._send(queue.channel, queue.messages.popleft())
+
+                # nothing is left to send before the bot is closed
+                if self.draining:
+                    break
+
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), self.per)
+                except asyncio.TimeoutError:
+                    if not queue.messages and queue.bucket.is_full():
+                        break
+        finally:
+            queue.task = None
+            if not queue.messages:
+                self._channels.pop(channel_id, None)
+
+    async def _send(self, channel: discord.abc.Messageable, message: OutboundMessage) -> None:
+        """
+        Send a message, logging the errors instead of raising them.
+        """
+        try:
+            await channel.send(message.render())
+            self.sent += 1
+        except discord.HTTPException as error:
+            self.errors += 1
+            logger.warning("Could not send a message to channel %s: %s",
+                           channel.id,
+                           error)
+
+    def pending(self) -> int:
+        """
+        Get the number of messages waiting in every channel.
+        """
+        return sum(len(queue.messages) for queue in self._channels.values())
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the counters, the waiting messages and the channels with a queue.
+        """
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": self.pending(),
+            "channels": len(self._channels),
+        }
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Send the waiting messages of every channel, for at most timeout
+        seconds, the drain timeout by default.
+
+        Returns:
+            bool: True if every waiting message was sent.
+        """
+        self.draining = True
+        for queue in self._channels.values():
+            queue.wakeup.set()
+
+        tasks = [queue.task for queue in self._channels.values() if queue.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.drain_timeout if timeout is None else timeout)
+
+        return not self.pending()
+
+    async def close(self) -> None:
+        """
+        Stop every worker, the messages that are still waiting are dropped,
+        drain the queue first to send them.
+        """
+        tasks = [queue.task for queue in self._channels.values() if queue.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.pending():
+            logger.warning("Dropped %s queued messages on shutdown", self.pending())
+        self._channels.clear()
+
+
+def isSendQueueEnabled() -> bool:
+    """
+    Check if the cogs should send their messages through the send queue.
+    """
+    return os.getenv("DISCORD_BOT_SEND_QUEUE", "True") == "True"
+
+
+def attachSendQueue(bot: commands.Bot) -> None:
+    """
+    Give the bot a send queue, if it is enabled.
+    """
+    if not isSendQueueEnabled():
+        return
+
+    setattr(bot, "send_queue", SendQueue(
+        rate=int(os.getenv("DISCORD_BOT_SEND_RATE", "5")),
+        per=float(os.getenv("DISCORD_BOT_SEND_PER", "5.0")),
+        depth=int(os.getenv("DISCORD_BOT_SEND_QUEUE_DEPTH", "50")),
+        drain_timeout=float(os.getenv("DISCORD_BOT_SEND_DRAIN_TIMEOUT", "5.0")),
+    ))
+
+
+def getSendQueue(bot: Any) -> SendQueue | None:
+    """
+    Get the send queue of the bot, None if it is disabled.
+    """
+    return getattr(bot, "send_queue", None)
@@ -0,0 +1,236 @@
+"""
+This module contains the sharding configuration and the per-shard metrics.
+
+The shard mode is set with the environment variables:
+    - DISCORD_BOT_SHARD_MODE ("none", "auto" or "explicit", default: "none")
+    - DISCORD_BOT_SHARD_COUNT (the total number of shards, for "explicit")
+    - DISCORD_BOT_SHARD_IDS (the shards run by this process, e.g. "0,1" or "0-3")
+"""
+
+import logging
+import os
+import time
+from typing import Any
+from discord.ext import commands
+
+logger = logging.getLogger("discord.shards")
+
+SHARD_MODE_NONE = "none"
+SHARD_MODE_AUTO = "auto"
+SHARD_MODE_EXPLICIT = "explicit"
+
+
+class ShardMetrics:
+    """
+    This class counts the events, connects and reconnects of every shard.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.events: dict[int, int] = {}
+        self.connects: dict[int, int] = {}
+        self.disconnects: dict[int, int] = {}
+        self.resumes: dict[int, int] = {}
+
+    def record_event(self, shard_id: int) -> None:
+        """
+        Count a dispatched event.
+        """
+        self.events[shard_id] = self.events.get(shard_id, 0) + 1
+
+    def record_connect(self, shard_id: int) -> None:
+        """
+        Count a new gateway session of a shard.
+        """
+        self.connects[shard_id] = self.connects.get(shard_id, 0) + 1
+
+    def record_disconnect(self, shard_id: int) -> None:
+        """
+        Count a lost gateway connection of a shard.
+        """
+        self.disconnects[shard_id] = self.disconnects.get(shard_id, 0) + 1
+
+    def record_resume(self, shard_id: int) -> None:
+        """
+        Count a resumed gateway session of a shard.
+        """
+        self.resumes[shard_id] = self.resumes.get(shard_id, 0) + 1
+
+    def snapshot(self, bot: commands.Bot) -> dict[int, dict]:
+        """
+        Get the metrics of every shard.
+
+        Returns:
+            dict[int, dict]: The latency, event count and rate, and the
+            reconnect counters of each shard id.
+        """
+        uptime = max(time.monotonic() - self.started_at, 1e-9)
+        shards = {}
+
+        for shard_id, latency in getShardLatencies(bot):
+            events = self.events.get(shard_id, 0)
+            shards[shard_id] = {
+                "latency": latency,
+                "events": events,
+                "events_per_second": events / uptime,
+                "disconnects": self.disconnects.get(shard_id, 0),
+                "resumes": self.resumes.get(shard_id, 0),
+                "reconnects": max(self.connects.get(shard_id, 0) - 1, 0),
+            }
+
+        return shards
+
+
+def shardOfEvent(event_name: str, args: tuple) -> int | None:
+    """
+    Find the shard an event was received on from its arguments.
+
+    Returns:
+        int | None: The shard id, or None if the event is not tied to a guild.
+    """
+    if not args:
+        return None
+
+    first = args[0]
+
+    if event_name.startswith("shard_") and isinstance(first, int):
+        return first
+
+    shard_id = getattr(first, "shard_id", None)
+    if isinstance(shard_id, int):
+        return shard_id
+
+    guild = getattr(first, "guild", None)
+    if guild is not None:
+        return guild.shard_id
+
+    # direct messages are always received on shard 0
+    return 0 if hasattr(first, "channel") else None
+
+
+class ShardMetricsMixin: # pylint: disable=too-few-public-methods
+    """
+    This mixin counts every dispatched event against the shard it came from.
+    """
+
+    shard_metrics: ShardMetrics
+
+    def dispatch(self, event_name: str, /, *args: Any, **kwargs: Any) -> None:
+        """
+        Count the event, then dispatch it as usual.
+        """
+        shard_id = shardOfEvent(event_name, args)
+        if shard_id is not None:
+            self.shard_metrics.record_event(shard_id)
+
+        super().dispatch(event_name, *args, **kwargs) # type: ignore[misc]
+
+
+def parseShardIds(shard_ids: str) -> list[int]:
+    """
+    Parse a list of shard ids like "0,1,2" or a range like "0-3".
+    """
+    parsed = []
+
+    for part in shard_ids.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-", 1)
+            parsed.extend(range(int(first), int(last) + 1))
+        elif part:
+            parsed.append(int(part))
+
+    return parsed
+
+
+def getShardOptions() -> dict:
+    """
+    Get the sharding keyword arguments for the bot from the environment.
+
+    Returns:
+        dict: The shard_count and shard_ids to pass to the bot, empty for the
+        "none" and "auto" modes.
+    """
+    mode = os.getenv("DISCORD_BOT_SHARD_MODE", SHARD_MODE_NONE)
+
+    if mode != SHARD_MODE_EXPLICIT:
+        return {}
+
+    options: dict[str, Any] = {"shard_count": int(os.environ["DISCORD_BOT_SHARD_COUNT"])}
+
+    shard_ids = os.getenv("DISCORD_BOT_SHARD_IDS", None)
+    if shard_ids:
+        options["shard_ids"] = parseShardIds(shard_ids)
+
+    return options
+
+
+def isSharded() -> bool:
+    """
+    Check if the bot runs in a sharded mode.
+    """
+    return os.getenv("DISCORD_BOT_SHARD_MODE", SHARD_MODE_NONE) != SHARD_MODE_NONE
+
+
+def getShardLatencies(bot: commands.Bot) -> list[tuple[int, float]]:
+    """
+    Get the gateway latency of every shard in seconds.
+    """
+    if isinstance(bot, commands.AutoShardedBot):
+        return bot.latencies
+
+    return [(0, bot.latency)]
+
+
+def ownsGuild(bot: commands.Bot, guild_id: int) -> bool:
+    """
+    Check if a guild is handled by one of the shards of this process.
+    """
+    if not isinstance(bot, commands.AutoShardedBot) or bot.shard_ids is None:
+        return True
+
+    shard_count = bot.shard_count or 1
+    return (guild_id >> 22) % shard_count in bot.shard_ids
+
+
+def registerShardEvents(bot: commands.Bot) -> None:
+    """
+    Register the listeners that track the gateway connections of each shard.
+    """
+    metrics: ShardMetrics = getattr(bot, "shard_metrics")
+
+    if isinstance(bot, commands.AutoShardedBot):
+        async def onShardConnect(shard_id: int):
+            metrics.record_connect(shard_id)
+
+        async def onShardDisconnect(shard_id: int):
+            metrics.record_disconnect(shard_id)
+            logger.warning("Shard %s disconnected", shard_id)
+
+        async def onShardResumed(shard_id: int):
+            metrics.record_resume(shard_id)
+            logger.info("Shard %s resumed", shard_id)
+
+        async def onShardReady(shard_id: int):
+            logger.info("Shard %s is ready", shard_id)
+
+        bot.add_listener(onShardConnect, "on_shard_connect")
+        bot.add_listener(onShardDisconnect, "on_shard_disconnect")
+        bot.add_listener(onShardResumed, "on_shard_resumed")
+        bot.add_listener(onShardReady, "on_shard_ready")
+        return
+
+    async def onConnect():
+        metrics.record_connect(0)
+
+    async def onDisconnect():
+        metrics.record_disconnect(0)
+        logger.warning("Disconnected from the gateway")
+
+    async def onResumed():
+        metrics.record_resume(0)
+        logger.info("Resumed the gateway session")
+
+    bot.add_listener(onConnect, "on_connect")
+    bot.add_listener(onDisconnect, "on_disconnect")
+    bot.add_listener(onResumed, "on_resumed")
@@ -0,0 +1,57 @@
+"""
+    This is the cluster launcher for the bot.
+
+    It spreads the shards over one worker process per cluster, so the events
+    are handled on every CPU core instead of one.
+"""
+
+import asyncio
+import logging
+import os
+from multiprocessing.connection import Connection
+from typing import Any
+from helpers.cluster import ClusterLink, ClusterSupervisor, fetchRecommendedShards
+from helpers.env import getEnvVar
+
+
+def runCluster(
+        cluster_id: int,
+        shard_ids: list[int],
+        shard_count: int,
+        log_queue: Any,
+        connection: Connection) -> None:
+    """
+    Entry point of a cluster worker process.
+    """
+    os.environ["DISCORD_BOT_SHARD_MODE"] = "explicit"
+    os.environ["DISCORD_BOT_SHARD_COUNT"] = str(shard_count)
+    os.environ["DISCORD_BOT_SHARD_IDS"] = f"{shard_ids[0]}-{shard_ids[-1]}"
+    os.environ["DISCORD_BOT_CLUSTER_ID"] = str(cluster_id)
+
+    ClusterLink.connect(ClusterLink(cluster_id, connection, log_queue))
+
+    # imported here so the launcher itself does not load the bot
+    import bot # pylint: disable=import-outside-toplevel
+    bot.main()
+
+
+def main():
+    """
+    Main entry point for the launcher.
+    """
+    logging.getLogger().setLevel(int(getEnvVar("DISCORD_BOT_LOG_LEVEL")))
+    launcher_logging = logging.getLogger("discord.cluster.launcher")
+
+    shard_count = os.getenv("DISCORD_BOT_SHARD_COUNT", None)
+    if shard_count is None:
+        shard_count = asyncio.run(fetchRecommendedShards(getEnvVar("DISCORD_BOT_TOKEN")))
+        launcher_logging.info("Using the recommended shard count of %s", shard_count)
+
+    clusters = int(os.getenv("DISCORD_BOT_CLUSTERS", str(os.cpu_count() or 1)))
+
+    ClusterSupervisor(int(shard_count), clusters, runCluster).run()
+
+
+# Run the main function
+if __name__ == "__main__":
+    main()
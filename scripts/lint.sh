@@ -1,4 +1,5 @@
 #!/bin/bash
 
-# Run pylint on all python files in the project
-find bot/ ! -path "./.venv/*" -type f -name "*.py"  | xargs pylint --rcfile pylintrc
\ No newline at end of file
+# Run pylint on all python files tracked in the project, from the project root
+cd "$(dirname "$0")/.." || exit 1
+git ls-files '*.py' | xargs pylint --rcfile pylintrc
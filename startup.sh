@@ -5,5 +5,14 @@ if [ ! -f /root/.ssh/id_ed25519 ]; then
   ssh-keygen -t ed25519 -C "Discord Bot" -f /root/.ssh/id_ed25519
 fi
 
-# Start the bot
-python bot.py
\ No newline at end of file
+# Install the cog packages from their git repositories
+if [ -n "$DISCORD_BOT_COG_REPOS" ]; then
+  python -m helpers.cog_installer sync
+fi
+
+# Start the bot, spread over multiple processes if DISCORD_BOT_CLUSTERS is set
+if [ -n "$DISCORD_BOT_CLUSTERS" ]; then
+  python launcher.py
+else
+  python bot.py
+fi
\ No newline at end of file
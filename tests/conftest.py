@@ -0,0 +1,52 @@
+"""
+This file contains the shared fixtures of the tests.
+
+The database helpers run against an in-memory mongomock client, and the
+process wide state of the helpers is reset between the tests.
+"""
+
+import os
+import mongomock
+import pytest
+
+# helpers.logs exits without a numeric log level
+os.environ.setdefault("DISCORD_BOT_LOG_LEVEL", "30")
+
+# pylint: disable=wrong-import-position
+from helpers.database import tenancy
+from helpers.database.cache import document_cache
+from helpers.database.namespace_index import namespace_index
+from helpers.guild.prefixes import prefix_index
+
+
+def resetDatabaseState() -> None:
+    """
+    Forget the process wide state of the database helpers.
+    """
+    document_cache.clear()
+    namespace_index.invalidate()
+    tenancy.registered_guilds.invalidate()
+    tenancy._indexed_collections.clear() # pylint: disable=protected-access
+    prefix_index.replace({})
+
+
+@pytest.fixture(name="storage_mode",
+                params=[tenancy.STORAGE_MODE_PER_GUILD, tenancy.STORAGE_MODE_SHARED])
+def storageModeFixture(request, monkeypatch):
+    """
+    Run a test in both storage modes.
+    """
+    monkeypatch.setenv("DISCORD_MONGO_DB_STORAGE_MODE", request.param)
+    return request.param
+
+
+@pytest.fixture(name="db_connection")
+def dbConnectionFixture():
+    """
+    An in-memory database connection with the helper state reset.
+    """
+    resetDatabaseState()
+    client = mongomock.MongoClient()
+    yield client
+    client.close()
+    resetDatabaseState()
@@ -0,0 +1,34 @@
+"""
+This file contains the tests of the document cache.
+"""
+
+from helpers.database.cache import DocumentCache
+
+
+def test_lookup_racing_a_clear_is_not_cached():
+    cache = DocumentCache(max_bytes=1024, ttl=60)
+
+    generation = cache.generation("123_db", "notes")
+    cache.clear()
+    cache.put("123_db", "notes", {"key": 1}, {"key": 1, "text": "old"}, generation)
+
+    assert cache.get("123_db", "notes", {"key": 1}) is None
+
+
+def test_invalidate_drops_the_collection():
+    cache = DocumentCache(max_bytes=1024, ttl=60)
+
+    cache.put("123_db", "notes", {"key": 1}, {"key": 1}, cache.generation("123_db", "notes"))
+    assert cache.get("123_db", "notes", {"key": 1}) == {"key": 1}
+
+    cache.invalidate("123_db")
+    assert cache.get("123_db", "notes", {"key": 1}) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_lookups_are_misses():
+    cache = DocumentCache(max_bytes=1024, ttl=-1)
+
+    cache.put("123_db", "notes", {"key": 1}, {"key": 1}, cache.generation("123_db", "notes"))
+    assert cache.get("123_db", "notes", {"key": 1}) is None
+    assert cache.stats()["misses"] == 1
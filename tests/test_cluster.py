@@ -0,0 +1,41 @@
+"""
+This file contains the tests of the cluster supervisor.
+"""
+
+import time
+from types import SimpleNamespace
+from helpers.cluster import RESTART_RESET, ClusterSupervisor, splitShards
+
+
+def crash(supervisor: ClusterSupervisor, ran_for: float) -> float:
+    """
+    Let the first cluster exit after running for ran_for seconds.
+
+    Returns:
+        float: The seconds until the cluster is restarted.
+    """
+    worker = supervisor.workers[0]
+    worker.process = SimpleNamespace(exitcode=1)
+    worker.connection = SimpleNamespace(close=lambda: None)
+    worker.started_at = time.monotonic() - ran_for
+
+    supervisor._on_exit(worker) # pylint: disable=protected-access
+    return worker.restart_at - time.monotonic()
+
+
+def test_restarts_are_counted_across_backoff_resets():
+    supervisor = ClusterSupervisor(shard_count=2, clusters=1, target=print)
+
+    delays = [crash(supervisor, 1) for _ in range(3)]
+    assert [round(delay) for delay in delays] == [1, 2, 4]
+
+    # a crash after a long run starts a new backoff
+    assert round(crash(supervisor, RESTART_RESET + 1)) == 1
+
+    stats = supervisor.workers[0].stats()
+    assert (stats["restarts"], stats["restart_streak"]) == (4, 1)
+
+
+def test_shards_are_split_evenly():
+    assert splitShards(5, 2) == [[0, 1, 2], [3, 4]]
+    assert splitShards(2, 4) == [[0], [1]]
@@ -0,0 +1,78 @@
+"""
+This file contains the tests of the discovery of the cogs.
+"""
+
+import json
+import pytest
+from helpers.cog_discovery import discoverCogs
+
+BASE_MODULE = '''
+from discord.ext import commands
+
+
+class BaseCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+'''
+
+COGS_MODULE = '''
+from discord.ext import commands
+from testdiscovery.demo.base import BaseCog
+
+NAME = "greet"
+
+
+class Named(commands.Cog):
+    @commands.command(name=NAME)
+    async def greet(self, ctx):
+        """Greet."""
+
+
+class Grouped(commands.GroupCog):
+    pass
+
+
+class Derived(BaseCog):
+    @commands.command()
+    async def derived(self, ctx):
+        """Derived."""
+
+
+class NotACog(Exception):
+    pass
+'''
+
+
+@pytest.fixture(name="directory")
+def directoryFixture(tmp_path, monkeypatch):
+    """
+    A "demo" cog folder with cogs that ast alone cannot describe.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv("DISCORD_BOT_COG_CACHE", "")
+
+    folder = tmp_path / "testdiscovery" / "demo"
+    folder.mkdir(parents=True)
+    (folder / "base.py").write_text(BASE_MODULE)
+    (folder / "cogs.py").write_text(COGS_MODULE)
+
+    return folder
+
+
+@pytest.mark.usefixtures("directory")
+def test_finds_the_cogs_ast_cannot_describe():
+    found = {cog["class"]: cog["commands"] for cog in discoverCogs("testdiscovery")
+             if cog["module"] == "testdiscovery.demo.cogs"}
+
+    # the commands are only known once imported, so they are loaded eagerly
+    assert found == {"Named": None, "Grouped": None, "Derived": None}
+
+
+def test_finds_a_manifest_cog_with_a_project_base(directory):
+    (directory / "cog.json").write_text(json.dumps({"cogs": {"cogs": "Derived"}}))
+
+    found = [(cog["module"], cog["class"], cog["commands"])
+             for cog in discoverCogs("testdiscovery")]
+
+    assert found == [("testdiscovery.demo.cogs", "Derived", None)]
@@ -0,0 +1,130 @@
+"""
+This file contains the tests of the cog package installer.
+"""
+
+import io
+import json
+import subprocess
+import tarfile
+import threading
+import time
+import pytest
+from helpers import cog_installer
+from helpers.cog_installer import CogInstallError, installCog, installRequirements
+
+
+def git(folder, *args: str) -> str:
+    """
+    Run a git command in a folder.
+    """
+    return subprocess.run(
+        ["git", "-C", str(folder), "-c", "user.name=test", "-c", "user.email=test@example.com",
+         *args],
+        check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture(name="repository")
+def repositoryFixture(tmp_path, monkeypatch):
+    """
+    A git repository of a cog package, installed from a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DISCORD_BOT_COG_PACKAGE_CACHE", str(tmp_path / "cache"))
+    (tmp_path / "cogs" / "cog1").mkdir(parents=True)
+
+    folder = tmp_path / "demo"
+    folder.mkdir()
+    git(folder, "init", "-q")
+    (folder / "cog.json").write_text(json.dumps({"name": "Demo"}))
+    git(folder, "add", "cog.json")
+    git(folder, "commit", "-q", "-m", "Add the manifest")
+
+    return folder
+
+
+def test_rejects_the_names_of_the_bot_cog_packages(repository):
+    for name in ("cogs", "cog1", "not-a-module"):
+        with pytest.raises(CogInstallError):
+            installCog(str(repository), name=name)
+
+
+def test_installs_a_cached_commit_without_fetching(repository, monkeypatch):
+    commit = git(repository, "rev-parse", "HEAD")
+    installCog(str(repository), commit, name="demo")
+
+    commands = []
+    run_command = cog_installer.runCommand
+
+    def recordingRunCommand(args):
+        commands.append(args)
+        return run_command(args)
+
+    monkeypatch.setattr(cog_installer, "runCommand", recordingRunCommand)
+    record = installCog(str(repository), commit, name="demo")
+
+    assert record["commit"] == commit
+    assert not [args for args in commands if "remote" in args or "clone" in args]
+
+    # branches move, so they are still fetched
+    installCog(str(repository), "HEAD", name="demo")
+    assert [args for args in commands if "remote" in args]
+
+
+def test_pip_installs_run_one_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(cog_installer, "buildWheels", lambda requirements: str(tmp_path))
+    running = []
+    overlapped = []
+
+    def slowRunCommand(_args):
+        running.append(1)
+        overlapped.append(len(running) > 1)
+        time.sleep(0.05)
+        running.pop()
+        return b""
+
+    monkeypatch.setattr(cog_installer, "runCommand", slowRunCommand)
+    threads = [threading.Thread(target=installRequirements, args=([f"package{index}"],))
+               for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlapped == [False, False, False]
+
+
+def test_refuses_unsafe_archives_without_extraction_filters(tmp_path, monkeypatch):
+    monkeypatch.delattr(tarfile, "data_filter", raising=False)
+
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        member = tarfile.TarInfo("../outside.py")
+        tar.addfile(member, io.BytesIO(b""))
+    archive.seek(0)
+
+    with tarfile.open(fileobj=archive) as tar, pytest.raises(CogInstallError):
+        cog_installer.extractArchive(tar, str(tmp_path / "revision"))
+
+    assert not (tmp_path / "outside.py").exists()
+
+
+def test_rejects_options_in_the_url_and_ref(repository, monkeypatch):
+    def failingRunCommand(args):
+        raise AssertionError(f"ran {args}")
+
+    monkeypatch.setattr(cog_installer, "runCommand", failingRunCommand)
+
+    for url, ref in (("--upload-pack=touch pwned", "HEAD"), (str(repository), "--output=x")):
+        with pytest.raises(CogInstallError, match="Invalid repository"):
+            installCog(url, ref, name="demo")
+
+    with pytest.raises(CogInstallError, match="Invalid requirements"):
+        installRequirements(["--index-url=https://example.com"])
+
+
+def test_bad_manifest_is_reported(repository):
+    (repository / "cog.json").write_text("{\"requirements\": ")
+    git(repository, "commit", "-q", "-a", "-m", "Break the manifest")
+
+    with pytest.raises(CogInstallError, match="could not be read"):
+        installCog(str(repository), name="demo")
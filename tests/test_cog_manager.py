@@ -0,0 +1,107 @@
+"""
+This file contains the tests of the hot reloading of the cog packages.
+"""
+
+import asyncio
+import json
+import os
+import discord
+import pytest
+from discord.ext import commands
+from helpers.cog_manager import CogManager, CogManagerError
+
+COG_MODULE = '''
+from discord.ext import commands
+
+
+class {name}(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+'''
+
+
+@pytest.fixture(name="package")
+def packageFixture(tmp_path, monkeypatch):
+    """
+    A "demo" cog package with two cogs in a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv("DISCORD_BOT_COG_CACHE", "")
+
+    folder = tmp_path / "testcogs" / "demo"
+    folder.mkdir(parents=True)
+    (folder / "cog.json").write_text(json.dumps({"name": "Demo"}))
+    (folder / "first.py").write_text(COG_MODULE.format(name="First"))
+    (folder / "second.py").write_text(COG_MODULE.format(name="Second"))
+
+    return folder
+
+
+def test_reload_rolls_back_a_module_that_does_not_parse(package):
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    manager = CogManager(bot, "testcogs")
+
+    async def loadThenBreak() -> None:
+        await manager.load("demo")
+        (package / "second.py").write_text("class Second(:\n")
+        with pytest.raises(CogManagerError, match="Second"):
+            await manager.reload("demo")
+
+    asyncio.run(loadThenBreak())
+
+    assert set(bot.cogs) == {"First", "Second"}
+
+
+def test_load_checks_the_manifest(package):
+    (package / "cog.json").write_text(json.dumps({"cogs": {"first": "First", "third": "Third"}}))
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+
+    with pytest.raises(CogManagerError, match="third.Third"):
+        asyncio.run(CogManager(bot, "testcogs").load("demo"))
+
+    assert not bot.cogs
+
+
+def test_reload_rolls_back_a_manifest_that_does_not_parse(package):
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    manager = CogManager(bot, "testcogs")
+
+    async def loadThenBreak() -> None:
+        await manager.load("demo")
+        (package / "cog.json").write_text("{\"cogs\": ")
+        with pytest.raises(CogManagerError, match="demo"):
+            await manager.reload("demo")
+
+    asyncio.run(loadThenBreak())
+
+    assert set(bot.cogs) == {"First", "Second"}
+    assert len(manager.loaded["demo"]) == 2
+
+
+def test_load_all_skips_a_manifest_that_does_not_parse(package):
+    other = package.parent / "other"
+    other.mkdir()
+    (other / "cog.json").write_text("not json")
+    (other / "third.py").write_text(COG_MODULE.format(name="Third"))
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    manager = CogManager(bot, "testcogs")
+
+    asyncio.run(manager.load_all())
+
+    assert set(manager.loaded) == {"demo"}
+
+
+@pytest.mark.usefixtures("package")
+def test_signature_skips_files_removed_during_the_walk(monkeypatch):
+    stat = os.stat
+
+    def racingStat(path, *args, **kwargs):
+        if str(path).endswith("second.py"):
+            raise FileNotFoundError(path)
+        return stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", racingStat)
+    files = [name for name, _, _ in CogManager(None, "testcogs").signature("demo")]
+
+    assert files == ["testcogs/demo/cog.json", "testcogs/demo/first.py"]
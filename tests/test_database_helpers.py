@@ -0,0 +1,67 @@
+"""
+This file contains the tests of the create, read, update and delete helpers.
+"""
+
+import asyncio
+from helpers.database.async_operations import asyncStreamDocuments
+from helpers.database.create import createCollection, createDatabase, insertManyDocuments
+from helpers.database.delete import deleteDatabase, deleteOneDocument
+from helpers.database.read import fetchAllDocuments, fetchOneDocument, streamDocuments
+from helpers.database.update import updateDocument
+
+GUILD_DATABASE = "123_db"
+OTHER_GUILD_DATABASE = "456_db"
+
+
+def provision(db_connection, *database_names: str) -> None:
+    """
+    Create the guild databases with a "notes" collection.
+    """
+    for database_name in database_names:
+        assert createDatabase(db_connection, database_name)
+        assert createCollection(db_connection, database_name, "notes")
+
+
+def test_crud_round_trip(db_connection, storage_mode): # pylint: disable=unused-argument
+    provision(db_connection, GUILD_DATABASE)
+
+    assert insertManyDocuments(db_connection, GUILD_DATABASE, "notes",
+                               [{"key": 1, "text": "a"}, {"key": 2, "text": "b"}])
+    assert fetchOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})["text"] == "a"
+
+    assert updateDocument(db_connection, GUILD_DATABASE, "notes",
+                          {"key": 1}, {"$set": {"text": "c"}})
+    # the update invalidated the cached document
+    assert fetchOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})["text"] == "c"
+
+    assert deleteOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 2})
+    assert len(fetchAllDocuments(db_connection, GUILD_DATABASE, "notes", {})) == 1
+
+    assert deleteDatabase(db_connection, GUILD_DATABASE)
+
+
+def test_guilds_are_isolated(db_connection, storage_mode): # pylint: disable=unused-argument
+    provision(db_connection, GUILD_DATABASE, OTHER_GUILD_DATABASE)
+
+    insertManyDocuments(db_connection, GUILD_DATABASE, "notes", [{"key": 1}])
+    insertManyDocuments(db_connection, OTHER_GUILD_DATABASE, "notes", [{"key": 2}])
+
+    assert fetchAllDocuments(db_connection, GUILD_DATABASE, "notes", {"key": 2}) is False
+    assert [document["key"] for document in
+            fetchAllDocuments(db_connection, OTHER_GUILD_DATABASE, "notes", {})] == [2]
+
+
+def test_stream_documents_in_batches(db_connection, storage_mode): # pylint: disable=unused-argument
+    provision(db_connection, GUILD_DATABASE)
+    insertManyDocuments(db_connection, GUILD_DATABASE, "notes",
+                        [{"key": key} for key in range(25)])
+
+    batches = list(streamDocuments(db_connection, GUILD_DATABASE, "notes", {},
+                                   sort=[("key", 1)], batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+    async def collect() -> list:
+        return [batch async for batch in asyncStreamDocuments(
+            db_connection, GUILD_DATABASE, "notes", {}, batch_size=10)]
+
+    assert sum(len(batch) for batch in asyncio.run(collect())) == 25
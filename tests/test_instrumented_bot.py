@@ -0,0 +1,27 @@
+"""
+This file contains the tests of the bot class.
+"""
+
+from types import SimpleNamespace
+import discord
+from discord.ext import commands
+from helpers.instrumented_bot import InstrumentedBot, InstrumentedShardedBot, createBot
+
+
+def test_create_bot_in_both_shard_modes(monkeypatch):
+    bot = createBot(command_prefix="!", intents=discord.Intents.none())
+    assert isinstance(bot, InstrumentedBot)
+
+    monkeypatch.setenv("DISCORD_BOT_SHARD_MODE", "auto")
+    bot = createBot(command_prefix="!", intents=discord.Intents.none())
+    assert isinstance(bot, InstrumentedShardedBot)
+    assert isinstance(bot, commands.AutoShardedBot)
+
+
+def test_dispatched_events_are_counted():
+    bot = createBot(command_prefix="!", intents=discord.Intents.none())
+
+    bot.dispatch("shard_ready", 3)
+    bot.dispatch("typing", SimpleNamespace(guild=SimpleNamespace(shard_id=1)))
+
+    assert bot.shard_metrics.events == {3: 1, 1: 1}
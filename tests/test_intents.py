@@ -0,0 +1,56 @@
+"""
+This file contains the tests of the gateway intents requested by the cogs.
+"""
+
+import json
+from types import SimpleNamespace
+import discord
+import pytest
+from helpers import intents
+from helpers.intents import BASE_INTENTS, getIntentOptions, reportIntentSavings
+
+
+@pytest.fixture(name="cogs")
+def cogsFixture(tmp_path, monkeypatch):
+    """
+    An empty cogs folder in a temporary directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DISCORD_BOT_INTENTS", "auto")
+
+    folder = tmp_path / "cogs"
+    folder.mkdir()
+    return folder
+
+
+def addManifest(cogs, name: str, content: str) -> None:
+    """
+    Add a cog folder with a cog.json.
+    """
+    (cogs / name).mkdir()
+    (cogs / name / "cog.json").write_text(content)
+
+
+def test_bad_manifest_is_skipped(cogs):
+    addManifest(cogs, "broken", "{\"intents\": ")
+    addManifest(cogs, "listed", "[\"members\"]")
+    addManifest(cogs, "members", json.dumps({"intents": ["members"]}))
+
+    options = getIntentOptions()
+
+    assert options["intents"] == discord.Intents(
+        **{name: True for name in (*BASE_INTENTS, "members")})
+
+
+def test_only_bad_manifests_use_the_default_intents(cogs):
+    addManifest(cogs, "broken", "not json")
+
+    assert getIntentOptions()["intents"] == discord.Intents(
+        **{name: True for name in BASE_INTENTS})
+
+
+def test_savings_are_reported_without_resource(monkeypatch):
+    monkeypatch.setattr(intents, "resource", None)
+    guild = SimpleNamespace(member_count=10, members=[object()])
+
+    reportIntentSavings(SimpleNamespace(intents=discord.Intents.default(), guilds=[guild]))
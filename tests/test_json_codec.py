@@ -0,0 +1,42 @@
+"""
+This file contains the tests of the JSON codec of the bot.
+"""
+
+import json
+import pytest
+from helpers import json_codec
+from helpers.json_codec import JsonCodec, dumpJson, loadJson
+
+
+@pytest.fixture(name="codec")
+def codecFixture(monkeypatch):
+    """
+    The JSON codec, restored to json after the test.
+    """
+    monkeypatch.setattr(JsonCodec, "name", JsonCodec.name)
+    monkeypatch.setattr(JsonCodec, "loads", JsonCodec.loads)
+    monkeypatch.setattr(JsonCodec, "dumps", JsonCodec.dumps)
+
+    return JsonCodec
+
+
+def test_encodes_as_compact_as_discord_without_the_fast_mode(codec):
+    assert codec.name == "json"
+    assert dumpJson({"a": [1, "é"]}) == json.dumps({"a": [1, "é"]}, separators=(",", ":"))
+    assert loadJson(b'{"a": 1}') == {"a": 1}
+
+
+def test_switches_to_orjson_once_installed(codec):
+    pytest.importorskip("orjson")
+
+    assert codec.use_orjson()
+    assert codec.loads is json_codec.orjson.loads # pylint: disable=no-member
+    assert loadJson(dumpJson({"a": [1, 2]})) == {"a": [1, 2]}
+
+
+def test_keeps_json_when_orjson_is_not_installed(codec, monkeypatch):
+    monkeypatch.setattr(json_codec, "orjson", None)
+
+    assert not codec.use_orjson()
+    assert codec.name == "json"
+    assert loadJson("[1]") == [1]
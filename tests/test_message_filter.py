@@ -0,0 +1,104 @@
+"""
+This file contains the tests of the fast path of the command processing.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from discord.ext import commands
+from helpers.message_filter import MessageFilter, MessageFilterMixin
+
+BOT_USER_ID = 42
+
+
+def createBot(command_prefix) -> SimpleNamespace:
+    """
+    A bot with a user and a command prefix.
+    """
+    return SimpleNamespace(command_prefix=command_prefix, user=SimpleNamespace(id=BOT_USER_ID))
+
+
+def createMessage(content: str, bot_author: bool = False) -> SimpleNamespace:
+    """
+    A guild message from a user, or from a bot.
+    """
+    return SimpleNamespace(
+        content=content,
+        author=SimpleNamespace(bot=bot_author),
+        guild=SimpleNamespace(id=1))
+
+
+def test_string_prefix():
+    message_filter = MessageFilter()
+    bot = createBot("!")
+
+    assert message_filter.could_be_command(bot, createMessage("!help"))
+    assert not message_filter.could_be_command(bot, createMessage("hello"))
+
+
+def test_list_prefix_and_replaced_prefix():
+    message_filter = MessageFilter()
+    bot = createBot(["!", "?"])
+
+    assert message_filter.could_be_command(bot, createMessage("?help"))
+    assert not message_filter.could_be_command(bot, createMessage("$help"))
+
+    bot.command_prefix = "$"
+    assert message_filter.could_be_command(bot, createMessage("$help"))
+    assert not message_filter.could_be_command(bot, createMessage("?help"))
+
+
+def test_callable_and_mention_prefix():
+    message_filter = MessageFilter()
+    bot = createBot(commands.when_mentioned_or("!"))
+
+    assert message_filter.could_be_command(bot, createMessage(f"<@{BOT_USER_ID}> help"))
+    assert message_filter.could_be_command(bot, createMessage("!help"))
+    assert not message_filter.could_be_command(bot, createMessage("help"))
+
+
+def test_coroutine_prefix_is_left_to_discord():
+    async def prefix(_bot, _message):
+        return "!"
+
+    assert MessageFilter().could_be_command(createBot(prefix), createMessage("hello"))
+
+
+def test_counters():
+    message_filter = MessageFilter()
+    bot = createBot("!")
+
+    message_filter.could_be_command(bot, createMessage("!help", bot_author=True))
+    message_filter.could_be_command(bot, createMessage("hello"))
+    message_filter.could_be_command(bot, createMessage("!help"))
+
+    assert message_filter.stats() == {
+        "checked": 3, "bot_authors": 1, "no_prefix": 1, "passed": 1}
+
+
+def test_rejected_messages_skip_the_command_processing():
+    processed = []
+
+    class Processor: # pylint: disable=too-few-public-methods
+        """
+        Records the messages that reach the command processing.
+        """
+
+        async def process_commands(self, message):
+            """
+            Record the message.
+            """
+            processed.append(message.content)
+
+    class FilteredBot(MessageFilterMixin, Processor): # pylint: disable=too-few-public-methods
+        """
+        A bot with the message filter.
+        """
+
+        command_prefix = "!"
+        message_filter = MessageFilter()
+
+    bot = FilteredBot()
+    asyncio.run(bot.process_commands(createMessage("hello")))
+    asyncio.run(bot.process_commands(createMessage("!help")))
+
+    assert processed == ["!help"]
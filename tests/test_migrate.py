@@ -0,0 +1,53 @@
+"""
+This file contains the tests of the migration to the shared storage mode.
+"""
+
+import pytest
+from pymongo.errors import BulkWriteError
+from helpers.database import tenancy
+from helpers.database.migrate import migrateToSharedStorage
+from helpers.database.read import fetchOneDocument
+
+
+@pytest.fixture(name="shared", autouse=True)
+def sharedFixture(monkeypatch):
+    """
+    Read the migrated documents in the shared storage mode.
+    """
+    monkeypatch.setenv("DISCORD_MONGO_DB_STORAGE_MODE", tenancy.STORAGE_MODE_SHARED)
+
+
+def test_same_id_from_two_guilds(db_connection):
+    db_connection["123_db"]["notes"].insert_one({"_id": "settings", "text": "a"})
+    db_connection["456_db"]["notes"].insert_one({"_id": "settings", "text": "b"})
+
+    assert migrateToSharedStorage(db_connection, workers=1, drop=True) == 2
+    # a second run finds every document already copied
+    assert migrateToSharedStorage(db_connection, workers=1) == 0
+
+    assert "123_db" not in db_connection.list_database_names()
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {123, 456}
+    assert fetchOneDocument(db_connection, "456_db", "notes", {"_id": "settings"}) == {
+        "_id": "settings", "text": "b", tenancy.GUILD_ID_FIELD: 456}
+
+
+def test_conflict_keeps_the_source(db_connection):
+    shared_notes = db_connection[tenancy.getSharedDatabaseName()]["notes"]
+    shared_notes.create_index("name", unique=True)
+    shared_notes.insert_one({"name": "taken", tenancy.GUILD_ID_FIELD: 456})
+    db_connection["123_db"]["notes"].insert_one({"name": "taken"})
+
+    with pytest.raises(BulkWriteError):
+        migrateToSharedStorage(db_connection, workers=1, drop=True)
+
+    assert "123_db" in db_connection.list_database_names()
+
+
+def test_reserved_collection_is_not_copied(db_connection):
+    db_connection["123_db"]["notes"].insert_one({"text": "a"})
+    db_connection["123_db"][tenancy.GUILDS_COLLECTION].insert_one({tenancy.GUILD_ID_FIELD: 456})
+
+    assert migrateToSharedStorage(db_connection, workers=1, drop=True) == 1
+
+    assert "123_db" in db_connection.list_database_names()
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {123}
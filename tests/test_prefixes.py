@@ -0,0 +1,48 @@
+"""
+This file contains the tests of the per-guild command prefixes.
+"""
+
+from pymongo import MongoClient
+from helpers.database.tenancy import GUILD_ID_FIELD, getSharedDatabaseName
+from helpers.guild.prefixes import (
+    PREFIXES_COLLECTION,
+    loadPrefixes,
+    prefix_index,
+    removeGuildPrefix,
+    setGuildPrefix,
+)
+
+
+def test_prefix_is_stored_once_per_guild(db_connection):
+    loadPrefixes(db_connection)
+
+    assert setGuildPrefix(db_connection, 1, "?")
+    # another process, whose index does not know the prefix yet
+    prefix_index.forget(1)
+    assert setGuildPrefix(db_connection, 1, "$")
+
+    prefixes = db_connection[getSharedDatabaseName()][PREFIXES_COLLECTION]
+    assert list(prefixes.find({}, {"_id": False})) == [{GUILD_ID_FIELD: 1, "prefix": "$"}]
+    assert any(index["key"] == [(GUILD_ID_FIELD, 1)] and index.get("unique")
+               for index in prefixes.index_information().values())
+
+    assert loadPrefixes(db_connection) == 1
+    assert prefix_index.get(1) == "$"
+    assert removeGuildPrefix(db_connection, 1)
+    assert prefix_index.get(1) == prefix_index.default_prefix
+
+
+def test_invalid_prefix_is_rejected(db_connection):
+    assert not setGuildPrefix(db_connection, 1, "two words")
+    assert not prefix_index.has_prefix(1)
+
+
+def test_unreachable_database_keeps_the_default_prefix():
+    client = MongoClient("mongodb://127.0.0.1:1", serverSelectionTimeoutMS=50, connect=False)
+
+    try:
+        assert loadPrefixes(client) == 0
+    finally:
+        client.close()
+
+    assert prefix_index.get(1) == prefix_index.default_prefix
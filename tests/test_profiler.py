@@ -0,0 +1,32 @@
+"""
+This file contains the tests of the profiler.
+"""
+
+import asyncio
+import pytest
+from helpers.profiler import Profiler, createProfiler
+
+
+def test_profiler_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("DISCORD_BOT_PROFILER", raising=False)
+    assert createProfiler() is None
+
+    monkeypatch.setenv("DISCORD_BOT_PROFILER", "True")
+    assert isinstance(createProfiler(), Profiler)
+
+
+def test_handler_calls_are_counted():
+    profiler = Profiler(slow_callback=10)
+
+    async def onMessage():
+        await asyncio.sleep(0)
+
+    async def failing():
+        raise ValueError
+
+    asyncio.run(profiler.wrap(onMessage, "on_message")())
+    with pytest.raises(ValueError):
+        asyncio.run(profiler.wrap(failing, "on_message")())
+
+    totals = profiler.cogs()["bot"]
+    assert (totals.calls, totals.errors) == (2, 1)
@@ -0,0 +1,48 @@
+"""
+This file contains the tests of the keyset pagination.
+"""
+
+from helpers.database.create import createCollection, createDatabase, insertManyDocuments
+from helpers.database.read import fetchPage, projectField
+
+GUILD_DATABASE = "123_db"
+
+
+def fetchAllPages(db_connection, **options) -> list:
+    """
+    Page through the "notes" collection.
+    """
+    pages = []
+    after = None
+
+    while True:
+        page, after = fetchPage(db_connection, GUILD_DATABASE, "notes", None,
+                                page_size=2, after=after, **options)
+        pages.append(page)
+        if after is None:
+            return pages
+
+
+def test_page_on_a_nested_key(db_connection, storage_mode): # pylint: disable=unused-argument
+    createDatabase(db_connection, GUILD_DATABASE)
+    createCollection(db_connection, GUILD_DATABASE, "notes")
+    insertManyDocuments(db_connection, GUILD_DATABASE, "notes",
+                        [{"meta": {"rank": rank}, "text": str(rank)} for rank in range(5)])
+
+    pages = fetchAllPages(db_connection, key="meta.rank", projection={"text": 1})
+
+    assert [[document["text"] for document in page] for page in pages] == \
+        [["0", "1"], ["2", "3"], ["4"]]
+    assert all("_id" in document for page in pages for document in page)
+
+    pages = fetchAllPages(db_connection, key="meta.rank", descending=True,
+                          projection={"meta": 0})
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_project_field_keeps_the_projection_valid():
+    assert projectField({"meta": 1}, "meta.rank") == {"meta": 1}
+    assert projectField({"meta.rank.value": 1, "text": 1}, "meta.rank") == \
+        {"text": 1, "meta.rank": 1}
+    assert projectField({"_id": 0, "text": 1}, "_id") == {"_id": 1, "text": 1}
+    assert projectField({"meta": 0, "text": 0}, "meta.rank") == {"text": 0}
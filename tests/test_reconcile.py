@@ -0,0 +1,52 @@
+"""
+This file contains the tests of the startup reconciliation of the guilds.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from helpers.database import tenancy
+from helpers.database.create import createCollection
+from helpers.guild import reconcile
+
+
+def connectedBot(*guild_ids: int) -> SimpleNamespace:
+    """
+    Get a bot connected to the given guilds.
+    """
+    return SimpleNamespace(guilds=[SimpleNamespace(id=guild_id) for guild_id in guild_ids])
+
+
+def test_provisioned_guilds_are_remembered( # pylint: disable=unused-argument
+        db_connection, storage_mode, monkeypatch):
+    calls = []
+    provision = reconcile.provisionGuilds
+
+    async def countingProvision(db_connection, guild_ids, workers):
+        calls.append(list(guild_ids))
+        return await provision(db_connection, guild_ids, workers)
+
+    monkeypatch.setattr(reconcile, "provisionGuilds", countingProvision)
+
+    asyncio.run(reconcile.reconcileGuilds(connectedBot(1, 2), db_connection))
+    # the guild databases are still empty, so only the registry knows them
+    asyncio.run(reconcile.reconcileGuilds(connectedBot(1, 2), db_connection))
+
+    assert calls == [[1, 2], []]
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {1, 2}
+
+
+def test_left_guilds_are_kept_by_default(db_connection, monkeypatch):
+    asyncio.run(reconcile.reconcileGuilds(connectedBot(1, 2), db_connection))
+    asyncio.run(reconcile.reconcileGuilds(connectedBot(1), db_connection))
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {1, 2}
+
+    monkeypatch.setenv("DISCORD_GUILD_RECONCILE_PRUNE", "True")
+    asyncio.run(reconcile.reconcileGuilds(connectedBot(1), db_connection))
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {1}
+
+
+def test_listed_guild_databases_are_registered(db_connection):
+    createCollection(db_connection, "3_db", "notes")
+
+    assert reconcile.fetchProvisionedGuilds(db_connection) == {3}
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {3}
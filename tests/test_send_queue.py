@@ -0,0 +1,69 @@
+"""
+This file contains the tests of the outbound message queue.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from helpers.send_queue import SendQueue
+
+
+class FakeChannel: # pylint: disable=too-few-public-methods
+    """
+    A channel that records the messages sent to it.
+    """
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id # pylint: disable=invalid-name
+        self.sent: list[str] = []
+
+    async def send(self, content: str) -> SimpleNamespace:
+        """
+        Record a message.
+        """
+        self.sent.append(content)
+        return SimpleNamespace(content=content)
+
+
+def test_drain_sends_the_waiting_messages():
+    channel = FakeChannel(1)
+    queue = SendQueue(rate=2, per=0.05, depth=10)
+
+    async def sendThenDrain() -> bool:
+        for number in range(4):
+            queue.send(channel, f"message {number}")
+        drained = await queue.drain()
+        await queue.close()
+        return drained
+
+    assert asyncio.run(sendThenDrain())
+    assert channel.sent == [f"message {number}" for number in range(4)]
+
+
+def test_close_drops_what_the_drain_timeout_left():
+    channel = FakeChannel(1)
+    queue = SendQueue(rate=1, per=60, depth=10)
+
+    async def sendThenDrain() -> bool:
+        for number in range(3):
+            queue.send(channel, f"message {number}")
+        drained = await queue.drain(timeout=0.05)
+        await queue.close()
+        return drained
+
+    assert not asyncio.run(sendThenDrain())
+    assert channel.sent == ["message 0"]
+    assert queue.pending() == 0
+
+
+def test_coalesced_parts_are_merged():
+    channel = FakeChannel(1)
+    queue = SendQueue(rate=1, per=0.05, depth=10)
+
+    async def welcome() -> None:
+        queue.send(channel, "first")
+        for name in ("A", "B", "C"):
+            queue.send_coalesced(channel, "Welcome {}.", name)
+        await queue.drain()
+
+    asyncio.run(welcome())
+    assert channel.sent == ["first", "Welcome A, B, C."]
@@ -0,0 +1,52 @@
+"""
+This file contains the tests of the shutdown of the bot.
+"""
+
+import asyncio
+import discord
+from helpers.cluster import shutdownBot
+from helpers.database.create import createCollection, createDatabase
+from helpers.database.write_behind import bufferInsertOneDocument, write_behind_queue
+from helpers.instrumented_bot import createBot
+
+GUILD_DATABASE = "123_db"
+
+
+def test_close_flushes_the_buffered_writes(db_connection):
+    createDatabase(db_connection, GUILD_DATABASE)
+    createCollection(db_connection, GUILD_DATABASE, "notes")
+    bot = createBot(command_prefix="!", intents=discord.Intents.none())
+
+    async def bufferThenClose() -> None:
+        await bufferInsertOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})
+        await bot.close()
+
+    asyncio.run(bufferThenClose())
+
+    assert write_behind_queue.pending == 0
+    assert db_connection[GUILD_DATABASE]["notes"].count_documents({}) == 1
+
+
+def test_shutdown_flushes_before_closing(db_connection):
+    createDatabase(db_connection, GUILD_DATABASE)
+    createCollection(db_connection, GUILD_DATABASE, "notes")
+    pending_at_close = []
+
+    class FakeBot: # pylint: disable=too-few-public-methods
+        """
+        A bot that records the buffered writes left when it is closed.
+        """
+
+        async def close(self) -> None:
+            """
+            Record the writes that were not flushed yet.
+            """
+            pending_at_close.append(write_behind_queue.pending)
+
+    async def bufferThenShutdown() -> None:
+        await bufferInsertOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})
+        await shutdownBot(FakeBot()) # type: ignore[arg-type]
+
+    asyncio.run(bufferThenShutdown())
+
+    assert pending_at_close == [0]
@@ -0,0 +1,95 @@
+"""
+This file contains the tests of the guild scoping of the shared storage mode.
+"""
+
+import pytest
+from helpers.database import tenancy
+from helpers.database.create import createCollection, createDatabase, insertOneDocument
+from helpers.database.delete import deleteOneDocument
+from helpers.database.read import fetchAllDocuments, fetchOneDocument, fetchPage
+from helpers.database.update import updateDocument
+
+GUILD_DATABASE = "123_db"
+OTHER_GUILD_DATABASE = "456_db"
+
+
+@pytest.fixture(name="shared", autouse=True)
+def sharedFixture(monkeypatch):
+    """
+    Run the tests in the shared storage mode.
+    """
+    monkeypatch.setenv("DISCORD_MONGO_DB_STORAGE_MODE", tenancy.STORAGE_MODE_SHARED)
+
+
+def provision(db_connection) -> None:
+    """
+    Create two guild databases with a "notes" collection.
+    """
+    for database_name in (GUILD_DATABASE, OTHER_GUILD_DATABASE):
+        createDatabase(db_connection, database_name)
+        createCollection(db_connection, database_name, "notes")
+
+
+def test_same_id_in_two_guilds(db_connection):
+    provision(db_connection)
+
+    assert insertOneDocument(db_connection, GUILD_DATABASE, "notes",
+                             {"_id": "settings", "text": "a"})
+    assert insertOneDocument(db_connection, OTHER_GUILD_DATABASE, "notes",
+                             {"_id": "settings", "text": "b"})
+
+    document = fetchOneDocument(db_connection, GUILD_DATABASE, "notes", {"_id": "settings"})
+    assert document["_id"] == "settings"
+    assert document["text"] == "a"
+
+    assert updateDocument(db_connection, OTHER_GUILD_DATABASE, "notes",
+                          {"_id": {"$in": ["settings"]}}, {"$set": {"text": "c"}})
+    assert deleteOneDocument(db_connection, GUILD_DATABASE, "notes", {"_id": "settings"})
+
+    assert fetchAllDocuments(db_connection, GUILD_DATABASE, "notes", {}) is False
+    assert [document["text"] for document in
+            fetchAllDocuments(db_connection, OTHER_GUILD_DATABASE, "notes", {})] == ["c"]
+
+
+def test_generated_ids_are_given_back(db_connection):
+    provision(db_connection)
+    insertOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})
+
+    document = fetchOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})
+    assert fetchOneDocument(db_connection, GUILD_DATABASE, "notes",
+                            {"$or": [{"_id": document["_id"]}]}, use_cache=False) == document
+
+    page, after = fetchPage(db_connection, GUILD_DATABASE, "notes", {}, page_size=1)
+    assert page == [document]
+    assert after == document["_id"]
+
+
+def test_scope_query_rewrites_ids():
+    assert tenancy.scopeQuery({"_id": 1}, 5) == {
+        tenancy.GUILD_ID_FIELD: 5, "_id": {tenancy.GUILD_ID_FIELD: 5, "_id": 1}}
+    assert tenancy.scopeQuery({"$nor": [{"_id": {"$gt": 1}}]}, 5) == {
+        tenancy.GUILD_ID_FIELD: 5, "$nor": [{"_id._id": {"$gt": 1}}]}
+
+
+def test_unregistered_guild_does_not_exist(db_connection):
+    provision(db_connection)
+
+    assert not deleteOneDocument(db_connection, "789_db", "notes", {"key": 1})
+
+    tenancy.purgeGuild(db_connection, 123)
+    assert not deleteOneDocument(db_connection, GUILD_DATABASE, "notes", {"key": 1})
+
+
+def test_guild_collections_named_like_the_bot_collections(db_connection):
+    createDatabase(db_connection, GUILD_DATABASE)
+
+    # the bot keeps its own collections under a reserved prefix
+    assert createCollection(db_connection, GUILD_DATABASE, "guilds")
+    assert insertOneDocument(db_connection, GUILD_DATABASE, "guilds", {"name": "a"})
+    assert insertOneDocument(db_connection, GUILD_DATABASE, "guilds", {"name": "b"})
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {123}
+
+    assert not createCollection(db_connection, GUILD_DATABASE, tenancy.GUILDS_COLLECTION)
+    assert not insertOneDocument(db_connection, GUILD_DATABASE, tenancy.GUILDS_COLLECTION,
+                                 {tenancy.GUILD_ID_FIELD: 456})
+    assert tenancy.fetchRegisteredGuilds(db_connection) == {123}